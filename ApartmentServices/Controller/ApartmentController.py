@@ -8,13 +8,17 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from ApartmentServices.Serializers import ApartmentSerializer, BookingCalendarSerializer, BookingCreateSerializer, BookingListSerializer, BookingUpdateSerializer, RefundSerializer
 from ApartmentServices.models import Apartment, Booking, Refund
-from cleanswitch.Helpers import CustomPageNumberPagination, CommonListAPIMixin
+from cleanswitch.Helpers import CustomPageNumberPagination, CommonListAPIMixin, ConditionalRetrieveMixin, StreamingListMixin, cacheResponse, parseQueryParam, propertyAccess, streamingListResponse
+from cleanswitch.cache import cachedComputation
 from PropertyServices.models import Property
 from UserServices.Serializers import UserSerializer
+from UserServices.models import Guest, User
 from TaskServices.models import Task
 from cleanswitch.permissions import IsAdmin, IsAdminOrManager, IsReceptionist
 from rest_framework.views import APIView
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from django.utils.dateparse import parse_date
+from ApartmentServices.availability import availabilityIndex
 from django.db.models import Q, Exists, OuterRef, Sum
 from django.db.models import Prefetch
 
@@ -22,13 +26,14 @@ class CreateListApartmentAPIView(ListCreateAPIView):
     serializer_class = ApartmentSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = CustomPageNumberPagination
+    compiled_serializer = True
 
     def get_queryset(self):
         user = self.request.user
         if user.role == 'admin' or user.is_superuser:
             return Apartment.objects.all()
         else :
-            return Apartment.objects.filter(is_active=True, property_assigned__in=user.properties_assigned.all())
+            return Apartment.objects.filter(is_active=True, **propertyAccess(self.request).filter('property_assigned'))
 
     def perform_create(self, serializer):
         if self.request.user.role != 'admin':
@@ -39,7 +44,7 @@ class CreateListApartmentAPIView(ListCreateAPIView):
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
-class ListAvailableApartmentAPIView(ListAPIView):
+class ListAvailableApartmentAPIView(StreamingListMixin, ListAPIView):
     serializer_class = ApartmentSerializer
     permission_classes = [IsAuthenticated, IsReceptionist]  # Fixed typo: should be permission_classes (plural)
     pagination_class = None
@@ -59,12 +64,12 @@ class ListAvailableApartmentAPIView(ListAPIView):
             queryset = Apartment.objects.filter(
                 is_active=True, 
                 inService=False,
-                property_assigned__in=user.properties_assigned.all()
+                **propertyAccess(self.request).filter('property_assigned')
             )
         
         return queryset
 
-class ListApartmentAPIView(ListAPIView):
+class ListApartmentAPIView(StreamingListMixin, ListAPIView):
     serializer_class = ApartmentSerializer
     permission_classes = [IsAuthenticated, IsReceptionist]  # Fixed typo: should be permission_classes (plural)
     pagination_class = None
@@ -83,12 +88,47 @@ class ListApartmentAPIView(ListAPIView):
         else:
             queryset = Apartment.objects.filter(
                 is_active=True, 
-                property_assigned__in=user.properties_assigned.all()
+                **propertyAccess(self.request).filter('property_assigned')
             ).order_by('-created_at')
             
         return queryset
 
-class RetrieveUpdateDeleteApartmentAPIView(RetrieveUpdateDestroyAPIView):
+class ApartmentAvailabilitySearchAPIView(StreamingListMixin, ListAPIView):
+    """
+    Apartments free for every night from `start` to `end` (YYYY-MM-DD, end excluded), optionally at one
+    `property_id` and filtered on `min_capacity`, `apartmentType`, `min_price` and `max_price`. Answered
+    from the occupancy bitmaps of ApartmentServices.availability rather than per-apartment queries.
+    """
+    serializer_class = ApartmentSerializer
+    permission_classes = [IsAuthenticated, IsReceptionist]
+    pagination_class = None
+
+    def get_queryset(self):
+        params = self.request.query_params
+        start_date = parseQueryParam(params, 'start', parse_date, required=True)
+        end_date = parseQueryParam(params, 'end', parse_date, required=True)
+        if end_date <= start_date:
+            raise ValidationError({'end': 'End date must be after start date.'})
+        filters = {
+            'min_capacity': parseQueryParam(params, 'min_capacity', int),
+            'apartment_type': params.get('apartmentType') or None,
+            'min_price': parseQueryParam(params, 'min_price', float),
+            'max_price': parseQueryParam(params, 'max_price', float),
+        }
+
+        access = propertyAccess(self.request)
+        property_id = parseQueryParam(params, 'property_id', int)
+        if property_id is not None:
+            if not access.can_access(property_id):
+                raise PermissionDenied("You don't have access to this property")
+            property_ids = [property_id]
+        else:
+            property_ids = list(Property.objects.filter(is_active=True, **access.filter('id')).values_list('id', flat=True))
+
+        apartment_ids = availabilityIndex.search(property_ids, start_date, end_date, **filters)
+        return Apartment.objects.filter(pk__in=apartment_ids).order_by('property_assigned_id', 'number', 'id')
+
+class RetrieveUpdateDeleteApartmentAPIView(ConditionalRetrieveMixin, RetrieveUpdateDestroyAPIView):
     queryset = Apartment.objects.all()
     serializer_class = ApartmentSerializer
     permission_classes = [IsAuthenticated, IsAdmin]
@@ -126,8 +166,8 @@ class BookingRetrieveUpdateDestroyAPIView(RetrieveUpdateDestroyAPIView):
         if user.role == 'receptionist':
             # Updated to use apartments ManyToMany field
             queryset = Booking.objects.filter(
-                apartments__property_assigned__in=user.properties_assigned.all()
-            ).distinct().order_by('-dateOfReservation')
+                **propertyAccess(self.request).filter('property')
+            ).order_by('-dateOfReservation')
         elif user.role in ['admin', 'manager']:
             queryset
         return queryset
@@ -229,14 +269,15 @@ class BookingListAPIView(ListAPIView):
     serializer_class = BookingListSerializer
     permission_classes = [IsAuthenticated, IsReceptionist]
     pagination_class = CustomPageNumberPagination
+    compiled_serializer = True
     
     def get_queryset(self):
         queryset = super().get_queryset()
         user = self.request.user
         if user.role == 'receptionist':
             queryset = queryset.filter(
-                apartments__property_assigned__in=user.properties_assigned.all()
-            ).distinct().order_by('-dateOfReservation')        
+                **propertyAccess(self.request).filter('property')
+            ).order_by('-dateOfReservation')        
         elif user.role in ['admin', 'manager'] or user.is_superuser:
             queryset
         return queryset
@@ -455,6 +496,7 @@ class CalendarBookingsAPIView(APIView):
     API endpoint to get bookings for calendar view
     """
     
+    @cacheResponse(BookingCalendarSerializer)
     def get(self, request):
         try:
             # Get date range from query parameters (optional)
@@ -474,14 +516,13 @@ class CalendarBookingsAPIView(APIView):
             user = request.user
             if user.role == 'receptionist':
                 queryset = queryset.filter(
-                    apartments__property_assigned__in=user.properties_assigned.all()
-                ).distinct()
+                    **propertyAccess(request).filter('property')
+                )
             elif user.role in ['technical', 'cleaning']:
                 # Only show bookings for apartments they're assigned to (if applicable)
                 pass
             
-            serializer = BookingCalendarSerializer(queryset, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            return streamingListResponse(self, queryset, BookingCalendarSerializer)
             
         except Exception as e:
             return Response(
@@ -533,94 +574,17 @@ class BookingApartmentTasksAPIView(APIView):
     
     def get(self, request):
         try:
-            booking_status = request.GET.get('status')
-            has_tasks = request.GET.get('has_tasks')
-            task_status = request.GET.get('task_status')
-            property_id = request.GET.get('property_id')
-            start_date_from = request.GET.get('start_date_from')
-            start_date_to = request.GET.get('start_date_to')
-            end_date_from = request.GET.get('end_date_from')
-            end_date_to = request.GET.get('end_date_to')
-            # Prefetch apartments with tasks information
-            task_filter = Q(active=True)
-            if task_status:
-                task_filter &= Q(status=task_status)
-            
-            apartments_prefetch = Prefetch(
-                'apartments',
-                queryset=Apartment.objects.annotate(
-                    has_planned_tasks=Exists(
-                        Task.objects.filter(
-                            apartments_assigned=OuterRef('pk'),
-                            active=True,
-                            status__in=['pending', 'in_progress']
-                        )
-                    )
-                ).prefetch_related(
-                    Prefetch(
-                        'apartment_tasks',
-                        queryset=Task.objects.filter(task_filter,  status__in=['pending', 'in_progress']).prefetch_related('assigned_to')
-                    )
-                )
-            )
-            
-            # Get bookings
-            bookings = Booking.objects.all().prefetch_related(
-                apartments_prefetch,
-                'guest'
+            # Dashboards open together when a shift starts: one worker computes, the others share its result
+            result = self.compute_bookings(
+                booking_status=request.GET.get('status'),
+                has_tasks=request.GET.get('has_tasks'),
+                task_status=request.GET.get('task_status'),
+                property_id=request.GET.get('property_id'),
+                start_date_from=request.GET.get('start_date_from'),
+                start_date_to=request.GET.get('start_date_to'),
+                end_date_from=request.GET.get('end_date_from'),
+                end_date_to=request.GET.get('end_date_to'),
             )
-            
-            if booking_status:
-                bookings = bookings.filter(status=booking_status)
-            
-            if property_id:
-                bookings = bookings.filter(apartments__property_assigned_id=property_id)
-                
-             # Apply date filters
-            if start_date_from:
-                bookings = bookings.filter(startDate__gte=start_date_from)
-            
-            if start_date_to:
-                bookings = bookings.filter(startDate__lte=start_date_to)
-            
-            if end_date_from:
-                bookings = bookings.filter(endDate__gte=end_date_from)
-            
-            if end_date_to:
-                bookings = bookings.filter(endDate__lte=end_date_to)
-            
-            result = []
-            for booking in bookings:
-                booking_data = BookingListSerializer(booking).data
-                
-                apartments_info = []
-                for apartment in booking.apartments.all():
-                    # Apply has_tasks filter
-                    if has_tasks is not None:
-                        has_tasks_bool = has_tasks.lower() == 'true'
-                        if has_tasks_bool != apartment.has_planned_tasks:
-                            continue
-                    
-                    apartment_info = ApartmentSerializer(apartment).data
-                    apartment_info['has_planned_tasks'] = getattr(apartment, 'has_planned_tasks', False)
-                    
-                    # Include task details if apartment has tasks
-                    if apartment_info['has_planned_tasks']:
-                        apartment_info['tasks'] = []
-                        for task in apartment.apartment_tasks.all():
-                            apartment_info['tasks'].append({
-                                'id': task.id,
-                                'title': task.title,
-                                'status': task.status,
-                                'priority': task.priority,
-                                'due_date': task.due_date,
-                                'assigned_to': [f"{user.first_name} {user.last_name}" for user in task.assigned_to.all()],
-                                'description': task.description
-                            })
-                    
-                    apartments_info.append(apartment_info)
-                booking_data['apartments_with_tasks_info'] = apartments_info
-                result.append(booking_data)
             return Response({
                 'status': 'success',
                 'count': len(result)-1,
@@ -631,4 +595,89 @@ class BookingApartmentTasksAPIView(APIView):
             return Response({
                 'status': 'error',
                 'message': str(e)
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @staticmethod
+    @cachedComputation(tags=(Booking, Booking.apartments.through, Guest, Apartment, Property, User, Task, Task.apartments_assigned.through, Task.assigned_to.through), fresh=30, stale=60 * 5)
+    def compute_bookings(booking_status=None, has_tasks=None, task_status=None, property_id=None, start_date_from=None, start_date_to=None, end_date_from=None, end_date_to=None):
+        # Prefetch apartments with tasks information
+        task_filter = Q(active=True)
+        if task_status:
+            task_filter &= Q(status=task_status)
+        
+        apartments_prefetch = Prefetch(
+            'apartments',
+            queryset=Apartment.objects.annotate(
+                has_planned_tasks=Exists(
+                    Task.objects.filter(
+                        apartments_assigned=OuterRef('pk'),
+                        active=True,
+                        status__in=['pending', 'in_progress']
+                    )
+                )
+            ).prefetch_related(
+                Prefetch(
+                    'apartment_tasks',
+                    queryset=Task.objects.filter(task_filter,  status__in=['pending', 'in_progress']).prefetch_related('assigned_to')
+                )
+            )
+        )
+        
+        # Get bookings
+        bookings = Booking.objects.all().prefetch_related(
+            apartments_prefetch,
+            'guest'
+        )
+        
+        if booking_status:
+            bookings = bookings.filter(status=booking_status)
+        
+        if property_id:
+            bookings = bookings.filter(property_id=property_id)
+            
+         # Apply date filters
+        if start_date_from:
+            bookings = bookings.filter(startDate__gte=start_date_from)
+        
+        if start_date_to:
+            bookings = bookings.filter(startDate__lte=start_date_to)
+        
+        if end_date_from:
+            bookings = bookings.filter(endDate__gte=end_date_from)
+        
+        if end_date_to:
+            bookings = bookings.filter(endDate__lte=end_date_to)
+        
+        result = []
+        for booking in bookings:
+            booking_data = BookingListSerializer(booking).data
+            
+            apartments_info = []
+            for apartment in booking.apartments.all():
+                # Apply has_tasks filter
+                if has_tasks is not None:
+                    has_tasks_bool = has_tasks.lower() == 'true'
+                    if has_tasks_bool != apartment.has_planned_tasks:
+                        continue
+                
+                apartment_info = ApartmentSerializer(apartment).data
+                apartment_info['has_planned_tasks'] = getattr(apartment, 'has_planned_tasks', False)
+                
+                # Include task details if apartment has tasks
+                if apartment_info['has_planned_tasks']:
+                    apartment_info['tasks'] = []
+                    for task in apartment.apartment_tasks.all():
+                        apartment_info['tasks'].append({
+                            'id': task.id,
+                            'title': task.title,
+                            'status': task.status,
+                            'priority': task.priority,
+                            'due_date': task.due_date,
+                            'assigned_to': [f"{user.first_name} {user.last_name}" for user in task.assigned_to.all()],
+                            'description': task.description
+                        })
+                
+                apartments_info.append(apartment_info)
+            booking_data['apartments_with_tasks_info'] = apartments_info
+            result.append(booking_data)
+        return result
\ No newline at end of file
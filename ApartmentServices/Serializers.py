@@ -1,31 +1,75 @@
 import math
+from contextlib import contextmanager
 from rest_framework import serializers
-from cleanswitch.Helpers import createParsedCreatedAtUpdatedAt
+from cleanswitch.Helpers import BatchedPrimaryKeyRelatedField, CachedRepresentationMixin, createParsedCreatedAtUpdatedAt, getPrefetched, usesFields
 from UserServices.models import Guest, User
 from PropertyServices.Serializers import PropertySimpleSerializer
-from .models import Apartment, Booking, Refund
+from .models import Apartment, Booking, NightsUnavailable, Refund
 from django.contrib.auth.hashers import make_password
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Q
 
 
+def validateApartmentsAvailable(apartments, start_date, end_date, booking=None):
+    """Raise one ValidationError listing every apartment already booked between the dates, and the bookings holding it."""
+    conflicts = Booking.find_conflicts(apartments, start_date, end_date, exclude=booking.pk if booking else None)
+    if conflicts:
+        raise serializers.ValidationError([
+            f"Apartment #{apartment.number} is already booked from {start_date} to {end_date} "
+            f"(booking {', '.join(f'#{booking_id}' for booking_id in conflicts[apartment.pk])})."
+            for apartment in apartments if apartment.pk in conflicts
+        ])
+
+
+def validateSingleProperty(apartments):
+    """A booking's apartments belong to one property: Booking.property is what scopes it to that property's staff."""
+    property_ids = {apartment.property_assigned_id for apartment in apartments}
+    if len(property_ids) > 1:
+        raise serializers.ValidationError({"apartments": "All apartments of a booking must belong to the same property."})
+
+
+@contextmanager
+def reservingApartments(start_date, end_date):
+    """
+    Run a booking write in one transaction. validate() already rejected the overlaps it could
+    see; the apartment-night ledger rejects the nights a concurrent booking took since, which
+    rolls everything back into the same ValidationError as validateApartmentsAvailable.
+    """
+    try:
+        with transaction.atomic():
+            yield
+    except NightsUnavailable as error:
+        apartments = Apartment.objects.in_bulk(list(error.conflicts))
+        raise serializers.ValidationError([
+            f"Apartment #{apartments[apartment_id].number} is already booked from {start_date} to {end_date} "
+            f"(booking {', '.join(f'#{booking_id}' for booking_id in booking_ids)})."
+            for apartment_id, booking_ids in error.conflicts.items() if apartment_id in apartments
+        ])
+
+
 @createParsedCreatedAtUpdatedAt
-class ApartmentSerializer(serializers.ModelSerializer):
+class ApartmentSerializer(CachedRepresentationMixin, serializers.ModelSerializer):
     added_by_user_id = serializers.SerializerMethodField()
     property_assigned_name = serializers.SerializerMethodField()
     property_address = serializers.SerializerMethodField()
     class Meta:
         model = Apartment
         fields = '__all__'
+        search_fields = ['name', 'number', 'apartmentType', 'property_assigned__name']
+        ordering_fields = ['id', 'number', 'name', 'price', 'created_at']
         
+    @usesFields('added_by_user_id__username')
     def get_added_by_user_id(self, obj):
         if obj.added_by_user_id:
             return obj.added_by_user_id.username
         return None
         
+    @usesFields('property_assigned__name')
     def get_property_assigned_name(self, obj):
         return obj.property_assigned.name if obj.property_assigned else None
     
+    @usesFields('property_assigned__address')
     def get_property_address(self, obj):
         return obj.property_assigned.address if obj.property_assigned else None
 
@@ -106,6 +150,7 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id', 'username', 'first_name', 'last_name', 'fullName', 'email', 'role', 'phone', 'properties_assigned', 'password', 'department', 'is_active', 'created_at']
         read_only_fields = ['id', 'role']
+    @usesFields('first_name', 'last_name')
     def get_fullName(self, obj):
         return obj.get_full_name()
      
@@ -119,15 +164,29 @@ class GuestSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'current_apartment', 'booking_count', 'idCard']
         read_only_fields = fields
 
+    @usesFields('booking__apartments__property_assigned')
     def get_current_apartment(self, obj):
-        return obj.current_apartment()
+        bookings = getPrefetched(obj, 'booking_set')
+        if bookings is None:
+            return obj.current_apartment()
+        # Same result as Guest.current_apartment(), computed from the prefetched bookings
+        bookings = [booking for booking in bookings if any(ap.inService for ap in booking.apartments.all())]
+        if not bookings:
+            return []
+        booking = max(bookings, key=lambda booking: booking.startDate)
+        return [
+            f"{ap.number} - {ap.name} ({ap.property_assigned.name}-{ap.property_assigned.address})"
+            for ap in booking.apartments.all() if ap.inService
+        ]
 
+    @usesFields('booking')
     def get_booking_count(self, obj):
-        return obj.num_of_bookings()
+        bookings = getPrefetched(obj, 'booking_set')
+        return len(bookings) if bookings is not None else obj.num_of_bookings()
 
 class BookingUpdateSerializer(serializers.ModelSerializer):
     # Change from single apartment to multiple apartments
-    apartments = serializers.PrimaryKeyRelatedField(
+    apartments = BatchedPrimaryKeyRelatedField(
         many=True, 
         queryset=Apartment.objects.all(), 
         required=False
@@ -160,32 +219,30 @@ class BookingUpdateSerializer(serializers.ModelSerializer):
         return value
     
     def validate(self, attrs):
-        start_date = attrs.get("startDate")
-        end_date = attrs.get("endDate")
-        apartments = attrs.get("apartments", [])
+        if "apartments" in attrs:
+            validateSingleProperty(attrs["apartments"])
+        start_date = attrs.get("startDate", self.instance.startDate if self.instance else None)
+        end_date = attrs.get("endDate", self.instance.endDate if self.instance else None)
         
         # Validate dates
         if start_date and end_date:
             if start_date >= end_date:
                 raise serializers.ValidationError("End date must be after start date.")
             
-            # Check for overlapping bookings for each apartment
-            for apartment in apartments:
-                overlapping_bookings = Booking.objects.filter(
-                    apartments=apartment,
-                    startDate__lt=end_date,
-                    endDate__gt=start_date
-                ).exclude(status__in=['cancelled', 'checked_out'])
-                
-                if self.instance:
-                    overlapping_bookings = overlapping_bookings.exclude(pk=self.instance.pk)
-                
-                if overlapping_bookings.exists():
-                    raise serializers.ValidationError(
-                        f"Apartment #{apartment.number} is already booked from {start_date} to {end_date}."
-                    )
+            # Check for overlapping bookings on all apartments at once, when the stay changes
+            status = attrs.get("status", getattr(self.instance, "status", None))
+            if {"apartments", "startDate", "endDate", "status"}.intersection(attrs) and status not in Booking.RELEASED_STATUSES:
+                if "apartments" in attrs:
+                    apartments = attrs["apartments"]
+                else:
+                    apartments = list(self.instance.apartments.all()) if self.instance else []
+                validateApartmentsAvailable(apartments, start_date, end_date, booking=self.instance)
 
         return attrs
+
+    def save(self, **kwargs):
+        with reservingApartments(self.validated_data.get('startDate', self.instance.startDate), self.validated_data.get('endDate', self.instance.endDate)):
+            return super().save(**kwargs)
     
     def update(self, instance, validated_data):
         request = self.context.get("request")
@@ -263,7 +320,10 @@ class BookingListSerializer(serializers.ModelSerializer):
             'updated_at'
         ]
         read_only_fields = fields
+        search_fields = ['guest__user__first_name', 'guest__user__last_name', 'guest__user__email', 'guest__user__phone', 'apartments__name', 'status']
+        ordering_fields = ['id', 'dateOfReservation', 'startDate', 'endDate']
 
+    @usesFields('startDate', 'endDate')
     def get_duration(self, obj):
         try:
             total_hours = (obj.endDate - obj.startDate).total_seconds() / 3600
@@ -272,6 +332,7 @@ class BookingListSerializer(serializers.ModelSerializer):
         except (AttributeError, TypeError):
             return None
         
+    @usesFields('startDate', 'endDate', 'apartments__price')
     def get_totalPrice(self, obj):
         try:
             # Calculate total price for all apartments
@@ -287,7 +348,7 @@ class BookingListSerializer(serializers.ModelSerializer):
 
 class BookingCreateSerializer(serializers.ModelSerializer):
     # Change to ManyToMany field
-    apartments = serializers.PrimaryKeyRelatedField(
+    apartments = BatchedPrimaryKeyRelatedField(
         many=True, 
         queryset=Apartment.objects.all()
     )
@@ -319,9 +380,9 @@ class BookingCreateSerializer(serializers.ModelSerializer):
         return value
     
     def validate(self, attrs):
+        validateSingleProperty(attrs.get("apartments", []))
         start_date = attrs.get("startDate")
         end_date = attrs.get("endDate")
-        apartments = attrs.get("apartments", [])
         
         # if status == "upcoming" and start_date < timezone.now():
         #     raise serializers.ValidationError("You cannot set Upcoming when start date is in the past.")
@@ -330,20 +391,15 @@ class BookingCreateSerializer(serializers.ModelSerializer):
             if start_date >= end_date:
                 raise serializers.ValidationError("End date must be after start date.")
             
-            # Check for overlapping bookings for each apartment
-            for apartment in apartments:
-                overlapping_bookings = Booking.objects.filter(
-                    apartments=apartment,
-                    startDate__lt=end_date,
-                    endDate__gt=start_date
-                ).exclude(status__in=['cancelled', 'checked_out'])
-                
-                if overlapping_bookings.exists():
-                    raise serializers.ValidationError(
-                        f"Apartment #{apartment.number} is already booked from {start_date} to {end_date}."
-                    )
+            # Check for overlapping bookings on all apartments at once
+            if attrs.get("status") not in Booking.RELEASED_STATUSES:
+                validateApartmentsAvailable(attrs.get("apartments", []), start_date, end_date)
 
         return attrs
+
+    def save(self, **kwargs):
+        with reservingApartments(self.validated_data.get('startDate'), self.validated_data.get('endDate')):
+            return super().save(**kwargs)
     
     def create(self, validated_data):
         request = self.context.get("request")
@@ -421,6 +477,8 @@ class RefundSerializer(serializers.ModelSerializer):
             'processed_by', 'processed_by_name', 'updated_by'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'processed_at']
+        search_fields = ['reason', 'status', 'guest__user__first_name', 'guest__user__last_name']
+        ordering_fields = ['id', 'created_at', 'processed_at']
     
     def validate_amount(self, value):
         if value and value <= 0:
@@ -449,8 +507,9 @@ class BookingCalendarSerializer(serializers.ModelSerializer):
             'status', 'apartments_info'
         ]
     
+    @usesFields('guest__user__first_name', 'guest__user__last_name', 'apartments')
     def get_title(self, obj):
-        apartments_count = obj.apartments.count()
+        apartments_count = len(obj.apartments.all())
         apartment_info = f"{apartments_count} apartment{'s' if apartments_count != 1 else ''}"
         return f"Booking: {obj.guest.user.first_name} {obj.guest.user.last_name} ({apartment_info})"
     
@@ -474,6 +533,7 @@ class BookingCalendarSerializer(serializers.ModelSerializer):
     def get_type(self, obj):
         return 'booking'
     
+    @usesFields('apartments__number', 'apartments__name', 'apartments__property_assigned__name')
     def get_apartments_info(self, obj):
         return [{
             'id': apt.id,
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ApartmentservicesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "ApartmentServices"
+
+    def ready(self):
+        import ApartmentServices.signals  # noqa: F401
@@ -0,0 +1,210 @@
+from datetime import datetime, time, timedelta
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+from ApartmentServices.models import Apartment, Booking, stayNights
+from cleanswitch.cache import MISSING, CommitBatch, invalidateTags, referenceCache
+
+
+# Booking fields deciding which nights an apartment is held, and apartment fields the bitmaps store
+OCCUPANCY_FIELDS = frozenset({'startDate', 'endDate', 'status'})
+AVAILABILITY_FIELDS = frozenset({'property_assigned', 'is_active', 'capacity', 'apartmentType', 'price'})
+
+
+def availabilityTag(property_id):
+    return f"availability:{property_id}"
+
+
+class OccupancyBitmap:
+    """
+    Occupancy of the active apartments of one property: one row per apartment, one bit per night
+    from `origin` (bit set = booked), packed along the days so a property of 200 apartments
+    over two years fits in 18 KB. The apartment attributes the search filters on are kept as
+    columns next to it.
+    """
+
+    def __init__(self, property_id, origin, days, apartments):
+        self.property_id = property_id
+        self.origin = origin
+        self.days = days
+        self.ids = np.array([row[0] for row in apartments], dtype=np.int64)
+        self.capacity = np.array([row[1] if row[1] is not None else -1 for row in apartments], dtype=np.int32)
+        self.types = np.array([row[2] or '' for row in apartments], dtype=str)
+        self.price = np.array([row[3] if row[3] is not None else np.nan for row in apartments], dtype=np.float64)
+        self.bits = np.zeros((len(apartments), (days + 7) // 8), dtype=np.uint8)
+        self.rows = {apartment_id: row for row, apartment_id in enumerate(self.ids.tolist())}
+
+    def fill(self, stays):
+        """Set the bits of `stays` [(apartment id, start, end)], rewriting the rows of the apartments they cover."""
+        occupied = {}
+        for apartment_id, start, end in stays:
+            row = self.rows.get(apartment_id)
+            if row is None:
+                continue
+            nights = occupied.setdefault(row, np.zeros(self.days, dtype=bool))
+            held = stayNights(start, end)
+            if held:
+                first = (held[0] - self.origin).days
+                nights[max(first, 0):min(first + len(held), self.days)] = True
+        for row, nights in occupied.items():
+            self.bits[row] = np.packbits(nights)
+
+    def clear(self, apartment_ids):
+        for apartment_id in apartment_ids:
+            row = self.rows.get(apartment_id)
+            if row is not None:
+                self.bits[row] = 0
+
+    def covers(self, start_date, end_date):
+        return self.origin <= start_date and (end_date - self.origin).days <= self.days
+
+    def matching(self, min_capacity=None, apartment_type=None, min_price=None, max_price=None):
+        """Row mask of the apartments matching the attribute filters."""
+        mask = np.ones(len(self.ids), dtype=bool)
+        if min_capacity is not None:
+            mask &= self.capacity >= min_capacity
+        if apartment_type is not None:
+            mask &= self.types == apartment_type
+        if min_price is not None:
+            mask &= self.price >= min_price
+        if max_price is not None:
+            mask &= self.price <= max_price
+        return mask
+
+    def free(self, start_date, end_date, **filters):
+        """Ids of the apartments matching `filters` with no booked night in [start_date, end_date)."""
+        first = (start_date - self.origin).days
+        last = max((end_date - self.origin).days, first + 1) - 1
+        # Nights are packed most significant bit first: mask the partial bytes at both ends of the range
+        head, tail = first // 8, last // 8
+        head_mask, tail_mask = 0xFF >> first % 8, (0xFF << 7 - last % 8) & 0xFF
+        if head == tail:
+            busy = (self.bits[:, head] & (head_mask & tail_mask)) != 0
+        else:
+            busy = ((self.bits[:, head] & head_mask) | (self.bits[:, tail] & tail_mask)) != 0
+            if tail > head + 1:
+                busy |= self.bits[:, head + 1:tail].any(axis=1)
+        free = ~busy
+        if any(value is not None for value in filters.values()):
+            free &= self.matching(**filters)
+        return self.ids[free].tolist()
+
+
+class AvailabilityIndex:
+    """
+    Occupancy bitmaps of every property, kept in the two-tier reference cache: workers answer
+    searches from their local copies, booking changes patch the shared copy (only the rows of
+    the apartments involved are recomputed) and apartment changes drop it for a lazy rebuild.
+    Dates outside the bitmap horizon fall back to the database.
+    """
+
+    def __init__(self):
+        self.changed_apartments = CommitBatch(self.patch)
+
+    def horizon(self):
+        return getattr(settings, 'AVAILABILITY_HORIZON_DAYS', 730)
+
+    def timeout(self):
+        return getattr(settings, 'AVAILABILITY_CACHE_TIMEOUT', None)
+
+    def key(self, property_id):
+        return f"availability:{property_id}"
+
+    def get_bitmaps(self, property_ids):
+        today = timezone.localdate()
+        found = referenceCache.lookup_many({self.key(property_id): [availabilityTag(property_id)] for property_id in property_ids})
+        bitmaps, tokens = {}, {}
+        for property_id in property_ids:
+            value, token = found[self.key(property_id)]
+            # Rebuilt once a month so the horizon keeps reaching far enough ahead
+            if value is MISSING or value.origin < today - timedelta(days=30):
+                tokens[property_id] = token
+            else:
+                bitmaps[property_id] = value
+        if tokens:
+            built = self.build(list(tokens), today)
+            for property_id, bitmap in built.items():
+                key, tags = self.key(property_id), [availabilityTag(property_id)]
+                if tokens[property_id] is None:
+                    # Outdated copy: replace it everywhere
+                    referenceCache.patch(key, tags, lambda outdated, bitmap=bitmap: bitmap, timeout=self.timeout())
+                else:
+                    referenceCache.store(key, bitmap, tags, tokens[property_id], self.timeout())
+            bitmaps.update(built)
+        return bitmaps
+
+    def build(self, property_ids, origin):
+        """Bitmaps of `property_ids` from two queries: their active apartments, then the stays holding them."""
+        apartments = {property_id: [] for property_id in property_ids}
+        rows = Apartment.objects.filter(property_assigned_id__in=property_ids, is_active=True).order_by('id').values_list(
+            'property_assigned_id', 'id', 'capacity', 'apartmentType', 'price'
+        )
+        for property_id, *row in rows:
+            apartments[property_id].append(row)
+        bitmaps = {property_id: OccupancyBitmap(property_id, origin, self.horizon(), rows) for property_id, rows in apartments.items()}
+        stays = {property_id: [] for property_id in property_ids}
+        for property_id, apartment_id, start, end in self.stays(apartment__property_assigned_id__in=property_ids, origin=origin):
+            stays[property_id].append((apartment_id, start, end))
+        for property_id, bitmap in bitmaps.items():
+            bitmap.fill(stays[property_id])
+        return bitmaps
+
+    def stays(self, origin, **filters):
+        """(property id, apartment id, start, end) of the bookings holding an apartment within the horizon from `origin`."""
+        horizon_start = timezone.make_aware(datetime.combine(origin, time.min))
+        return Booking.apartments.through.objects.filter(
+            booking__endDate__gt=horizon_start,
+            booking__startDate__lt=horizon_start + timedelta(days=self.horizon()),
+            **filters
+        ).exclude(booking__status__in=Booking.RELEASED_STATUSES).values_list(
+            'apartment__property_assigned_id', 'apartment_id', 'booking__startDate', 'booking__endDate'
+        ).iterator(chunk_size=5000)
+
+    def search(self, property_ids, start_date, end_date, **filters):
+        """Ids of the free apartments of `property_ids` between the dates, property by property."""
+        bitmaps = self.get_bitmaps(property_ids)
+        free = []
+        outside = []
+        for property_id in property_ids:
+            bitmap = bitmaps[property_id]
+            if bitmap.covers(start_date, end_date):
+                free.extend(bitmap.free(start_date, end_date, **filters))
+            else:
+                outside.append(bitmap)
+        if outside:
+            # Past dates or beyond the horizon: filter on the bitmap columns, then one overlap query
+            candidates = [apartment_id for bitmap in outside for apartment_id in bitmap.ids[bitmap.matching(**filters)].tolist()]
+            start = timezone.make_aware(datetime.combine(start_date, time.min))
+            end = timezone.make_aware(datetime.combine(max(end_date, start_date + timedelta(days=1)), time.min))
+            conflicts = Booking.find_conflicts(candidates, start, end)
+            free.extend(apartment_id for apartment_id in candidates if apartment_id not in conflicts)
+        return free
+
+    def refresh_apartments(self, apartment_ids, using=None):
+        """Recompute the rows of `apartment_ids` once the current transaction commits, in one patch per property."""
+        apartment_ids = set(apartment_ids)
+        if apartment_ids:
+            self.changed_apartments.add(apartment_ids, using=using)
+
+    def patch(self, apartment_ids):
+        apartment_ids = set(apartment_ids)
+        by_property = {}
+        for apartment_id, property_id in Apartment.objects.filter(pk__in=apartment_ids).values_list('id', 'property_assigned_id'):
+            if property_id is not None:
+                by_property.setdefault(property_id, set()).add(apartment_id)
+        for property_id, ids in by_property.items():
+            referenceCache.patch(self.key(property_id), [availabilityTag(property_id)], lambda bitmap, ids=ids: self.patch_bitmap(bitmap, ids), timeout=self.timeout())
+
+    def patch_bitmap(self, bitmap, apartment_ids):
+        if any(apartment_id not in bitmap.rows for apartment_id in apartment_ids):
+            # An apartment the bitmap does not know yet: rebuild it instead
+            return MISSING
+        bitmap.clear(apartment_ids)
+        bitmap.fill((apartment_id, start, end) for property_id, apartment_id, start, end in self.stays(bitmap.origin, apartment_id__in=apartment_ids))
+        return bitmap
+
+    def invalidate(self, property_ids, using=None):
+        invalidateTags([availabilityTag(property_id) for property_id in property_ids if property_id is not None], using=using)
+
+
+availabilityIndex = AvailabilityIndex()
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-18 00:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ApartmentServices", "0005_alter_apartment_currency"),
+        ("UserServices", "0002_alter_user_currency"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="booking",
+            index=models.Index(
+                fields=["dateOfReservation", "id"],
+                name="ApartmentSe_dateOfR_d9ac12_idx",
+            ),
+        ),
+    ]
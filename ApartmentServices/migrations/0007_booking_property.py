@@ -0,0 +1,27 @@
+# Generated by Django 5.2.3 on 2026-10-18 01:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ApartmentServices", "0006_booking_apartmentse_dateofr_d9ac12_idx"),
+        ("PropertyServices", "0002_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="booking",
+            name="property",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="property_bookings",
+                to="PropertyServices.property",
+            ),
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+BATCH_SIZE = 1000
+
+
+def backfillBookingProperty(apps, schema_editor):
+    Booking = apps.get_model("ApartmentServices", "Booking")
+    BookingApartments = Booking.apartments.through
+    apartment_property = (
+        BookingApartments.objects.filter(
+            booking_id=OuterRef("pk"), apartment__property_assigned__isnull=False
+        )
+        .order_by("apartment_id")
+        .values("apartment__property_assigned_id")[:1]
+    )
+    # One UPDATE per batch of ids keeps each statement (and its row locks) short
+    last_pk = 0
+    while True:
+        pks = list(
+            Booking.objects.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:BATCH_SIZE]
+        )
+        if not pks:
+            break
+        Booking.objects.filter(pk__in=pks).update(
+            property_id=Subquery(apartment_property)
+        )
+        last_pk = pks[-1]
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("ApartmentServices", "0007_booking_property"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfillBookingProperty, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.3 on 2026-10-18 01:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ApartmentServices", "0008_backfill_booking_property"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ApartmentNight",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("night", models.DateField()),
+                (
+                    "apartment",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="nights",
+                        to="ApartmentServices.apartment",
+                    ),
+                ),
+                (
+                    "booking",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="nights",
+                        to="ApartmentServices.booking",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("apartment", "night"), name="unique_apartment_night"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+from datetime import timedelta
+
+from django.db import migrations
+from django.utils import timezone
+
+BATCH_SIZE = 1000
+RELEASED_STATUSES = ("cancelled", "checked_out")
+
+
+def stayNights(start, end):
+    # Frozen copy of ApartmentServices.models.stayNights: a day-use stay holds no night
+    first, last = timezone.localtime(start).date(), timezone.localtime(end).date()
+    return [first + timedelta(days=offset) for offset in range((last - first).days)]
+
+
+def backfillApartmentNights(apps, schema_editor):
+    Booking = apps.get_model("ApartmentServices", "Booking")
+    ApartmentNight = apps.get_model("ApartmentServices", "ApartmentNight")
+    BookingApartments = Booking.apartments.through
+    # Bookings already overlapping keep their nights on a first-come basis: the oldest booking
+    # is inserted first and the nights the others share with it are skipped
+    last_pk = 0
+    while True:
+        bookings = list(
+            Booking.objects.filter(pk__gt=last_pk)
+            .exclude(status__in=RELEASED_STATUSES)
+            .order_by("pk")
+            .values_list("pk", "startDate", "endDate")[:BATCH_SIZE]
+        )
+        if not bookings:
+            break
+        nights = {pk: stayNights(start, end) for pk, start, end in bookings}
+        links = BookingApartments.objects.filter(booking_id__in=nights).order_by(
+            "booking_id", "apartment_id"
+        )
+        ApartmentNight.objects.bulk_create(
+            [
+                ApartmentNight(
+                    apartment_id=apartment_id, night=night, booking_id=booking_id
+                )
+                for booking_id, apartment_id in links.values_list(
+                    "booking_id", "apartment_id"
+                )
+                for night in nights[booking_id]
+            ],
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        last_pk = bookings[-1][0]
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("ApartmentServices", "0009_apartmentnight"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfillApartmentNights, migrations.RunPython.noop),
+    ]
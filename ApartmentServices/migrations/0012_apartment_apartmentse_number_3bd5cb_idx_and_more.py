@@ -0,0 +1,65 @@
+# Generated by Django 5.2.3 on 2026-10-18 01:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ApartmentServices", "0010_backfill_apartment_nights"),
+        ("PropertyServices", "0006_property_propertyser_name_828f7e_idx_and_more"),
+        ("UserServices", "0003_alter_user_managers"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="apartment",
+            index=models.Index(
+                fields=["number", "id"], name="ApartmentSe_number_3bd5cb_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="apartment",
+            index=models.Index(
+                fields=["name", "id"], name="ApartmentSe_name_9809ce_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="apartment",
+            index=models.Index(
+                fields=["price", "id"], name="ApartmentSe_price_0812f3_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="apartment",
+            index=models.Index(
+                fields=["created_at", "id"], name="ApartmentSe_created_cc8bdc_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="booking",
+            index=models.Index(
+                fields=["startDate", "id"], name="ApartmentSe_startDa_4d96a4_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="booking",
+            index=models.Index(
+                fields=["endDate", "id"], name="ApartmentSe_endDate_a6dc53_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="refund",
+            index=models.Index(
+                fields=["created_at", "id"], name="ApartmentSe_created_53a04b_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="refund",
+            index=models.Index(
+                fields=["processed_at", "id"], name="ApartmentSe_process_6ba2f8_idx"
+            ),
+        ),
+    ]
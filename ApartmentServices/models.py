@@ -1,6 +1,66 @@
-from django.db import models
+from datetime import timedelta
+from django.db import IntegrityError, models, router, transaction
+from django.db.models import OuterRef, Subquery
 from django.utils import timezone
 from PropertyServices.models import Property
+from cleanswitch.cache import TaggedManager, TaggedQuerySet
+
+
+class ApartmentQuerySet(TaggedQuerySet):
+    def rows_changed(self, pks, fields=None):
+        super().rows_changed(pks, fields)
+        from ApartmentServices.availability import AVAILABILITY_FIELDS, availabilityIndex
+        from PropertyServices.rollups import APARTMENT_ROLLUP_FIELDS, dailyRollups
+        if fields is None or (AVAILABILITY_FIELDS | APARTMENT_ROLLUP_FIELDS).intersection(fields):
+            property_ids = set(Apartment.objects.filter(pk__in=pks).values_list('property_assigned_id', flat=True))
+            availabilityIndex.invalidate(property_ids, using=self.db)
+            dailyRollups.refresh_available(property_ids, using=self.db)
+        if fields is not None and APARTMENT_ROLLUP_FIELDS.intersection(fields):
+            # Moved apartments leave their bookings at the previous property until it is backfilled
+            dailyRollups.mark_bookings(Booking.objects.filter(apartments__in=pks).only('startDate', 'endDate').distinct(), using=self.db)
+
+
+class BookingQuerySet(TaggedQuerySet):
+    def rows_changed(self, pks, fields=None):
+        super().rows_changed(pks, fields)
+        from ApartmentServices.availability import OCCUPANCY_FIELDS, availabilityIndex
+        from PropertyServices.rollups import dailyRollups
+        if fields is not None and OCCUPANCY_FIELDS.intersection(fields):
+            apartment_ids = Booking.apartments.through.objects.filter(booking_id__in=pks).values_list('apartment_id', flat=True)
+            availabilityIndex.refresh_apartments(apartment_ids, using=self.db)
+            bookings = list(Booking.objects.using(self.db).filter(pk__in=pks).only('startDate', 'endDate', 'status'))
+            Booking.reserve_nights(bookings)
+            # The dates a bulk update replaced are gone: only the new ones are recomputed
+            dailyRollups.mark_bookings(bookings, using=self.db)
+
+
+def staySpan(start, end):
+    """(arrival, departure) local dates of a stay from `start` to `end`."""
+    return timezone.localtime(start).date(), timezone.localtime(end).date()
+
+
+def stayNights(start, end):
+    """
+    Local dates of the nights a stay from `start` to `end` holds, from its arrival to the day before its
+    departure. A day-use stay, starting and ending on the same day, holds no night: the ledger leaves its
+    overlaps to find_conflicts, which compares the datetimes, and the availability bitmaps and daily
+    rollups count no night for it either.
+    """
+    arrival, departure = staySpan(start, end)
+    return [arrival + timedelta(days=offset) for offset in range((departure - arrival).days)]
+
+
+class NightsUnavailable(IntegrityError):
+    """
+    Nights another booking already holds; `conflicts` is {apartment id: [booking ids]}. An
+    IntegrityError, raised from inside the write that took the nights, so any caller handling
+    database integrity errors (the admin, a view's transaction) rolls the whole write back.
+    """
+
+    def __init__(self, conflicts):
+        super().__init__(conflicts)
+        self.conflicts = conflicts
+
 
 class Apartment(models.Model):
     APARTMENT_TYPES = (
@@ -26,6 +86,16 @@ class Apartment(models.Model):
     is_active = models.BooleanField(default=True)
     created_at=models.DateTimeField(auto_now_add=True)
     updated_at=models.DateTimeField(auto_now=True)
+    objects = models.Manager.from_queryset(ApartmentQuerySet)()
+
+    class Meta:
+        indexes = [
+            # Orderings of the apartment lists (ApartmentSerializer.Meta.ordering_fields)
+            models.Index(fields=['number', 'id']),
+            models.Index(fields=['name', 'id']),
+            models.Index(fields=['price', 'id']),
+            models.Index(fields=['created_at', 'id']),
+        ]
 
     def __str__(self):
         return str(self.number)
@@ -40,6 +110,8 @@ class Booking(models.Model):
         ('upcoming', 'Upcoming'),
         ('active', 'Active')
     )
+    # Bookings in these states no longer hold their apartments
+    RELEASED_STATUSES = ('cancelled', 'checked_out')
     apartments = models.ManyToManyField(Apartment, blank=True, related_name='apartments_booking')
     guest = models.ForeignKey('UserServices.Guest', null=True, on_delete=models.CASCADE)
     dateOfReservation = models.DateTimeField(default=timezone.now)
@@ -50,6 +122,94 @@ class Booking(models.Model):
     startDate = models.DateTimeField()
     endDate = models.DateTimeField()
     updated_at = models.DateTimeField(auto_now=True)
+    # Denormalized property of the booked apartments, kept in sync by ApartmentServices.signals,
+    # so property-scoped queries filter on an indexed column instead of joining the apartments
+    property = models.ForeignKey(Property, on_delete=models.SET_NULL, blank=True, null=True, editable=False, related_name='property_bookings')
+    objects = models.Manager.from_queryset(BookingQuerySet)()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination seeks on (ordering field, id)
+            models.Index(fields=['dateOfReservation', 'id']),
+            models.Index(fields=['startDate', 'id']),
+            models.Index(fields=['endDate', 'id']),
+        ]
+
+    @classmethod
+    def find_conflicts(cls, apartments, start_date, end_date, exclude=None):
+        """
+        {apartment id: [booking ids]} of the bookings still holding any of `apartments` between
+        `start_date` and `end_date`, read in one query whatever the number of apartments.
+        """
+        links = cls.apartments.through.objects.filter(
+            apartment_id__in=[getattr(apartment, 'pk', apartment) for apartment in apartments],
+            booking__startDate__lt=end_date,
+            booking__endDate__gt=start_date,
+        ).exclude(booking__status__in=cls.RELEASED_STATUSES)
+        if exclude is not None:
+            links = links.exclude(booking_id=exclude)
+        conflicts = {}
+        for apartment_id, booking_id in links.order_by('apartment_id', 'booking_id').values_list('apartment_id', 'booking_id'):
+            conflicts.setdefault(apartment_id, []).append(booking_id)
+        return conflicts
+
+    @classmethod
+    def sync_properties(cls, booking_ids):
+        """
+        Recompute the denormalized property of `booking_ids` from their apartments, in one UPDATE.
+        The booking serializers keep a booking's apartments in one property (validateSingleProperty).
+        The UPDATE bypasses TaggedQuerySet.update() so updated_at, which the check-in KPIs read as the
+        check-in time, is left alone; the rows' tags are still invalidated.
+        """
+        booking_ids = list(booking_ids)
+        apartment_property = cls.apartments.through.objects.filter(
+            booking_id=OuterRef('pk'), apartment__property_assigned__isnull=False
+        ).order_by('apartment_id').values('apartment__property_assigned_id')[:1]
+        with transaction.atomic(savepoint=False):
+            rows = cls._base_manager.filter(pk__in=booking_ids).update(property_id=Subquery(apartment_property))
+            cls.objects.all().rows_changed(booking_ids, ['property_id'])
+        return rows
+
+    @classmethod
+    def reserve_nights(cls, bookings):
+        """
+        Rewrite the ApartmentNight rows of `bookings` from their dates, status and apartments: the
+        nights no longer held are deleted and the missing ones inserted in one bulk INSERT, whose
+        unique constraint rejects (NightsUnavailable) the nights another booking already holds.
+        Call it inside the transaction writing the bookings so a rejection rolls them back too.
+        """
+        bookings = {booking.pk: booking for booking in bookings}
+        if not bookings:
+            return
+        holding = [pk for pk, booking in bookings.items() if booking.status not in cls.RELEASED_STATUSES]
+        links = cls.apartments.through.objects.filter(booking_id__in=holding).values_list('booking_id', 'apartment_id')
+        wanted = {
+            (apartment_id, night, booking_id)
+            for booking_id, apartment_id in links
+            for night in stayNights(bookings[booking_id].startDate, bookings[booking_id].endDate)
+        }
+        stale = []
+        for pk, apartment_id, night, booking_id in ApartmentNight.objects.filter(booking_id__in=bookings).values_list('pk', 'apartment_id', 'night', 'booking_id'):
+            if (apartment_id, night, booking_id) in wanted:
+                wanted.discard((apartment_id, night, booking_id))
+            else:
+                stale.append(pk)
+        if stale:
+            ApartmentNight.objects.filter(pk__in=stale).delete()
+        if not wanted:
+            return
+        try:
+            # Savepoint, so the transaction is still usable to report the conflicts
+            with transaction.atomic():
+                ApartmentNight.objects.bulk_create(
+                    [ApartmentNight(apartment_id=apartment_id, night=night, booking_id=booking_id) for apartment_id, night, booking_id in wanted],
+                    batch_size=1000,
+                )
+        except IntegrityError:
+            conflicts = ApartmentNight.holders(wanted)
+            if not conflicts:
+                raise
+            raise NightsUnavailable(conflicts)
 
     def numOfDep(self):
         return Dependees.objects.filter(booking=self).count()
@@ -63,20 +223,53 @@ class Booking(models.Model):
         return f"No apartments - {self.guest}"
     
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        
-        # Update apartment statuses after saving
-        if self.apartments.exists():
-            for apartment in self.apartments.all():
-                if self.status == 'checked_in':
-                    apartment.inService = True
-                else:
-                    apartment.inService = False
-                apartment.save(update_fields=['inService'])
+        # The post_save receivers reserve the nights: a NightsUnavailable rolls the row back too
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(type(self), instance=self)):
+            super().save(*args, **kwargs)
+            
+            # Update apartment statuses after saving
+            if self.apartments.exists():
+                for apartment in self.apartments.all():
+                    if self.status == 'checked_in':
+                        apartment.inService = True
+                    else:
+                        apartment.inService = False
+                    apartment.save(update_fields=['inService'])
+
+class ApartmentNight(models.Model):
+    """
+    Reservation ledger: one row per night a booking holds an apartment, written by
+    Booking.reserve_nights. The unique (apartment, night) constraint is what keeps two
+    concurrent bookings from holding the same apartment on the same night.
+    """
+    apartment = models.ForeignKey(Apartment, on_delete=models.CASCADE, related_name='nights')
+    night = models.DateField()
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='nights')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['apartment', 'night'], name='unique_apartment_night'),
+        ]
+
+    @classmethod
+    def holders(cls, nights):
+        """{apartment id: [booking ids]} of the other bookings holding any of `nights` [(apartment id, night, booking id)]."""
+        wanted = {(apartment_id, night): booking_id for apartment_id, night, booking_id in nights}
+        rows = cls.objects.filter(
+            apartment_id__in={apartment_id for apartment_id, night in wanted},
+            night__range=(min(night for apartment_id, night in wanted), max(night for apartment_id, night in wanted)),
+        ).values_list('apartment_id', 'night', 'booking_id')
+        conflicts = {}
+        for apartment_id, night, booking_id in rows:
+            if wanted.get((apartment_id, night), booking_id) != booking_id:
+                conflicts.setdefault(apartment_id, set()).add(booking_id)
+        return {apartment_id: sorted(booking_ids) for apartment_id, booking_ids in sorted(conflicts.items())}
+
 
 class Dependees(models.Model):
     booking = models.ForeignKey(Booking, null=True, on_delete=models.CASCADE)
     name = models.CharField(max_length=100)
+    objects = TaggedManager()
 
     def str(self):
         return str(self.booking) + " " + str(self.name)
@@ -97,6 +290,13 @@ class Refund(models.Model):
     ), default='pending')
     processed_by = models.ForeignKey('UserServices.User', null=True, blank=True, on_delete=models.SET_NULL, related_name='refund_processed_by')
     updated_by = models.ForeignKey('UserServices.User', null=True, blank=True, on_delete=models.SET_NULL, related_name='refund_updated_by')
+    objects = TaggedManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['processed_at', 'id']),
+        ]
 
     def __str__(self):
         return str(self.guest)
@@ -114,6 +314,7 @@ class RoomServices(models.Model):
     createdDate = models.DateField(default=timezone.now)
     servicesType = models.CharField(max_length=20, choices=SERVICES_TYPES)
     price = models.FloatField()
+    objects = TaggedManager()
 
     def str(self):
         return str(self.curBooking) + " " + str(self.apartment) + " " + str(self.servicesType)
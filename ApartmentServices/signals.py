@@ -0,0 +1,62 @@
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from ApartmentServices.availability import AVAILABILITY_FIELDS, OCCUPANCY_FIELDS, availabilityIndex
+from ApartmentServices.models import Apartment, Booking
+
+
+@receiver(m2m_changed, sender=Booking.apartments.through)
+def syncBookingProperty(sender, instance, action, reverse, pk_set, using=None, **kwargs):
+    if action == 'pre_clear':
+        # The links are only known before they are deleted
+        if reverse:
+            instance._cleared_booking_ids = list(instance.apartments_booking.values_list('pk', flat=True))
+        else:
+            instance._cleared_apartment_ids = list(instance.apartments.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        Booking.sync_properties(pk_set if reverse else [instance.pk])
+        availabilityIndex.refresh_apartments([instance.pk] if reverse else pk_set, using=using)
+        Booking.reserve_nights(Booking.objects.filter(pk__in=pk_set) if reverse else [instance])
+    elif action == 'post_clear':
+        booking_ids = instance.__dict__.pop('_cleared_booking_ids', ()) if reverse else [instance.pk]
+        Booking.sync_properties(booking_ids)
+        availabilityIndex.refresh_apartments([instance.pk] if reverse else instance.__dict__.pop('_cleared_apartment_ids', ()), using=using)
+        Booking.reserve_nights(Booking.objects.filter(pk__in=booking_ids) if reverse else [instance])
+
+
+@receiver(post_save, sender=Booking)
+def refreshBookingAvailability(sender, instance, created=False, raw=False, update_fields=None, using=None, **kwargs):
+    # New bookings get their apartments afterwards, through the m2m
+    if created or raw or update_fields is not None and not OCCUPANCY_FIELDS.intersection(update_fields):
+        return
+    availabilityIndex.refresh_apartments(instance.apartments.values_list('pk', flat=True), using=using)
+    Booking.reserve_nights([instance])
+
+
+@receiver(pre_delete, sender=Booking)
+def releaseBookingAvailability(sender, instance, using=None, **kwargs):
+    availabilityIndex.refresh_apartments(instance.apartments.values_list('pk', flat=True), using=using)
+
+
+@receiver(pre_save, sender=Apartment)
+def rememberApartmentProperty(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._previous_property_id = None
+    if not raw and instance.pk is not None and not instance._state.adding and (update_fields is None or 'property_assigned' in update_fields):
+        instance._previous_property_id = sender._base_manager.filter(pk=instance.pk).values_list('property_assigned_id', flat=True).first()
+
+
+@receiver(post_save, sender=Apartment)
+def syncMovedApartment(sender, instance, created=False, raw=False, update_fields=None, using=None, **kwargs):
+    if raw:
+        return
+    if created or update_fields is None or AVAILABILITY_FIELDS.intersection(update_fields):
+        availabilityIndex.invalidate({instance.property_assigned_id, getattr(instance, '_previous_property_id', None)}, using=using)
+    if created or update_fields is not None and 'property_assigned' not in update_fields:
+        return
+    booking_ids = list(instance.apartments_booking.exclude(property_id=instance.property_assigned_id).values_list('pk', flat=True))
+    if booking_ids:
+        Booking.sync_properties(booking_ids)
+
+
+@receiver(post_delete, sender=Apartment)
+def dropApartmentAvailability(sender, instance, using=None, **kwargs):
+    availabilityIndex.invalidate([instance.property_assigned_id], using=using)
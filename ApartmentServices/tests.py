@@ -1,3 +1,290 @@
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from ApartmentServices.availability import availabilityTag
+from ApartmentServices.models import Apartment, ApartmentNight, Booking, NightsUnavailable
+from PropertyServices.kpis import computeKpis
+from PropertyServices.models import Property
+from UserServices.models import Guest, User
+from cleanswitch.cache import objectTag, referenceCache
+
+
+class BookingAPITestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', role='admin', is_superuser=True)
+        cls.property = Property.objects.create(name='Main', address='1 Street')
+        cls.apartments = [
+            Apartment.objects.create(
+                number=number, name=f'Apt {number}', property_assigned=cls.property, capacity=2,
+                numberOfBeds=1, apartmentType='normal', price=100, added_by_user_id=cls.admin,
+            )
+            for number in range(3)
+        ]
+        guest_user = User.objects.create(username='guest', role='guest', email='guest@example.com')
+        cls.guest = Guest.objects.create(user=guest_user)
+        cls.now = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def book(self, apartments, start, nights, **extra):
+        booking = Booking.objects.create(
+            guest=self.guest, startDate=self.now + timedelta(days=start),
+            endDate=self.now + timedelta(days=start + nights), status='confirmed',
+            added_by_user_id=self.admin, **extra,
+        )
+        booking.apartments.set(apartments)
+        return booking
+
+
+class PropertyAccessTests(BookingAPITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other = Property.objects.create(name='Other', address='2 Street')
+        cls.elsewhere = Apartment.objects.create(number=9, name='Elsewhere', property_assigned=cls.other, apartmentType='normal', price=80)
+        cls.receptionist = User.objects.create(username='desk', role='receptionist')
+        cls.receptionist.properties_assigned.set([cls.property])
+
+    def setUp(self):
+        super().setUp()
+        # Assigned properties cached by earlier tests outlive cache.clear() in the local tier
+        referenceCache.invalidate([objectTag(User, self.receptionist.pk)])
+        self.client.force_authenticate(self.receptionist)
+
+    def test_lists_are_restricted_to_assigned_properties(self):
+        response = self.client.get('/api/apartments/', secure=True)
+        self.assertEqual(sorted(row['id'] for row in response.json()['data']['data']), [apartment.pk for apartment in self.apartments])
+        booking = self.book(self.apartments[:1], 1, 1)
+        self.book([self.elsewhere], 1, 1)
+        response = self.client.get('/api/bookings/', secure=True)
+        self.assertEqual([row['id'] for row in response.json()['data']['data']], [booking.pk])
+
+    def test_other_properties_are_forbidden(self):
+        self.assertEqual(self.client.get(f'/api/properties/{self.property.pk}/bookings/', secure=True).status_code, 200)
+        self.assertEqual(self.client.get(f'/api/properties/{self.other.pk}/bookings/', secure=True).status_code, 403)
+        self.assertEqual(self.client.get(f'/api/properties/{self.other.pk + 100}/bookings/', secure=True).status_code, 404)
+
+
+class AvailabilitySearchTests(BookingAPITestCase):
+    def setUp(self):
+        super().setUp()
+        # Bitmaps of earlier tests outlive cache.clear() in the local tier
+        referenceCache.invalidate([availabilityTag(self.property.pk)])
+
+    def search(self, start, end, **params):
+        params.update(start=(self.now + timedelta(days=start)).date().isoformat(), end=(self.now + timedelta(days=end)).date().isoformat())
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get('/api/available/apartments/search/', params, secure=True)
+        self.assertEqual(response.status_code, 200)
+        return sorted(row['id'] for row in json.loads(b''.join(response.streaming_content)))
+
+    def test_booked_nights_are_excluded(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book(self.apartments[:1], 1, 2)
+        free = [apartment.pk for apartment in self.apartments[1:]]
+        self.assertEqual(self.search(1, 3), free)
+        self.assertEqual(self.search(2, 4), free)
+        self.assertEqual(self.search(3, 5), [apartment.pk for apartment in self.apartments])
+
+    def test_changes_reach_the_index(self):
+        self.assertEqual(len(self.search(1, 3)), 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = self.book(self.apartments[1:2], 1, 2)
+        self.assertNotIn(self.apartments[1].pk, self.search(1, 3))
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.filter(pk=booking.pk).update(status='cancelled')
+        self.assertIn(self.apartments[1].pk, self.search(1, 3))
+
+    def test_day_use_stays_hold_no_night(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            day_use = self.book(self.apartments[:1], 1, 0)
+            Booking.objects.filter(pk=day_use.pk).update(startDate=self.now + timedelta(days=1, hours=-3), endDate=self.now + timedelta(days=1, hours=-1))
+        self.assertFalse(ApartmentNight.objects.filter(booking=day_use).exists())
+        self.assertEqual(self.search(1, 2), [apartment.pk for apartment in self.apartments])
+
+    def test_other_properties_are_forbidden(self):
+        receptionist = User.objects.create(username='desk', role='receptionist')
+        receptionist.properties_assigned.set([Property.objects.create(name='Other', address='2 Street')])
+        referenceCache.invalidate([objectTag(User, receptionist.pk)])
+        self.client.force_authenticate(receptionist)
+        params = {'property_id': self.property.pk, 'start': '2030-01-01', 'end': '2030-01-02'}
+        self.assertEqual(self.client.get('/api/available/apartments/search/', params, secure=True).status_code, 403)
+
+    def test_filters_and_invalid_ranges(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Apartment.objects.filter(pk=self.apartments[2].pk).update(capacity=4)
+        self.assertEqual(self.search(1, 3, min_capacity=3), [self.apartments[2].pk])
+        response = self.client.get('/api/available/apartments/search/', {'start': '2030-01-02', 'end': '2030-01-01'}, secure=True)
+        self.assertEqual(response.status_code, 400)
+
+
+class SparseFieldsetTests(BookingAPITestCase):
+    def test_sparse_fieldset_with_relations(self):
+        booking = self.book(self.apartments[:2], 1, 2)
+        response = self.client.get('/api/bookings/', {'fields': 'id,apartments,guest'}, secure=True)
+        self.assertEqual(response.status_code, 200)
+        row = response.json()['data']['data'][0]
+        self.assertEqual(set(row), {'id', 'apartments', 'guest'})
+        self.assertEqual(row['id'], booking.pk)
+        self.assertEqual(sorted(row['apartments']), [apartment.pk for apartment in self.apartments[:2]])
+        self.assertEqual(row['guest'], self.guest.pk)
+
+
+class NightLedgerTests(BookingAPITestCase):
+    def booking_body(self, apartments, start, nights, **extra):
+        return {
+            'apartments': [apartment.pk for apartment in apartments],
+            'startDate': (self.now + timedelta(days=start)).isoformat(),
+            'endDate': (self.now + timedelta(days=start + nights)).isoformat(),
+            'first_name': 'New', 'last_name': 'Guest', 'phone': '555', 'email': 'new@example.com',
+            'status': 'confirmed', **extra,
+        }
+
+    def test_booking_holds_one_night_per_apartment(self):
+        booking = self.book(self.apartments[:2], 1, 3)
+        self.assertEqual(ApartmentNight.objects.filter(booking=booking).count(), 6)
+
+    def test_overlapping_create_is_rejected_before_saving(self):
+        held = self.book(self.apartments[:1], 1, 3)
+        users = User.objects.count()
+        response = self.client.post('/api/apartments/bookings/', self.booking_body(self.apartments[:2], 2, 1), format='json', secure=True)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(f'#{held.pk}', str(response.json()))
+        self.assertEqual(User.objects.count(), users)
+
+    def test_free_create_reserves_nights(self):
+        response = self.client.post('/api/apartments/bookings/', self.booking_body(self.apartments[:2], 10, 2), format='json', secure=True)
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(ApartmentNight.objects.filter(apartment__in=self.apartments[:2]).count(), 4)
+
+    def test_ledger_rejects_nights_the_pre_check_missed(self):
+        held = self.book(self.apartments[:1], 1, 3)
+        booking = self.book([], 5, 2)
+        booking.apartments.set(self.apartments[:1])
+        booking.startDate = held.startDate
+        with self.assertRaises(NightsUnavailable) as raised:
+            booking.save()
+        self.assertIsInstance(raised.exception, IntegrityError)
+        self.assertEqual(raised.exception.conflicts, {self.apartments[0].pk: [held.pk]})
+        booking.refresh_from_db()
+        self.assertEqual(booking.startDate, self.now + timedelta(days=5))
+
+    def test_queryset_update_conflict_rolls_the_update_back(self):
+        held = self.book(self.apartments[:1], 1, 3)
+        booking = self.book(self.apartments[:1], 5, 2)
+        with self.assertRaises(NightsUnavailable), transaction.atomic():
+            Booking.objects.filter(pk=booking.pk).update(startDate=held.startDate)
+        booking.refresh_from_db()
+        self.assertEqual(booking.startDate, self.now + timedelta(days=5))
+        self.assertEqual(ApartmentNight.objects.filter(booking=booking).count(), 2)
+
+    def test_released_bookings_free_their_nights(self):
+        booking = self.book(self.apartments[:1], 1, 3)
+        Booking.objects.filter(pk=booking.pk).update(status='checked_out')
+        self.assertFalse(ApartmentNight.objects.filter(booking=booking).exists())
+        self.book(self.apartments[:1], 1, 3)
+
+    def test_day_use_stays_compare_datetimes(self):
+        morning = Booking.objects.create(
+            guest=self.guest, startDate=self.now + timedelta(days=1, hours=-3), endDate=self.now + timedelta(days=1, hours=-1),
+            status='confirmed', added_by_user_id=self.admin,
+        )
+        morning.apartments.set(self.apartments[:1])
+        self.assertFalse(ApartmentNight.objects.filter(booking=morning).exists())
+
+        afternoon = self.booking_body(self.apartments[:1], 1, 0)
+        afternoon['endDate'] = (self.now + timedelta(days=1, hours=4)).isoformat()
+        response = self.client.post('/api/apartments/bookings/', afternoon, format='json', secure=True)
+        self.assertEqual(response.status_code, 201, response.content)
+
+        overlapping = dict(afternoon, startDate=(self.now + timedelta(days=1, hours=-2)).isoformat(), phone='556', email='other@example.com')
+        response = self.client.post('/api/apartments/bookings/', overlapping, format='json', secure=True)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(f'#{morning.pk}', str(response.json()))
+
+
+class ListOrderingTests(BookingAPITestCase):
+    def test_declared_orderings_are_accepted(self):
+        bookings = [self.book(self.apartments[:1], start, 1) for start in (1, 5, 3)]
+        response = self.client.get('/api/bookings/', {'ordering': '-startDate'}, secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.json()['data']['data']], [bookings[1].pk, bookings[2].pk, bookings[0].pk])
+        response = self.client.get('/api/apartments/', {'ordering': '-created_at'}, secure=True)
+        self.assertEqual(response.status_code, 200)
+
+    def test_unindexed_and_alias_orderings_are_rejected(self):
+        for ordering in ('added_by_user_id_id', 'pk', 'status'):
+            response = self.client.get('/api/bookings/', {'ordering': ordering}, secure=True)
+            self.assertEqual(response.status_code, 400, ordering)
+            self.assertIn('Allowed: dateOfReservation, endDate, id, startDate', response.json()['ordering'][0])
+
+
+class BookingPropertyTests(BookingAPITestCase):
+    def test_booking_takes_its_apartments_property(self):
+        booking = self.book(self.apartments[:2], 1, 1)
+        booking.refresh_from_db()
+        self.assertEqual(booking.property_id, self.property.pk)
+
+    def test_apartments_of_several_properties_are_rejected(self):
+        other = Property.objects.create(name='Other', address='2 Street')
+        elsewhere = Apartment.objects.create(number=9, name='Elsewhere', property_assigned=other, apartmentType='normal', price=80)
+        body = {
+            'apartments': [self.apartments[0].pk, elsewhere.pk],
+            'startDate': (self.now + timedelta(days=1)).isoformat(), 'endDate': (self.now + timedelta(days=2)).isoformat(),
+            'first_name': 'New', 'last_name': 'Guest', 'phone': '555', 'email': 'new@example.com', 'status': 'confirmed',
+        }
+        response = self.client.post('/api/apartments/bookings/', body, format='json', secure=True)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('apartments', response.json())
+
+        booking = self.book(self.apartments[:1], 1, 1)
+        response = self.client.patch(f'/api/apartments/bookings/{booking.pk}/', {'apartments': [self.apartments[0].pk, elsewhere.pk]}, format='json', secure=True)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(booking.apartments.values_list('pk', flat=True)), [self.apartments[0].pk])
+
+    def test_apartment_move_keeps_the_check_in_time(self):
+        other = Property.objects.create(name='Other', address='2 Street')
+        booking = self.book(self.apartments[:1], -2, 3)
+        checked_in_at = self.now - timedelta(days=2)
+        Booking.objects.filter(pk=booking.pk).update(status='checked_in', updated_at=checked_in_at)
+        check_ins = lambda pk: {name: computeKpis(pk)[name] for name in ('number_of_check_ins', 'total_checkin')}
+        figures = check_ins(self.property.pk)
+
+        apartment = Apartment.objects.get(pk=self.apartments[0].pk)
+        apartment.property_assigned = other
+        apartment.save()
+        booking.refresh_from_db()
+        self.assertEqual((booking.property_id, booking.updated_at), (other.pk, checked_in_at))
+        # The check-in moves with its booking but keeps its date
+        self.assertEqual(check_ins(other.pk), figures)
+        self.assertEqual(check_ins(self.property.pk), {'number_of_check_ins': 0, 'total_checkin': 0})
+
+
+class RepresentationCacheTests(BookingAPITestCase):
+    def representation_lookups(self, url, page_size):
+        cache.clear()
+        with mock.patch('cleanswitch.Helpers.cache', wraps=cache) as wrapped:
+            self.assertEqual(self.client.get(url, {'pageSize': page_size}, secure=True).status_code, 200)
+        return sum(1 for call in wrapped.get_many.call_args_list if any(key.startswith('representation:') for key in call.args[0]))
+
+    def test_top_level_page_is_one_lookup(self):
+        self.assertEqual(self.representation_lookups('/api/apartments/', 1), 1)
+        self.assertEqual(self.representation_lookups('/api/apartments/', 3), 1)
 
-# Create your tests here.
+    def test_nested_lists_are_not_looked_up_per_row(self):
+        for start in range(3):
+            self.book(self.apartments[:2], start * 2, 1)
+        url = f'/api/properties/{self.property.pk}/bookings/'
+        self.assertEqual(self.representation_lookups(url, 1), 0)
+        self.assertEqual(self.representation_lookups(url, 3), 0)
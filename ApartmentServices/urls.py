@@ -8,6 +8,7 @@ urlpatterns = [
     path('apartments/bookings/', ApartmentController.BookingCreateAPIView.as_view(), name='apartments-bookings'),
     path('apartments/bookings/<int:pk>/', ApartmentController.BookingRetrieveUpdateDestroyAPIView.as_view(), name='apartments-bookings-retrieve-update-destroy'),
     path('available/apartments/', ApartmentController.ListAvailableApartmentAPIView.as_view(), name='available-apartments'),
+    path('available/apartments/search/', ApartmentController.ApartmentAvailabilitySearchAPIView.as_view(), name='available-apartments-search'),
     path('apartments/mixed-up/', ApartmentController.ListApartmentAPIView.as_view(), name='apartments-mixed-up'),
     path('bookings/', ApartmentController.BookingListAPIView.as_view(), name='bookings-list'),
     path('bookings/<int:pk>/process_refund/', ApartmentController.BookingRefundAPIView.as_view(), name='booking-process-refund'),
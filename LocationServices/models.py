@@ -1,5 +1,6 @@
 from django.db import models
 from UserServices.models import User
+from cleanswitch.cache import TaggedManager
 
 class StaffLocation(models.Model):
     staff = models.ForeignKey(User, on_delete=models.CASCADE, related_name='locations')
@@ -8,6 +9,7 @@ class StaffLocation(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
     isOnDuty = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
+    objects = TaggedManager()
     
     class Meta:
         ordering = ['-timestamp']
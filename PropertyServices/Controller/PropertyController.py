@@ -1,5 +1,3 @@
-from datetime import timedelta
-from django.utils import timezone
 from django.shortcuts import get_object_or_404
 from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIView, ListAPIView
 from rest_framework.response import Response
@@ -7,17 +5,18 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from PropertyServices.Serializers import PropertySerializer
 from ApartmentServices.Serializers import ApartmentSerializer, BookingListSerializer, RefundSerializer
-from ApartmentServices.models import Apartment, Booking, Refund
-from cleanswitch.Helpers import CustomPageNumberPagination, CommonListAPIMixin
-from PropertyServices.models import Property
+from ApartmentServices.models import Booking, Refund
+from cleanswitch.Helpers import CustomPageNumberPagination, CommonListAPIMixin, ConditionalRetrieveMixin, StreamingListMixin, cacheResponse, parseBoolean, parseQueryParam, propertyAccess
+from PropertyServices.kpis import kpiSnapshot
+from PropertyServices.models import Property, PropertyDailyOccupancy
+from PropertyServices.rollups import GRANULARITIES, daterange, dailyRollups, revenueReport
 from UserServices.models import Guest
 from UserServices.Serializers import GuestListSerializer, UserSerializerWithFilters
 from TaskServices.Serializers import TaskSerializerWithFilters, TaskTemplateSerializer
-from TaskServices.models import Task
 from cleanswitch.permissions import IsAdmin, IsReceptionist
 from rest_framework.views import APIView
-from rest_framework.exceptions import PermissionDenied
-from django.db.models import Count, F, ExpressionWrapper, fields
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from django.utils.dateparse import parse_date
 
 class CreateListPropertyAPIView(ListCreateAPIView):
     serializer_class = PropertySerializer
@@ -29,13 +28,14 @@ class CreateListPropertyAPIView(ListCreateAPIView):
         if user.role == 'admin' or user.is_superuser:
             return Property.objects.all()
         else :
-            return user.properties_assigned.filter(is_active=True)
+            return Property.objects.filter(is_active=True, **propertyAccess(self.request).filter('id'))
 
     def perform_create(self, serializer):
         if self.request.user.role != 'admin':
             raise PermissionDenied("Only admins can create properties.")
         serializer.save(added_by_user_id=self.request.user)
 
+    @cacheResponse(local=True)
     @CommonListAPIMixin.common_list_decorator(PropertySerializer)
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
@@ -47,16 +47,15 @@ class ApartmentListByPropertyAPIView(ListAPIView):
     def get_queryset(self):
         user = self.request.user
         property_id = self.kwargs.get('property_id')
-        property = get_object_or_404(Property, id=property_id)
-        if user.role != 'admin' and not user.is_superuser:
-            if not user.properties_assigned.filter(id=property_id).exists():
-                raise PermissionDenied("You don't have access to this property")
+        # Check if user has access to this property
+        property = propertyAccess(self.request).get_property(property_id)
             
         if user.role == 'admin' or user.is_superuser == True:
             apartments = property.apartments.all().order_by('-created_at')
         else:
             apartments = property.apartments.filter(is_active=True).order_by('-created_at')
         return apartments
+    @cacheResponse(local=True)
     @CommonListAPIMixin.common_list_decorator(ApartmentSerializer)
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
@@ -68,17 +67,15 @@ class TaskListByPropertyAPIView(ListAPIView):
     def get_queryset(self):
         user = self.request.user
         property_id = self.kwargs.get('property_id')
-        property = get_object_or_404(Property, id=property_id)
-        if user.role != 'admin' and not user.is_superuser:
-            if not user.properties_assigned.filter(id=property_id).exists():
-                raise PermissionDenied("You don't have access to this property")
+        # Check if user has access to this property
+        property = propertyAccess(self.request).get_property(property_id)
         if user.role == "manager":
             tasks = property.property_tasks.filter(property_assigned__is_active=True, property_assigned__id=property.id)
         elif user.role == "admin" or user.is_superuser == True:
             tasks = property.property_tasks.filter(property_assigned__id=property.id,)
         elif user.role == "receptionist":
             tasks = property.property_tasks.filter(
-                property_assigned__in=user.properties_assigned.all(),
+                **propertyAccess(self.request).filter('property_assigned'),
                 property_assigned__is_active=True,
                 property_assigned__id=property.id,
                 active=True,
@@ -99,10 +96,8 @@ class UserListByPropertyAPIView(ListAPIView):
     def get_queryset(self):
         user = self.request.user
         property_id = self.kwargs.get('property_id')
-        property_obj = get_object_or_404(Property, id=property_id)
-        if user.role != 'admin' and not user.is_superuser:
-            if not user.properties_assigned.filter(id=property_id).exists():
-                raise PermissionDenied("You don't have access to this property")
+        # Check if user has access to this property
+        property_obj = propertyAccess(self.request).get_property(property_id)
         # Get all users assigned to this property
         users = property_obj.assigned_users.all()
         
@@ -122,17 +117,15 @@ class UserListByPropertyAPIView(ListAPIView):
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
-class StaffListByPropertyAPIView(ListAPIView):
+class StaffListByPropertyAPIView(StreamingListMixin, ListAPIView):
     serializer_class = UserSerializerWithFilters
     permission_classes = [IsAuthenticated]
     pagination_class = None
     def get_queryset(self):
         user = self.request.user
         property_id = self.kwargs.get('property_id')
-        property_obj = get_object_or_404(Property, id=property_id)
-        if user.role != 'admin' and not user.is_superuser:
-            if not user.properties_assigned.filter(id=property_id).exists():
-                raise PermissionDenied("You don't have access to this property")
+        # Check if user has access to this property
+        property_obj = propertyAccess(self.request).get_property(property_id)
         # Get all users assigned to this property
         users = property_obj.assigned_users.all()
         
@@ -158,15 +151,12 @@ class BookingListByPropertyAPIView(ListAPIView):
     def get_queryset(self):
         user = self.request.user
         property_id = self.kwargs.get('property_id')
-        property_obj = get_object_or_404(Property, id=property_id)
         # Check if user has access to this property
-        if user.role != 'admin' and not user.is_superuser:
-            if not user.properties_assigned.filter(id=property_id).exists():
-                raise PermissionDenied("You don't have access to this property")
+        property_obj = propertyAccess(self.request).get_property(property_id)
         
         # Get bookings for apartments in this property
         return Booking.objects.filter(
-            apartments__property_assigned=property_obj
+            property=property_obj
         ).select_related('guest').order_by('-dateOfReservation')
     @CommonListAPIMixin.common_list_decorator(BookingListSerializer)
     def list(self, request, *args, **kwargs):
@@ -179,11 +169,8 @@ class GuestListByPropertyAPIView(ListAPIView):
     def get_queryset(self):
         user = self.request.user
         property_id = self.kwargs.get('property_id')
-        property_obj = get_object_or_404(Property, id=property_id)
         # Check if user has access to this property
-        if user.role != 'admin' and not user.is_superuser:
-            if not user.properties_assigned.filter(id=property_id).exists():
-                raise PermissionDenied("You don't have access to this property")
+        property_obj = propertyAccess(self.request).get_property(property_id)
         
         # Get Guests for this property
         users = property_obj.assigned_users.all()
@@ -200,17 +187,15 @@ class TaskTemplateListByPropertyAPIView(ListAPIView):
     def get_queryset(self):
         user = self.request.user
         property_id = self.kwargs.get('property_id')
-        property_obj = get_object_or_404(Property, id=property_id)
         # Check if user has access to this property
-        if user.role != 'admin' and not user.is_superuser:
-            if not user.properties_assigned.filter(id=property_obj.id).exists():
-                raise PermissionDenied("You don't have access to this property")     
+        property_obj = propertyAccess(self.request).get_property(property_id)
         if user.role == "admin" or user.is_superuser == True:
             tasks_template = property_obj.property_task_template.all()
         else:
             tasks_template = property_obj.property_task_template.filter(active=True)
         return tasks_template
     
+    @cacheResponse(local=True)
     @CommonListAPIMixin.common_list_decorator(TaskTemplateSerializer)
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
@@ -223,10 +208,8 @@ class AvailableApartmentListByPropertyAPIView(ListAPIView):
     def get_queryset(self):
         user = self.request.user
         property_id = self.kwargs.get('property_id')
-        property_obj = get_object_or_404(Property, id=property_id)
-        if user.role != 'admin' and not user.is_superuser:
-            if not user.properties_assigned.filter(id=property_obj.id).exists():
-                raise PermissionDenied("You don't have access to this property")
+        # Check if user has access to this property
+        property_obj = propertyAccess(self.request).get_property(property_id)
             
         if user.role == "admin" or user.is_superuser:
             queryset = property_obj.apartments.filter(is_active=True).order_by('-created_at')
@@ -234,7 +217,7 @@ class AvailableApartmentListByPropertyAPIView(ListAPIView):
             queryset = property_obj.apartments.filter(
                 is_active=True, 
                 inService=False,
-                property_assigned__in=user.properties_assigned.all()
+                **propertyAccess(self.request).filter('property_assigned')
             ).order_by('-created_at')
         
         return queryset
@@ -247,10 +230,8 @@ class RefundListByPropertyAPIView(ListAPIView):
     def get_queryset(self):
         user = self.request.user
         property_id = self.kwargs.get('property_id')
-        property_obj = get_object_or_404(Property, id=property_id)
-        if user.role != 'admin' and not user.is_superuser:
-            if not user.properties_assigned.filter(id=property_obj.id).exists():
-                raise PermissionDenied("You don't have access to this property")
+        # Check if user has access to this property
+        property_obj = propertyAccess(self.request).get_property(property_id)
         guests = Guest.objects.filter(user__in = property_obj.assigned_users.all())
         queryset = Refund.objects.filter(guest__in = guests).select_related(
             'guest', 'reservation', 'processed_by'
@@ -261,7 +242,7 @@ class RefundListByPropertyAPIView(ListAPIView):
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
         
-class RetrieveUpdateDeletePropertyAPIView(RetrieveUpdateDestroyAPIView):
+class RetrieveUpdateDeletePropertyAPIView(ConditionalRetrieveMixin, RetrieveUpdateDestroyAPIView):
     queryset = Property.objects.all()
     serializer_class = PropertySerializer
     pagination_class = None
@@ -288,147 +269,91 @@ class RetrieveUpdateDeletePropertyAPIView(RetrieveUpdateDestroyAPIView):
 
 class PropertyStatsAPIView(APIView):
     """
-    A view to return key performance indicators (KPIs) for the dashboard.
+    A view to return key performance indicators (KPIs) for the dashboard, read from the property's
+    snapshot (PropertyServices.kpis) refreshed every few minutes by Celery beat. `refresh=true`
+    recomputes it on demand.
     """
     permission_classes = [IsReceptionist]
+
     def get(self, request, *args, **kwargs):
         # Filter data for the current property if available
         # You'll need to pass the property ID in the request, e.g., in the URL or query params
         property_id = request.query_params.get('property_id')
         property = get_object_or_404(Property, id=property_id)
-        
-        # Get the current month and year
-        today = timezone.now()
-        current_month_start = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        current_month_end = current_month_start + timedelta(days=32) # A safe bet
+        refresh = parseQueryParam(request.query_params, 'refresh', parseBoolean) or False
+        snapshot = kpiSnapshot(property.id, refresh=refresh)
+        return Response({**snapshot['data'], 'computed_at': snapshot['computed_at']})
 
-        # 1. Total Number of Guests
-        total_guests = Guest.objects.filter(
-        booking__apartments__property_assigned_id=property.id,
-        booking__dateOfReservation__gte=current_month_start,
-        booking__dateOfReservation__lte=current_month_end
-        ).distinct().count()
 
-        # Count total reservations for a given property
-        total_month_reservations = Booking.objects.filter(
-            dateOfReservation__gte=current_month_start,
-            dateOfReservation__lte=current_month_end,
-            apartments__property_assigned_id=property.id
-        ).exclude(status__in = ['checked_in', 'checked_out']).count()
-        
-        # 3. Occupancy Rate
-        # To calculate this, you need the total available room-nights
-        total_apartments = Apartment.objects.filter(property_assigned__id=property.id).count()
-        currency = Apartment.objects.filter(property_assigned__id=property.id).values_list('currency')
-        today = timezone.now().date()
-        
-        # Count apartments with 'checked_in' status today
-        occupied_apartments_today = Booking.objects.filter(
-            status='checked_in',
-            startDate__lte=today,
-            endDate__gte=today,
-            apartments__id=property.id
-        ).count()
-        
-        occupancy_rate = (occupied_apartments_today / total_apartments) * 100 if total_apartments > 0 else 0
-        
-        # 4. Current Month's Income
-        current_month = timezone.now().month
-        current_year = timezone.now().year
-        
-        # Assumes price is stored on the Booking model or can be accessed from the Apartment
-        # We'll calculate based on active bookings within the current month
-        bookings_this_month = Booking.objects.filter(
-            dateOfReservation__gte=current_month_start,
-            dateOfReservation__lte=current_month_end,
-            apartments__property_assigned_id=property.id
-        ).prefetch_related("apartments")
-        
-        total_income_this_month = sum(
-            apartment.price * (booking.endDate - booking.startDate).days
-            for booking in bookings_this_month
-            for apartment in booking.apartments.all()
-        )
+class PropertyOccupancyAPIView(APIView):
+    """
+    Daily occupancy of a property from `start` to `end` (YYYY-MM-DD, both included), read from the
+    PropertyDailyOccupancy rollup in one range scan. Dates without a row had no stay.
+    """
+    permission_classes = [IsAuthenticated, IsReceptionist]
+    max_days = 731
 
+    def get(self, request, property_id):
+        property = propertyAccess(request).get_property(property_id)
+        start_date = parseQueryParam(request.query_params, 'start', parse_date, required=True)
+        end_date = parseQueryParam(request.query_params, 'end', parse_date, required=True)
+        if end_date < start_date:
+            raise ValidationError({'end': 'End date must not be before start date.'})
+        if (end_date - start_date).days >= self.max_days:
+            raise ValidationError({'end': f'At most {self.max_days} days can be requested at once.'})
 
-        # 5. Number of Today Check-ins
-        today_start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        today_end = today_start + timedelta(days=1)
-        
-        number_of_check_ins = Booking.objects.filter(
-            status='checked_in',
-            updated_at__gte=today_start,
-            updated_at__lte=today_end,
-            apartments__id=property.id
-        ).count()
-        
-        # Monthly Check ins 
-        total_check_ins = Booking.objects.filter(
-            status='checked_in',
-            updated_at__gte=current_month_start,
-            updated_at__lte=current_month_end,
-            apartments__id=property.id
-        ).count()
-        
-        # 6. Number of Guests Registered per day in the current week
-        today = timezone.now()
-        start_of_week = today - timedelta(days=today.weekday())
-        
-        # 7. Total Pending Task
-        total_pending_tasks = Task.objects.filter(
-            status="pending",
-            property_assigned__id=property.id,
-            active=True
-        ).count()
-        # 8. Total Reservations
-        total_reservations = Booking.objects.filter(
-            apartments__property_assigned_id=property.id
-        ).count()
-        
-         # 9. Total Guest
-        total_register_guests = Guest.objects.filter(
-            booking__apartments__property_assigned_id=property.id,
-        ).distinct().count()
-        
-        # 10. Total Booking Refund
-        total_pending_booking_refunds = Refund.objects.filter(
-            reservation__apartments__property_assigned_id=property.id,
-            status='pending'
-        ).count()
-        
-        guests_registered_per_day = Guest.objects.filter(
-            booking__apartments__property_assigned_id=property.id,
-            user__date_joined__gte=start_of_week
-        ).annotate(
-            day_of_week=ExpressionWrapper(
-                F('user__date_joined'), 
-                output_field=fields.DateField()
-            )
-        ).values('day_of_week').annotate(
-            count=Count('id')
-        ).order_by('day_of_week')
-        
-        # Format the result to include all 7 days of the week, even with 0 guests
-        formatted_guest_data = {
-            (start_of_week + timedelta(days=i)).strftime('%Y-%m-%d'): 0 
-            for i in range(7)
+        rows = {
+            row['date']: row for row in PropertyDailyOccupancy.objects.filter(
+                property=property, date__range=(start_date, end_date)
+            ).values('date', 'occupied_units', 'available_units', 'arrivals', 'departures')
         }
-        for entry in guests_registered_per_day:
-            formatted_guest_data[entry['day_of_week'].strftime('%Y-%m-%d')] = entry['count']
+        available_units = None
+        days = []
+        for day in daterange(start_date, end_date):
+            row = rows.get(day)
+            if row is None:
+                if available_units is None:
+                    available_units = dailyRollups.available_units([property.id]).get(property.id, 0)
+                row = {'occupied_units': 0, 'available_units': available_units, 'arrivals': 0, 'departures': 0}
+            days.append({
+                **row,
+                'date': day.isoformat(),
+                'occupancy_rate': round(row['occupied_units'] / row['available_units'] * 100, 2) if row['available_units'] else 0,
+            })
 
-        data = {
-            "currency":currency,
-            "total_checkin":total_check_ins,
-            "number_of_guests": total_guests,
-            "number_of_reservations": total_month_reservations,
-            "occupancy_rate": round(occupancy_rate, 2),
-            "current_month_income": round(total_income_this_month, 2),
-            "number_of_check_ins": number_of_check_ins,
-            "guests_registered_per_day_current_week": formatted_guest_data,
-            "total_pending_tasks":total_pending_tasks,
-            "total_register_guests":total_register_guests,
-            "total_reservations":total_reservations,
-            "total_pending_booking_refunds":total_pending_booking_refunds,
-        }
-        
-        return Response(data)
\ No newline at end of file
+        occupied = sum(day['occupied_units'] for day in days)
+        available = sum(day['available_units'] for day in days)
+        return Response({
+            'property_id': property.id,
+            'start': start_date.isoformat(),
+            'end': end_date.isoformat(),
+            'occupied_units': occupied,
+            'available_units': available,
+            'occupancy_rate': round(occupied / available * 100, 2) if available else 0,
+            'arrivals': sum(day['arrivals'] for day in days),
+            'departures': sum(day['departures'] for day in days),
+            'days': days,
+        })
+
+
+class PropertyRevenueReportAPIView(APIView):
+    """
+    Revenue, ADR, RevPAR, occupancy and average length of stay of a property from `start` to `end`
+    (YYYY-MM-DD, both included) per `granularity` period (day, week or month), per currency.
+    See PropertyServices.rollups.revenueReport.
+    """
+    permission_classes = [IsAuthenticated, IsReceptionist]
+    max_days = 3660
+
+    def get(self, request, property_id):
+        property = propertyAccess(request).get_property(property_id)
+        start_date = parseQueryParam(request.query_params, 'start', parse_date, required=True)
+        end_date = parseQueryParam(request.query_params, 'end', parse_date, required=True)
+        granularity = request.query_params.get('granularity') or 'day'
+        if granularity not in GRANULARITIES:
+            raise ValidationError({'granularity': f"Must be one of {', '.join(GRANULARITIES)}."})
+        if end_date < start_date:
+            raise ValidationError({'end': 'End date must not be before start date.'})
+        if (end_date - start_date).days >= self.max_days:
+            raise ValidationError({'end': f'At most {self.max_days} days can be requested at once.'})
+        return Response(revenueReport(property.id, start_date, end_date, granularity))
@@ -1,14 +1,17 @@
 from rest_framework import serializers
-from cleanswitch.Helpers import createParsedCreatedAtUpdatedAt
+from cleanswitch.Helpers import CachedRepresentationMixin, createParsedCreatedAtUpdatedAt, usesFields
 from .models import Property
 
 @createParsedCreatedAtUpdatedAt
-class PropertySerializer(serializers.ModelSerializer):
+class PropertySerializer(CachedRepresentationMixin, serializers.ModelSerializer):
     added_by_user_id = serializers.SerializerMethodField()
     class Meta:
         model = Property
         fields = ['id', 'name', 'address','latitude', 'longitude', 'distance', 'added_by_user_id', 'is_active', 'created_at', 'updated_at']
+        search_fields = ['name', 'address']
+        ordering_fields = ['id', 'name', 'created_at']
         
+    @usesFields('added_by_user_id__username')
     def get_added_by_user_id(self, obj):
         if obj.added_by_user_id:
             return obj.added_by_user_id.username
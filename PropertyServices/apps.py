@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PropertyservicesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "PropertyServices"
+
+    def ready(self):
+        import PropertyServices.signals  # noqa: F401
@@ -0,0 +1,134 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Count, FloatField, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+from ApartmentServices.models import Apartment, Booking, Refund
+from PropertyServices.models import Property, PropertyDailyOccupancy, PropertyDailyRevenue, PropertyKPISnapshot
+from PropertyServices.rollups import localMidnight
+from TaskServices.models import Task
+from UserServices.models import Guest
+from cleanswitch.cache import cacheLock, objectTag, referenceCache, releaseLock
+
+
+def snapshotMaxAge():
+    """Age past which a snapshot is recomputed when read, for when the beat job is late or stopped."""
+    return getattr(settings, 'KPI_SNAPSHOT_MAX_AGE', timedelta(minutes=15))
+
+
+def scalar(queryset, group_by, aggregate, output_field):
+    """`aggregate` of `queryset` (filtered on OuterRef('pk')) as a subquery of the property row, 0 without rows."""
+    subquery = queryset.order_by().values(group_by).annotate(value=aggregate).values('value')[:1]
+    return Coalesce(Subquery(subquery, output_field=output_field), Value(0), output_field=output_field)
+
+
+def computeKpis(property_id):
+    """
+    Dashboard KPIs of a property in four queries: the property row with the task, refund, occupancy and
+    revenue figures as subqueries, one conditional aggregation over its bookings, its apartments and
+    the guests registered per day this week.
+    """
+    now = timezone.now()
+    today = timezone.localdate()
+    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    next_month_start = (month_start + timedelta(days=32)).replace(day=1)
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    month_first_day = today.replace(day=1)
+
+    figures = Property.objects.filter(pk=property_id).annotate(
+        total_pending_tasks=scalar(
+            Task.objects.filter(property_assigned=OuterRef('pk'), status='pending', active=True),
+            'property_assigned', Count('pk'), IntegerField()
+        ),
+        total_pending_booking_refunds=scalar(
+            Refund.objects.filter(reservation__property=OuterRef('pk'), status='pending'),
+            'reservation__property', Count('pk'), IntegerField()
+        ),
+        occupied_today=scalar(
+            PropertyDailyOccupancy.objects.filter(property=OuterRef('pk'), date=today),
+            'property', Sum('occupied_units'), IntegerField()
+        ),
+        current_month_income=scalar(
+            PropertyDailyRevenue.objects.filter(property=OuterRef('pk'), date__gte=month_first_day, date__lt=(month_first_day + timedelta(days=32)).replace(day=1)),
+            'property', Sum('revenue'), FloatField()
+        ),
+    ).values('total_pending_tasks', 'total_pending_booking_refunds', 'occupied_today', 'current_month_income').get()
+
+    this_month = Q(dateOfReservation__gte=month_start, dateOfReservation__lt=next_month_start)
+    checked_in = Q(status='checked_in')
+    bookings = Booking.objects.filter(property_id=property_id).aggregate(
+        total_reservations=Count('pk'),
+        number_of_reservations=Count('pk', filter=this_month & ~Q(status__in=['checked_in', 'checked_out'])),
+        number_of_check_ins=Count('pk', filter=checked_in & Q(updated_at__gte=today_start, updated_at__lt=today_start + timedelta(days=1))),
+        total_checkin=Count('pk', filter=checked_in & Q(updated_at__gte=month_start, updated_at__lt=next_month_start)),
+        total_register_guests=Count('guest', distinct=True),
+        number_of_guests=Count('guest', filter=this_month, distinct=True),
+    )
+
+    currencies = list(Apartment.objects.filter(property_assigned_id=property_id).values_list('currency'))
+    occupancy_rate = figures['occupied_today'] / len(currencies) * 100 if currencies else 0
+
+    start_of_week = today - timedelta(days=today.weekday())
+    guests_per_day = {(start_of_week + timedelta(days=offset)).strftime('%Y-%m-%d'): 0 for offset in range(7)}
+    joined = Guest.objects.filter(
+        booking__property_id=property_id,
+        user__date_joined__gte=localMidnight(start_of_week),
+    ).annotate(day=TruncDate('user__date_joined')).values('day').annotate(count=Count('pk', distinct=True))
+    for row in joined:
+        guests_per_day[row['day'].strftime('%Y-%m-%d')] = row['count']
+
+    return {
+        "currency": [list(row) for row in currencies],
+        "total_checkin": bookings['total_checkin'],
+        "number_of_guests": bookings['number_of_guests'],
+        "number_of_reservations": bookings['number_of_reservations'],
+        "occupancy_rate": round(occupancy_rate, 2),
+        "current_month_income": round(figures['current_month_income'], 2),
+        "number_of_check_ins": bookings['number_of_check_ins'],
+        "guests_registered_per_day_current_week": guests_per_day,
+        "total_pending_tasks": figures['total_pending_tasks'],
+        "total_register_guests": bookings['total_register_guests'],
+        "total_reservations": bookings['total_reservations'],
+        "total_pending_booking_refunds": figures['total_pending_booking_refunds'],
+    }
+
+
+def refreshSnapshots(property_ids):
+    """Recompute and store the snapshots of `property_ids`; the stored rows invalidate the copies cached by kpiSnapshot()."""
+    computed_at = timezone.now()
+    snapshots = [
+        PropertyKPISnapshot(property_id=property_id, data=computeKpis(property_id), computed_at=computed_at)
+        for property_id in property_ids
+    ]
+    PropertyKPISnapshot.objects.bulk_create(snapshots, update_conflicts=True, unique_fields=['property'], update_fields=['data', 'computed_at'])
+    return {snapshot.property_id: snapshot for snapshot in snapshots}
+
+
+def kpiSnapshot(property_id, refresh=False):
+    """
+    Snapshot of a property as {'data', 'computed_at'}, read from the reference cache in front of its row.
+    A missing or outdated snapshot, or `refresh`, recomputes it: one worker at a time, the others
+    getting the previous snapshot if there is one.
+    """
+    key = f"kpi-snapshot:{property_id}"
+    tags = [objectTag(PropertyKPISnapshot, property_id)]
+    snapshot = referenceCache.get_or_set(
+        key, lambda: PropertyKPISnapshot.objects.filter(property_id=property_id).values('data', 'computed_at').first(), tags
+    )
+    if not refresh and snapshot is not None and timezone.now() - snapshot['computed_at'] < snapshotMaxAge():
+        return snapshot
+    lock = cacheLock(f"lock:{key}", 60)
+    acquired = lock.acquire(blocking=snapshot is None, blocking_timeout=60)
+    if not acquired and snapshot is not None:
+        return snapshot
+    try:
+        if snapshot is None:
+            # Stored by another worker while this one waited for the lock
+            stored = PropertyKPISnapshot.objects.filter(property_id=property_id).values('data', 'computed_at').first()
+            if stored is not None:
+                return stored
+        stored = refreshSnapshots([property_id])[property_id]
+        return {'data': stored.data, 'computed_at': stored.computed_at}
+    finally:
+        if acquired:
+            releaseLock(lock)
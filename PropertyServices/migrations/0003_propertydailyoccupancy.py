@@ -0,0 +1,49 @@
+# Generated by Django 5.2.3 on 2026-10-18 01:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("PropertyServices", "0002_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PropertyDailyOccupancy",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("occupied_units", models.PositiveIntegerField(default=0)),
+                ("available_units", models.PositiveIntegerField(default=0)),
+                ("arrivals", models.PositiveIntegerField(default=0)),
+                ("departures", models.PositiveIntegerField(default=0)),
+                (
+                    "property",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_occupancy",
+                        to="PropertyServices.property",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("property", "date"),
+                        name="unique_property_daily_occupancy",
+                    )
+                ],
+            },
+        ),
+    ]
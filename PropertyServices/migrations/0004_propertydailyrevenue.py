@@ -0,0 +1,53 @@
+# Generated by Django 5.2.3 on 2026-10-18 01:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("PropertyServices", "0003_propertydailyoccupancy"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="propertydailyoccupancy",
+            name="arrival_nights",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name="PropertyDailyRevenue",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("currency", models.CharField(blank=True, default="", max_length=50)),
+                ("revenue", models.FloatField(default=0)),
+                ("units_sold", models.PositiveIntegerField(default=0)),
+                (
+                    "property",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_revenue",
+                        to="PropertyServices.property",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("property", "date", "currency"),
+                        name="unique_property_daily_revenue",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.3 on 2026-10-18 01:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("PropertyServices", "0004_propertydailyrevenue"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PropertyKPISnapshot",
+            fields=[
+                (
+                    "property",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="kpi_snapshot",
+                        serialize=False,
+                        to="PropertyServices.property",
+                    ),
+                ),
+                ("data", models.JSONField(default=dict)),
+                ("computed_at", models.DateTimeField()),
+            ],
+        ),
+    ]
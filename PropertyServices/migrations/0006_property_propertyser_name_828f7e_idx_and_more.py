@@ -0,0 +1,27 @@
+# Generated by Django 5.2.3 on 2026-10-18 01:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("PropertyServices", "0005_propertykpisnapshot"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="property",
+            index=models.Index(
+                fields=["name", "id"], name="PropertySer_name_828f7e_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="property",
+            index=models.Index(
+                fields=["created_at", "id"], name="PropertySer_created_d32610_idx"
+            ),
+        ),
+    ]
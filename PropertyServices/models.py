@@ -1,4 +1,5 @@
 from django.db import models
+from cleanswitch.cache import TaggedManager
 
 class Property(models.Model):
     name = models.CharField(max_length=255, blank=True, null=True)
@@ -9,4 +10,62 @@ class Property(models.Model):
     added_by_user_id=models.ForeignKey('UserServices.User',on_delete=models.SET_NULL,blank=True,null=True,related_name='added_by_user_id_property')
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
\ No newline at end of file
+    updated_at = models.DateTimeField(auto_now=True)
+    objects = TaggedManager()
+
+    class Meta:
+        indexes = [
+            # Orderings of the property list (PropertySerializer.Meta.ordering_fields), seeking on (field, id)
+            models.Index(fields=['name', 'id']),
+            models.Index(fields=['created_at', 'id']),
+        ]
+
+
+class PropertyDailyOccupancy(models.Model):
+    """
+    Occupancy of a property on one date, maintained by PropertyServices.rollups as bookings change
+    and filled in bulk by the backfill_rollups command, so occupancy over any range is a scan of
+    the (property, date) index instead of the bookings. `occupied_units` counts the apartments held
+    for the night and `available_units` the active apartments: as of the first computation for past
+    dates, kept current from today on.
+    """
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='daily_occupancy')
+    date = models.DateField()
+    occupied_units = models.PositiveIntegerField(default=0)
+    available_units = models.PositiveIntegerField(default=0)
+    arrivals = models.PositiveIntegerField(default=0)
+    # Nights of the stays arriving that day, so average lengths of stay add up over any range
+    arrival_nights = models.PositiveIntegerField(default=0)
+    departures = models.PositiveIntegerField(default=0)
+    objects = TaggedManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['property', 'date'], name='unique_property_daily_occupancy'),
+        ]
+
+
+class PropertyDailyRevenue(models.Model):
+    """
+    Room revenue of a property on one date in one currency: the nightly price of every apartment held
+    for the night, and the number of them (`units_sold`). Maintained with PropertyDailyOccupancy.
+    """
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='daily_revenue')
+    date = models.DateField()
+    currency = models.CharField(max_length=50, blank=True, default='')
+    revenue = models.FloatField(default=0)
+    units_sold = models.PositiveIntegerField(default=0)
+    objects = TaggedManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['property', 'date', 'currency'], name='unique_property_daily_revenue'),
+        ]
+
+
+class PropertyKPISnapshot(models.Model):
+    """Dashboard KPIs of a property as last computed by PropertyServices.kpis, refreshed by a Celery beat job."""
+    property = models.OneToOneField(Property, on_delete=models.CASCADE, primary_key=True, related_name='kpi_snapshot')
+    data = models.JSONField(default=dict)
+    computed_at = models.DateTimeField()
+    objects = TaggedManager()
@@ -0,0 +1,278 @@
+import logging
+from datetime import date, datetime, time, timedelta
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+from ApartmentServices.models import Apartment, Booking, stayNights, staySpan
+from PropertyServices.models import Property, PropertyDailyOccupancy, PropertyDailyRevenue
+from cleanswitch.cache import CommitBatch
+
+logger = logging.getLogger(__name__)
+
+# Cancelled bookings never occupied their apartments; checked-out ones did, up to their end date
+NON_OCCUPYING_STATUSES = ('cancelled',)
+# Report periods, as Trunc kinds
+GRANULARITIES = ('day', 'week', 'month')
+# Apartment fields the rollups depend on
+APARTMENT_ROLLUP_FIELDS = frozenset({'property_assigned', 'is_active', 'price', 'currency'})
+BATCH_SIZE = 1000
+
+
+def localMidnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def daterange(first, last):
+    """Dates from `first` to `last`, both included."""
+    return [first + timedelta(days=offset) for offset in range((last - first).days + 1)]
+
+
+class DailyRollups:
+    """
+    Maintenance of the daily rollups, PropertyDailyOccupancy and PropertyDailyRevenue. Booking and
+    apartment changes mark the (property, dates) spans they touch; once the transaction commits, the
+    spans it marked are merged per property and recomputed from the bookings by the
+    refreshDailyRollups task (inline when it cannot be queued). The backfill_rollups command
+    recomputes whole ranges the same way.
+    """
+
+    def __init__(self):
+        self.marked = CommitBatch(self.queue)
+        self.available_marked = CommitBatch(self.update_available)
+
+    def stays(self, property_ids, first, last):
+        """
+        (property id, apartment id, price, currency, booking id, start, end) of the stays with a night,
+        an arrival or a departure from `first` to `last`.
+        """
+        return Booking.apartments.through.objects.filter(
+            apartment__property_assigned_id__in=property_ids,
+            booking__startDate__lt=localMidnight(last + timedelta(days=1)),
+            booking__endDate__gte=localMidnight(first),
+        ).exclude(booking__status__in=NON_OCCUPYING_STATUSES).values_list(
+            'apartment__property_assigned_id', 'apartment_id', 'apartment__price', 'apartment__currency',
+            'booking_id', 'booking__startDate', 'booking__endDate'
+        ).iterator(chunk_size=5000)
+
+    def available_units(self, property_ids):
+        rows = Apartment.objects.filter(property_assigned_id__in=property_ids, is_active=True).values_list('property_assigned_id').annotate(Count('id'))
+        return dict(rows)
+
+    def compute(self, property_ids, first, last):
+        """
+        Unsaved occupancy rows of every property in `property_ids` and every date from `first` to `last`,
+        and the revenue rows of the dates with a stay, from one query over the bookings.
+        """
+        occupied, arrivals, departures, revenue = {}, {}, {}, {}
+        for property_id, apartment_id, price, currency, booking_id, start, end in self.stays(property_ids, first, last):
+            arrival, departure = staySpan(start, end)
+            nights = stayNights(start, end)
+            for night in nights:
+                if not first <= night <= last:
+                    continue
+                occupied.setdefault((property_id, night), set()).add(apartment_id)
+                sold = revenue.setdefault((property_id, night, currency or ''), [0.0, 0])
+                sold[0] += price or 0
+                sold[1] += 1
+            # A group booking arrives and departs once, whatever its number of apartments
+            if first <= arrival <= last:
+                arrivals.setdefault((property_id, arrival), {})[booking_id] = len(nights)
+            if first <= departure <= last:
+                departures.setdefault((property_id, departure), set()).add(booking_id)
+        available = self.available_units(property_ids)
+        occupancy_rows = [
+            PropertyDailyOccupancy(
+                property_id=property_id,
+                date=day,
+                occupied_units=len(occupied.get((property_id, day), ())),
+                available_units=available.get(property_id, 0),
+                arrivals=len(arrivals.get((property_id, day), ())),
+                arrival_nights=sum(arrivals.get((property_id, day), {}).values()),
+                departures=len(departures.get((property_id, day), ())),
+            )
+            for property_id in property_ids for day in daterange(first, last)
+        ]
+        revenue_rows = [
+            PropertyDailyRevenue(property_id=property_id, date=day, currency=currency, revenue=round(amount, 2), units_sold=units)
+            for (property_id, day, currency), (amount, units) in revenue.items()
+        ]
+        return occupancy_rows, revenue_rows
+
+    def refresh(self, property_ids, first, last, available=False):
+        """
+        Recompute the rows of `property_ids` from `first` to `last`. Occupancy rows already stored keep
+        their available units unless `available` is set, so past dates keep the count they were computed
+        with; revenue rows are replaced, currencies no longer sold included.
+        """
+        fields = ['occupied_units', 'arrivals', 'arrival_nights', 'departures'] + (['available_units'] if available else [])
+        occupancy_rows, revenue_rows = self.compute(property_ids, first, last)
+        with transaction.atomic():
+            PropertyDailyOccupancy.objects.bulk_create(
+                occupancy_rows, batch_size=BATCH_SIZE, update_conflicts=True, unique_fields=['property', 'date'], update_fields=fields
+            )
+            PropertyDailyRevenue.objects.filter(property_id__in=property_ids, date__range=(first, last)).delete()
+            PropertyDailyRevenue.objects.bulk_create(revenue_rows, batch_size=BATCH_SIZE)
+        return len(occupancy_rows)
+
+    def refresh_available(self, property_ids, using=None):
+        """Bring the available units of the rows from today on up to date once the current transaction commits."""
+        property_ids = {property_id for property_id in property_ids if property_id is not None}
+        if property_ids:
+            self.available_marked.add(property_ids, using=using)
+
+    def update_available(self, property_ids):
+        property_ids = set(property_ids)
+        available = self.available_units(property_ids)
+        for property_id in property_ids:
+            PropertyDailyOccupancy.objects.filter(property_id=property_id, date__gte=timezone.localdate()).update(
+                available_units=available.get(property_id, 0)
+            )
+
+    def mark(self, spans, using=None):
+        """Recompute the rows of `spans` [(property id, first date, last date)] once the current transaction commits."""
+        spans = [span for span in spans if span[0] is not None]
+        if spans:
+            self.marked.add(spans, using=using)
+
+    def queue(self, spans):
+        """Hand the spans a transaction marked to refreshDailyRollups, one span per property."""
+        pending = {}
+        for property_id, first, last in spans:
+            if property_id in pending:
+                first, last = min(first, pending[property_id][0]), max(last, pending[property_id][1])
+            pending[property_id] = (first, last)
+        from PropertyServices.tasks import refreshDailyRollups
+        try:
+            refreshDailyRollups.delay([[property_id, first.isoformat(), last.isoformat()] for property_id, (first, last) in pending.items()])
+        except Exception:
+            logger.exception('Could not queue the daily rollups refresh, refreshing inline')
+            self.apply(pending)
+
+    def apply(self, pending):
+        """Recompute {property id: (first date, last date)}; refreshDailyRollups passes the dates as ISO strings."""
+        # Properties deleted since they were marked have no rows left to refresh
+        existing = set(Property.objects.filter(pk__in=list(pending)).values_list('pk', flat=True))
+        for property_id, (first, last) in pending.items():
+            if property_id not in existing:
+                continue
+            self.refresh([property_id], date.fromisoformat(str(first)), date.fromisoformat(str(last)))
+
+    def mark_bookings(self, bookings, property_ids=None, using=None):
+        """
+        Mark the dates of `bookings` at `property_ids` (default: the properties of their apartments),
+        along with the dates they had before a save that moved them (`_previous_stay`).
+        """
+        bookings = {booking.pk: booking for booking in bookings}
+        if not bookings:
+            return
+        if property_ids is None:
+            links = Booking.apartments.through.objects.filter(booking_id__in=bookings).values_list('booking_id', 'apartment__property_assigned_id')
+        else:
+            links = [(booking_id, property_id) for booking_id in bookings for property_id in property_ids]
+        spans = []
+        for booking_id, property_id in links:
+            booking = bookings[booking_id]
+            for start, end in filter(None, ((booking.startDate, booking.endDate), booking.__dict__.get('_previous_stay'))):
+                spans.append((property_id, *staySpan(start, end)))
+        self.mark(spans, using=using)
+
+
+dailyRollups = DailyRollups()
+
+
+def periodStarts(start, end, granularity):
+    """First date of the `granularity` period of every date from `start` to `end` (datetime64[D] array)."""
+    days = np.arange(np.datetime64(start, 'D'), np.datetime64(end, 'D') + 1)
+    if granularity == 'week':
+        # Day 0 of datetime64 is a Thursday: shift every date back to its Monday
+        return days - (days.astype(np.int64) + 3) % 7
+    if granularity == 'month':
+        return days.astype('datetime64[M]').astype('datetime64[D]')
+    return days
+
+
+def ratio(numerator, denominator, scale=1):
+    return np.round(np.divide(numerator * scale, denominator, out=np.zeros(len(numerator)), where=denominator > 0), 2)
+
+
+def revenueReport(property_id, start, end, granularity='day'):
+    """
+    Revenue, ADR (revenue per unit sold), RevPAR (revenue per available unit), occupancy and ALOS
+    (average nights of the stays arriving) of a property from `start` to `end`, per `granularity`
+    period and in total. The database sums the daily rollups per period in two indexed queries; the
+    ratios of every period and currency are then computed at once on arrays with one column per
+    period plus a last one for the whole range.
+    """
+    days = periodStarts(start, end, granularity)
+    periods, days_per_period = np.unique(days, return_counts=True)
+    columns = len(periods) + 1
+
+    def column(values):
+        return np.searchsorted(periods, np.array(values, dtype='datetime64[D]'))
+
+    def totals(matrix):
+        matrix[..., -1] = matrix[..., :-1].sum(axis=-1)
+        return matrix
+
+    period = Trunc('date', granularity, output_field=DateField())
+    occupancy = list(
+        PropertyDailyOccupancy.objects.filter(property_id=property_id, date__range=(start, end))
+        .annotate(period=period).values('period')
+        .annotate(available=Sum('available_units'), occupied=Sum('occupied_units'), arrivals=Sum('arrivals'), arrival_nights=Sum('arrival_nights'), stored=Count('id'))
+        .values_list('period', 'available', 'occupied', 'arrivals', 'arrival_nights', 'stored')
+    )
+    counts = np.zeros((5, columns))
+    if occupancy:
+        counts[:, column([row[0] for row in occupancy])] = np.array([row[1:] for row in occupancy], dtype=np.float64).T
+    missing = days_per_period - counts[4, :-1]
+    if missing.any():
+        # Dates without a row had no stay: their units are the apartments active now
+        counts[0, :-1] += missing * dailyRollups.available_units([property_id]).get(property_id, 0)
+    available, occupied, arrivals, arrival_nights = totals(counts)[:4]
+
+    revenue_rows = list(
+        PropertyDailyRevenue.objects.filter(property_id=property_id, date__range=(start, end))
+        .annotate(period=period).values('period', 'currency')
+        .annotate(total=Sum('revenue'), units=Sum('units_sold'))
+        .values_list('period', 'currency', 'total', 'units')
+    )
+    currencies = sorted({row[1] for row in revenue_rows})
+    revenue, sold = np.zeros((len(currencies), columns)), np.zeros((len(currencies), columns))
+    if revenue_rows:
+        rows = np.array([currencies.index(row[1]) for row in revenue_rows]), column([row[0] for row in revenue_rows])
+        np.add.at(revenue, rows, [row[2] or 0 for row in revenue_rows])
+        np.add.at(sold, rows, [row[3] or 0 for row in revenue_rows])
+    revenue, sold = totals(revenue), totals(sold)
+    adr = [ratio(revenue[index], sold[index]) for index in range(len(currencies))]
+    revpar = [ratio(revenue[index], available) for index in range(len(currencies))]
+    occupancy_rate, alos = ratio(occupied, available, 100), ratio(arrival_nights, arrivals)
+
+    def summary(index):
+        return {
+            'available_units': int(available[index]),
+            'occupied_units': int(occupied[index]),
+            'occupancy_rate': float(occupancy_rate[index]),
+            'arrivals': int(arrivals[index]),
+            'alos': float(alos[index]),
+            'revenue': {
+                currency: {
+                    'revenue': round(float(revenue[position, index]), 2),
+                    'units_sold': int(sold[position, index]),
+                    'adr': float(adr[position][index]),
+                    'revpar': float(revpar[position][index]),
+                }
+                for position, currency in enumerate(currencies)
+            },
+        }
+
+    return {
+        'property_id': property_id,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'granularity': granularity,
+        'currencies': currencies,
+        'total': summary(-1),
+        'periods': [{'period': str(periods[index]), **summary(index)} for index in range(len(periods))],
+    }
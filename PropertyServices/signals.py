@@ -0,0 +1,80 @@
+from django.db.models.signals import pre_save, post_save, pre_delete, m2m_changed
+from django.dispatch import receiver
+from ApartmentServices.availability import OCCUPANCY_FIELDS
+from ApartmentServices.models import Apartment, Booking
+from PropertyServices.rollups import APARTMENT_ROLLUP_FIELDS, dailyRollups
+
+
+
+@receiver(m2m_changed, sender=Booking.apartments.through)
+def markBookingApartments(sender, instance, action, reverse, pk_set, using=None, **kwargs):
+    if action in ('post_add', 'post_remove'):
+        if reverse:
+            dailyRollups.mark_bookings(Booking.objects.filter(pk__in=pk_set).only('startDate', 'endDate'), [instance.property_assigned_id], using=using)
+        else:
+            if action == 'post_remove':
+                # The apartments were held over the stored dates, which a pending save may be changing
+                rememberBookingStay(sender=Booking, instance=instance)
+            property_ids = set(Apartment.objects.filter(pk__in=pk_set).values_list('property_assigned_id', flat=True))
+            dailyRollups.mark_bookings([instance], property_ids, using=using)
+    elif action == 'pre_clear':
+        # Marked before the links are deleted, while they still tell which properties are affected
+        if reverse:
+            dailyRollups.mark_bookings(instance.apartments_booking.only('startDate', 'endDate'), [instance.property_assigned_id], using=using)
+        else:
+            rememberBookingStay(sender=Booking, instance=instance)
+            dailyRollups.mark_bookings([instance], using=using)
+
+
+@receiver(pre_save, sender=Booking)
+def rememberBookingStay(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._previous_stay = None
+    if not raw and instance.pk is not None and not instance._state.adding and (update_fields is None or {'startDate', 'endDate'}.intersection(update_fields)):
+        previous = sender._base_manager.filter(pk=instance.pk).values_list('startDate', 'endDate').first()
+        if previous != (instance.startDate, instance.endDate):
+            instance._previous_stay = previous
+
+
+@receiver(post_save, sender=Booking)
+def markBookingOccupancy(sender, instance, created=False, raw=False, update_fields=None, using=None, **kwargs):
+    # New bookings get their apartments afterwards, through the m2m
+    if created or raw or update_fields is not None and not OCCUPANCY_FIELDS.intersection(update_fields):
+        return
+    dailyRollups.mark_bookings([instance], using=using)
+
+
+@receiver(pre_delete, sender=Booking)
+def releaseBookingOccupancy(sender, instance, using=None, **kwargs):
+    dailyRollups.mark_bookings([instance], using=using)
+
+
+@receiver(pre_save, sender=Apartment)
+def rememberApartmentUnits(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._previous_units = None
+    if not raw and instance.pk is not None and not instance._state.adding and (update_fields is None or APARTMENT_ROLLUP_FIELDS.intersection(update_fields)):
+        instance._previous_units = sender._base_manager.filter(pk=instance.pk).values_list('property_assigned_id', 'is_active', 'price', 'currency').first()
+
+
+@receiver(post_save, sender=Apartment)
+def markApartmentUnits(sender, instance, created=False, raw=False, using=None, **kwargs):
+    if raw:
+        return
+    previous = instance.__dict__.pop('_previous_units', None)
+    if created:
+        dailyRollups.refresh_available([instance.property_assigned_id], using=using)
+        return
+    if previous is None:
+        return
+    property_id, is_active, price, currency = previous
+    if (property_id, is_active) != (instance.property_assigned_id, instance.is_active):
+        dailyRollups.refresh_available({property_id, instance.property_assigned_id}, using=using)
+    if property_id != instance.property_assigned_id or (price, currency) != (instance.price, instance.currency):
+        # Its bookings now occupy the new property, or earn its new price
+        dailyRollups.mark_bookings(instance.apartments_booking.only('startDate', 'endDate'), {property_id, instance.property_assigned_id}, using=using)
+
+
+@receiver(pre_delete, sender=Apartment)
+def releaseApartmentUnits(sender, instance, using=None, **kwargs):
+    # Deleting the apartment deletes its booking links without any m2m signal
+    dailyRollups.mark_bookings(instance.apartments_booking.only('startDate', 'endDate'), [instance.property_assigned_id], using=using)
+    dailyRollups.refresh_available([instance.property_assigned_id], using=using)
@@ -0,0 +1,17 @@
+from celery import shared_task
+from PropertyServices.kpis import refreshSnapshots
+from PropertyServices.models import Property
+from PropertyServices.rollups import dailyRollups
+
+
+@shared_task(ignore_result=True)
+def refreshKpiSnapshots():
+    property_ids = list(Property.objects.filter(is_active=True).values_list('pk', flat=True))
+    for index in range(0, len(property_ids), 100):
+        refreshSnapshots(property_ids[index:index + 100])
+
+
+@shared_task(ignore_result=True)
+def refreshDailyRollups(spans):
+    """Recompute the daily rollups of `spans` [[property id, first ISO date, last ISO date]] marked by a commit."""
+    dailyRollups.apply({property_id: (first, last) for property_id, first, last in spans})
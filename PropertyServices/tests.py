@@ -1,3 +1,149 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ApartmentServices.models import Apartment, Booking
+from PropertyServices.kpis import kpiSnapshot, refreshSnapshots
+from PropertyServices.models import Property, PropertyDailyOccupancy, PropertyKPISnapshot
+from PropertyServices.tasks import refreshKpiSnapshots
+from PropertyServices.rollups import localMidnight, revenueReport
+from TaskServices.models import Task
+from UserServices.models import Guest, User
+
+
+class RollupTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', role='admin', is_superuser=True)
+        cls.property = Property.objects.create(name='Main', address='1 Street')
+        cls.apartments = [
+            Apartment.objects.create(number=number, name=f'Apt {number}', property_assigned=cls.property, apartmentType='normal', price=price, currency='€')
+            for number, price in enumerate((100, 50, 80))
+        ]
+        cls.guest = Guest.objects.create(user=User.objects.create(username='guest', role='guest'))
+        cls.today = timezone.localdate()
+
+    def setUp(self):
+        cache.clear()
+
+    def day(self, offset):
+        return self.today + timedelta(days=offset)
+
+    def book(self, apartments, start, nights, status='confirmed'):
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = Booking.objects.create(
+                guest=self.guest, startDate=localMidnight(self.day(start)) + timedelta(hours=14),
+                endDate=localMidnight(self.day(start + nights)) + timedelta(hours=11), status=status, added_by_user_id=self.admin,
+            )
+            booking.apartments.set(apartments)
+        return booking
+
+    def occupancy(self, first, last):
+        rows = PropertyDailyOccupancy.objects.filter(property=self.property, date__range=(self.day(first), self.day(last)))
+        return {(row.date - self.today).days: (row.occupied_units, row.arrivals, row.departures) for row in rows}
+
+
+class DailyOccupancyTests(RollupTestCase):
+    def test_booking_commit_fills_the_rollup(self):
+        self.book(self.apartments[:2], 1, 2)
+        self.assertEqual(self.occupancy(0, 4), {1: (2, 1, 0), 2: (2, 0, 0), 3: (0, 0, 1)})
+        self.assertEqual(PropertyDailyOccupancy.objects.get(property=self.property, date=self.day(1)).available_units, 3)
+
+    def test_day_use_stay_arrives_and_departs_without_a_night(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = Booking.objects.create(
+                guest=self.guest, startDate=localMidnight(self.day(1)) + timedelta(hours=10),
+                endDate=localMidnight(self.day(1)) + timedelta(hours=16), status='confirmed', added_by_user_id=self.admin,
+            )
+            booking.apartments.set(self.apartments[:1])
+        self.assertEqual(self.occupancy(0, 2), {1: (0, 1, 1)})
+
+    def test_moving_and_cancelling_a_booking_refresh_both_spans(self):
+        booking = self.book(self.apartments[:1], 1, 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.startDate += timedelta(days=3)
+            booking.endDate += timedelta(days=3)
+            booking.save()
+        self.assertEqual(self.occupancy(1, 6), {1: (0, 0, 0), 2: (0, 0, 0), 3: (0, 0, 0), 4: (1, 1, 0), 5: (1, 0, 0), 6: (0, 0, 1)})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.filter(pk=booking.pk).update(status='cancelled')
+        self.assertEqual(self.occupancy(4, 6), {4: (0, 0, 0), 5: (0, 0, 0), 6: (0, 0, 0)})
+
+    def test_deactivated_apartment_leaves_the_available_units(self):
+        self.book(self.apartments[:1], 0, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Apartment.objects.filter(pk=self.apartments[2].pk).update(is_active=False)
+        self.assertEqual(PropertyDailyOccupancy.objects.get(property=self.property, date=self.today).available_units, 2)
+
+
+class RevenueReportTests(RollupTestCase):
+    def setUp(self):
+        super().setUp()
+        self.start, self.end = self.day(0), self.day(3)
+        self.book(self.apartments[:2], 1, 2)
+        self.book(self.apartments[2:], 2, 1)
+
+    def test_daily_figures(self):
+        report = revenueReport(self.property.pk, self.start, self.end)
+        self.assertEqual(report['currencies'], ['€'])
+        days = [(period['occupied_units'], period['arrivals'], period['revenue']['€']['revenue'], period['revenue']['€']['units_sold']) for period in report['periods']]
+        self.assertEqual(days, [(0, 0, 0, 0), (2, 1, 150, 2), (3, 1, 230, 3), (0, 0, 0, 0)])
+        self.assertEqual(report['periods'][1]['revenue']['€']['adr'], 75)
+        self.assertEqual(report['periods'][1]['revenue']['€']['revpar'], 50)
+
+    def test_totals(self):
+        total = revenueReport(self.property.pk, self.start, self.end)['total']
+        self.assertEqual((total['available_units'], total['occupied_units'], total['occupancy_rate']), (12, 5, 41.67))
+        self.assertEqual((total['arrivals'], total['alos']), (2, 1.5))
+        self.assertEqual(total['revenue']['€'], {'revenue': 380, 'units_sold': 5, 'adr': 76, 'revpar': 31.67})
+
+    def test_granularities_add_up_to_the_same_total(self):
+        daily = revenueReport(self.property.pk, self.start, self.end)
+        for granularity in ('week', 'month'):
+            report = revenueReport(self.property.pk, self.start, self.end, granularity)
+            self.assertEqual(report['total'], daily['total'], granularity)
+            self.assertEqual(sum(period['revenue']['€']['revenue'] for period in report['periods']), 380, granularity)
+
+
+class KPISnapshotTests(RollupTestCase):
+    def setUp(self):
+        super().setUp()
+        self.book(self.apartments[:2], 0, 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(title='Clean', description='', priority='low', property_assigned=self.property, due_date=timezone.now(), added_by_user_id=self.admin)
+
+    def test_refresh_stores_the_figures(self):
+        data = refreshSnapshots([self.property.pk])[self.property.pk].data
+        self.assertEqual(PropertyKPISnapshot.objects.get(property=self.property).data, data)
+        self.assertEqual((data['occupancy_rate'], data['current_month_income'] > 0), (66.67, True))
+        self.assertEqual((data['total_reservations'], data['total_register_guests'], data['total_pending_tasks']), (1, 1, 1))
+
+    def snapshot(self, refresh=False):
+        with self.captureOnCommitCallbacks(execute=True):
+            return kpiSnapshot(self.property.pk, refresh=refresh)
+
+    def test_fresh_snapshot_is_served_without_recomputing(self):
+        computed_at = self.snapshot()['computed_at']
+        # The stored row invalidated the cached copy: the next read loads it once
+        self.snapshot()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.snapshot()['computed_at'], computed_at)
+        self.assertGreater(self.snapshot(refresh=True)['computed_at'], computed_at)
+
+    def test_outdated_snapshot_is_recomputed(self):
+        computed_at = self.snapshot()['computed_at']
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.filter(property_assigned=self.property).update(status='done')
+        with override_settings(KPI_SNAPSHOT_MAX_AGE=timedelta(0)):
+            snapshot = self.snapshot()
+        self.assertGreater(snapshot['computed_at'], computed_at)
+        self.assertEqual(snapshot['data']['total_pending_tasks'], 0)
+
+    def test_beat_job_refreshes_active_properties(self):
+        inactive = Property.objects.create(name='Closed', address='3 Street', is_active=False)
+        refreshKpiSnapshots()
+        self.assertEqual(list(PropertyKPISnapshot.objects.values_list('property_id', flat=True)), [self.property.pk])
+        self.assertFalse(PropertyKPISnapshot.objects.filter(property=inactive).exists())
@@ -5,6 +5,8 @@ urlpatterns = [
     path('properties/', PropertyController.CreateListPropertyAPIView.as_view(), name='properties-list-create'),
     path('properties/<int:pk>/', PropertyController.RetrieveUpdateDeletePropertyAPIView.as_view(), name='retrieve-update-destroy-property'),
     path('properties/stats/', PropertyController.PropertyStatsAPIView.as_view(), name='property-stats'),
+    path('properties/<int:property_id>/occupancy/', PropertyController.PropertyOccupancyAPIView.as_view(), name='property-occupancy'),
+    path('properties/<int:property_id>/revenue/', PropertyController.PropertyRevenueReportAPIView.as_view(), name='property-revenue'),
     path('properties/<int:property_id>/apartments/', PropertyController.ApartmentListByPropertyAPIView.as_view(), name='property-apartments'),
     path('properties/<int:property_id>/tasks/', PropertyController.TaskListByPropertyAPIView.as_view(), name='property-tasks'),
     path('properties/<int:property_id>/tasks-template/', PropertyController.TaskTemplateListByPropertyAPIView.as_view(), name='property-tasks-template'),
@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+class SearchservicesConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "SearchServices"
+
+    def ready(self):
+        from SearchServices.registry import searchRegistry
+        from SearchServices.signals import backfillSearchIndex
+        searchRegistry.autodiscover()
+        post_migrate.connect(backfillSearchIndex, sender=self)
@@ -0,0 +1,190 @@
+import re
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, models
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+from SearchServices.models import SearchDocument, SearchToken
+from SearchServices.registry import searchRegistry
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    return WORD_RE.findall(text.lower())
+
+
+class BaseSearchBackend:
+    """Filters a queryset down to the rows matching `query` and annotates them with `search_rank`."""
+    # Table holding the index rows, keyed by (content_type, object_id); None for unindexed backends
+    index_model = None
+
+    def search(self, queryset, query):
+        raise NotImplementedError('search method not implemented')
+
+    def update(self, model, pks):
+        raise NotImplementedError('update method not implemented')
+
+    def remove(self, model, pks):
+        content_type = ContentType.objects.get_for_model(model)
+        SearchDocument.objects.filter(content_type=content_type, object_id__in=pks).delete()
+        SearchToken.objects.filter(content_type=content_type, object_id__in=pks).delete()
+
+    def rebuild(self, model):
+        for pks in searchRegistry.iter_pk_batches(model):
+            self.update(model, pks)
+
+    def backfill(self, model):
+        """Index the rows of `model` that have no index row yet, e.g. the ones written before the index existed."""
+        if self.index_model is None:
+            return
+        content_type = ContentType.objects.get_for_model(model)
+        indexed = self.index_model.objects.filter(content_type=content_type).values('object_id')
+        for pks in searchRegistry.iter_pk_batches(model, model._default_manager.exclude(pk__in=indexed)):
+            self.update(model, pks)
+
+    def order_by_rank(self, queryset):
+        return queryset.order_by('-search_rank', '-pk')
+
+
+class IcontainsSearchBackend(BaseSearchBackend):
+    """Unindexed fallback: OR of __icontains over every CharField/TextField of the model."""
+
+    def search(self, queryset, query, fields=None):
+        if fields is None:
+            fields = [field.name for field in queryset.model._meta.get_fields() if isinstance(field, (models.CharField, models.TextField))]
+        search_conditions = Q()
+        for field in fields:
+            search_conditions |= Q(**{f"{field}__icontains": query})
+        return queryset.filter(search_conditions)
+
+    def update(self, model, pks):
+        pass
+
+
+class TokenSearchBackend(BaseSearchBackend):
+    """
+    Maintained edge n-gram table: every word contributes its prefixes (2..max_gram chars),
+    so a query term hits an index lookup on (content_type, token) instead of a LIKE '%term%' scan.
+    All query terms must match; rows are ranked by the summed token weights.
+    """
+    min_gram = 2
+    max_gram = 15
+    exact_weight = 3
+    prefix_weight = 1
+    index_model = SearchToken
+
+    def document_tokens(self, text):
+        tokens = {}
+        for word in tokenize(text):
+            word = word[:SearchToken._meta.get_field('token').max_length]
+            grams = {word[:size] for size in range(self.min_gram, min(len(word), self.max_gram) + 1)}
+            for gram in grams:
+                weight = self.exact_weight if gram == word else self.prefix_weight
+                tokens[gram] = max(tokens.get(gram, 0), weight)
+            tokens[word] = self.exact_weight
+        return tokens
+
+    def query_tokens(self, query):
+        return {word[:self.max_gram] for word in tokenize(query)}
+
+    def update(self, model, pks):
+        content_type = ContentType.objects.get_for_model(model)
+        documents = searchRegistry.build_documents(model, pks)
+        rows = []
+        for pk, values in documents.items():
+            tokens = self.document_tokens(' '.join(text for field, text in values))
+            rows.extend(SearchToken(content_type=content_type, object_id=pk, token=token, weight=weight) for token, weight in tokens.items())
+        SearchToken.objects.filter(content_type=content_type, object_id__in=list(documents)).delete()
+        SearchToken.objects.bulk_create(rows, batch_size=1000)
+
+    def search(self, queryset, query):
+        terms = self.query_tokens(query)
+        if not terms:
+            return queryset.none()
+        content_type = ContentType.objects.get_for_model(queryset.model)
+        matches = SearchToken.objects.filter(
+            content_type=content_type, token__in=terms
+        ).values('object_id').annotate(
+            matched_terms=Count('token'), rank=Sum('weight')
+        ).filter(matched_terms=len(terms))
+        ranked = matches.filter(object_id=OuterRef('pk')).values('rank')
+        queryset = queryset.filter(pk__in=matches.values('object_id')).annotate(
+            search_rank=Subquery(ranked, output_field=IntegerField())
+        )
+        return self.order_by_rank(queryset)
+
+
+class MySQLFullTextSearchBackend(BaseSearchBackend):
+    """
+    One flattened SearchDocument per row with a FULLTEXT index on `body` (created by the
+    SearchServices migrations on MySQL only); queries use MATCH ... AGAINST in boolean mode
+    with a prefix wildcard on every term, ranked by MySQL's relevance score. FULLTEXT ignores
+    words shorter than innodb_ft_min_token_size, so shorter terms are matched with LIKE instead.
+    """
+    index_model = SearchDocument
+    min_token_size = None
+
+    def get_min_token_size(self):
+        if self.min_token_size is None:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT @@innodb_ft_min_token_size')
+                self.min_token_size = cursor.fetchone()[0]
+        return self.min_token_size
+
+    def update(self, model, pks):
+        content_type = ContentType.objects.get_for_model(model)
+        documents = searchRegistry.build_documents(model, pks)
+        SearchDocument.objects.filter(content_type=content_type, object_id__in=list(documents)).delete()
+        SearchDocument.objects.bulk_create([
+            SearchDocument(content_type=content_type, object_id=pk, body=' '.join(text for field, text in values))
+            for pk, values in documents.items()
+        ], batch_size=1000)
+
+    def search(self, queryset, query):
+        terms = tokenize(query)
+        if not terms:
+            return queryset.none()
+        min_token_size = self.get_min_token_size()
+        content_type = ContentType.objects.get_for_model(queryset.model)
+        documents = SearchDocument.objects.filter(content_type=content_type)
+        for term in terms:
+            if len(term) < min_token_size:
+                documents = documents.filter(body__icontains=term)
+        indexed_terms = [term for term in terms if len(term) >= min_token_size]
+        if indexed_terms:
+            boolean_query = ' '.join(f"+{term}*" for term in indexed_terms)
+            relevance = RawSQL('MATCH(body) AGAINST (%s IN BOOLEAN MODE)', (boolean_query,))
+            documents = documents.annotate(rank=relevance).filter(rank__gt=0)
+        else:
+            documents = documents.annotate(rank=Value(1.0, output_field=models.FloatField()))
+        ranked = documents.filter(object_id=OuterRef('pk')).values('rank')
+        queryset = queryset.filter(pk__in=documents.values('object_id')).annotate(
+            search_rank=Subquery(ranked, output_field=models.FloatField())
+        )
+        return self.order_by_rank(queryset)
+
+
+_backend = None
+
+
+def getSearchBackend():
+    """Backend from settings.SEARCH_BACKEND, or FULLTEXT on MySQL and the token table elsewhere."""
+    global _backend
+    if _backend is None:
+        backend_path = getattr(settings, 'SEARCH_BACKEND', None)
+        if backend_path:
+            _backend = import_string(backend_path)()
+        elif connection.vendor == 'mysql':
+            _backend = MySQLFullTextSearchBackend()
+        else:
+            _backend = TokenSearchBackend()
+    return _backend
+
+
+def searchQueryset(queryset, serializer_class, query):
+    """Apply `?search=` using the serializer's Meta.search_fields, or the legacy icontains scan."""
+    if searchRegistry.is_registered(queryset.model) and getattr(serializer_class.Meta, 'search_fields', None):
+        return getSearchBackend().search(queryset, query)
+    return IcontainsSearchBackend().search(queryset, query)
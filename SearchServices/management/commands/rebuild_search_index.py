@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from SearchServices.backends import getSearchBackend
+from SearchServices.registry import searchRegistry
+
+
+class Command(BaseCommand):
+    help = "Rebuild the search index of every model declaring Meta.search_fields on a serializer"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', action='append', help="Only rebuild this model (app_label.ModelName); repeatable")
+
+    def handle(self, *args, **options):
+        backend = getSearchBackend()
+        only = {label.lower() for label in options.get('model') or []}
+        for model in list(searchRegistry.fields):
+            if only and model._meta.label_lower not in only:
+                continue
+            backend.rebuild(model)
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt search index for {model._meta.label} with {backend.__class__.__name__}"))
@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+def addFulltextIndex(apps, schema_editor):
+    if schema_editor.connection.vendor != "mysql":
+        return
+    table = apps.get_model("SearchServices", "SearchDocument")._meta.db_table
+    schema_editor.execute(
+        f"ALTER TABLE `{table}` ADD FULLTEXT INDEX `searchdocument_body_ft` (`body`)"
+    )
+
+
+def dropFulltextIndex(apps, schema_editor):
+    if schema_editor.connection.vendor != "mysql":
+        return
+    table = apps.get_model("SearchServices", "SearchDocument")._meta.db_table
+    schema_editor.execute(f"ALTER TABLE `{table}` DROP INDEX `searchdocument_body_ft`")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("SearchServices", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(addFulltextIndex, dropFulltextIndex),
+    ]
@@ -0,0 +1,32 @@
+from django.db import models
+from django.contrib.contenttypes.models import ContentType
+
+class SearchDocument(models.Model):
+    """Flattened searchable text of one row, FULLTEXT-indexed on MySQL."""
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveBigIntegerField()
+    body = models.TextField(blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('content_type', 'object_id')
+
+    def __str__(self):
+        return f"{self.content_type} #{self.object_id}"
+
+
+class SearchToken(models.Model):
+    """Edge n-gram of a word in a SearchDocument, used where FULLTEXT is unavailable (SQLite)."""
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveBigIntegerField()
+    token = models.CharField(max_length=64)
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        unique_together = ('content_type', 'object_id', 'token')
+        indexes = [
+            models.Index(fields=['content_type', 'token', 'object_id']),
+        ]
+
+    def __str__(self):
+        return f"{self.token} ({self.content_type} #{self.object_id})"
@@ -0,0 +1,142 @@
+from collections import defaultdict
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.utils.module_loading import autodiscover_modules
+from rest_framework import serializers
+from cleanswitch.cache import CommitBatch, postBulkWrite
+
+
+class SearchRegistry:
+    """
+    Collects the `Meta.search_fields` declared on serializers and keeps the search index of
+    their models up to date through model signals and the bulk writes of TaggedQuerySet,
+    including changes on related rows.
+    """
+    batch_size = 500
+
+    def __init__(self):
+        self.fields = defaultdict(list)
+        self.connected = set()
+        self.changed = CommitBatch(self.update)
+
+    def autodiscover(self):
+        autodiscover_modules('Serializers')
+        pending = [serializers.ModelSerializer]
+        while pending:
+            serializer_class = pending.pop()
+            pending.extend(serializer_class.__subclasses__())
+            meta = getattr(serializer_class, 'Meta', None)
+            if meta is not None and getattr(meta, 'search_fields', None):
+                self.register(meta.model, meta.search_fields)
+
+    def register(self, model, search_fields):
+        for field in search_fields:
+            if field not in self.fields[model]:
+                self.fields[model].append(field)
+        self.connect(model)
+
+    def is_registered(self, model):
+        return model in self.fields
+
+    def connect(self, model):
+        if model in self.connected:
+            return
+        self.connected.add(model)
+        post_save.connect(self.handle_save, sender=model, weak=False, dispatch_uid=f"search-save-{model._meta.label}")
+        post_delete.connect(self.handle_delete, sender=model, weak=False, dispatch_uid=f"search-delete-{model._meta.label}")
+        postBulkWrite.connect(self.make_bulk_handler(model, ''), sender=model, weak=False, dispatch_uid=f"search-bulk-{model._meta.label}")
+
+        for lookup in self.fields[model]:
+            parts = lookup.split('__')
+            current_model = model
+            for depth, part in enumerate(parts[:-1]):
+                field = current_model._meta.get_field(part)
+                prefix = '__'.join(parts[:depth + 1])
+                if field.many_to_many and depth == 0:
+                    m2m_changed.connect(self.handle_m2m_changed, sender=field.remote_field.through, weak=False, dispatch_uid=f"search-m2m-{model._meta.label}-{prefix}")
+                related_model = field.related_model
+                post_save.connect(self.make_related_handler(model, prefix), sender=related_model, weak=False, dispatch_uid=f"search-related-{model._meta.label}-{prefix}")
+                postBulkWrite.connect(self.make_bulk_handler(model, prefix), sender=related_model, weak=False, dispatch_uid=f"search-related-bulk-{model._meta.label}-{prefix}")
+                current_model = related_model
+
+    def make_related_handler(self, model, prefix):
+        def handle_related_save(sender, instance, created=False, **kwargs):
+            if created:
+                return
+            pks = list(model._default_manager.filter(**{prefix: instance.pk}).values_list('pk', flat=True))
+            if pks:
+                self.schedule_update(model, pks)
+        return handle_related_save
+
+    def make_bulk_handler(self, model, prefix):
+        """Reindex the rows of `model` a bulk write reached through `prefix` ('' for the model's own rows)."""
+        start = f"{prefix}__" if prefix else ''
+        names = {lookup[len(start):].split('__')[0] for lookup in self.fields[model] if lookup.startswith(start)}
+
+        def handle_bulk_write(sender, pks, fields=None, **kwargs):
+            if fields is None:
+                # New related rows are not referenced yet
+                if prefix:
+                    return
+            elif not names.intersection(sender._meta.get_field(name).name for name in fields):
+                return
+            if prefix:
+                pks = list(model._default_manager.filter(**{f"{prefix}__in": pks}).values_list('pk', flat=True).distinct())
+            if pks:
+                self.schedule_update(model, pks)
+        return handle_bulk_write
+
+    def handle_save(self, sender, instance, **kwargs):
+        self.schedule_update(sender, [instance.pk])
+
+    def handle_delete(self, sender, instance, **kwargs):
+        from SearchServices.backends import getSearchBackend
+        getSearchBackend().remove(sender, [instance.pk])
+
+    def handle_m2m_changed(self, sender, instance, action, reverse, model, pk_set, **kwargs):
+        if action not in ('post_add', 'post_remove', 'post_clear'):
+            return
+        if not reverse and self.is_registered(type(instance)):
+            self.schedule_update(type(instance), [instance.pk])
+        elif reverse and self.is_registered(model) and pk_set:
+            self.schedule_update(model, list(pk_set))
+
+    def schedule_update(self, model, pks):
+        """Reindex `pks` once the current transaction commits, with every other row it changed."""
+        self.changed.add([(model, pk) for pk in pks])
+
+    def update(self, changed):
+        from SearchServices.backends import getSearchBackend
+        by_model = {}
+        for model, pk in changed:
+            by_model.setdefault(model, set()).add(pk)
+        with transaction.atomic():
+            for model, pks in by_model.items():
+                getSearchBackend().update(model, sorted(pks))
+
+    def build_documents(self, model, pks):
+        """Return {pk: [(field, text), ...]} for the declared search fields, in one query."""
+        documents = {pk: [] for pk in pks}
+        lookups = self.fields[model]
+        seen = set()
+        for pk, *values in model._default_manager.filter(pk__in=pks).values_list('pk', *lookups):
+            for lookup, value in zip(lookups, values):
+                # To-many lookups repeat the row once per related row
+                if value not in (None, '') and pk in documents and (pk, lookup, value) not in seen:
+                    seen.add((pk, lookup, value))
+                    documents[pk].append((lookup, str(value)))
+        return documents
+
+    def iter_pk_batches(self, model, queryset=None):
+        """Primary keys of `queryset` (every row of `model` by default) in batches, read by keyset so indexing a batch cannot shift the next."""
+        queryset = (model._default_manager.all() if queryset is None else queryset).order_by('pk')
+        last_pk = None
+        while True:
+            batch = list((queryset if last_pk is None else queryset.filter(pk__gt=last_pk)).values_list('pk', flat=True)[:self.batch_size])
+            if not batch:
+                return
+            yield batch
+            last_pk = batch[-1]
+
+
+searchRegistry = SearchRegistry()
@@ -0,0 +1,12 @@
+from django.db import connections
+
+
+def backfillSearchIndex(sender, using='default', **kwargs):
+    """post_migrate: index the rows written before their model was registered or the index existed."""
+    from SearchServices.backends import getSearchBackend
+    from SearchServices.registry import searchRegistry
+    backend = getSearchBackend()
+    if backend.index_model is None or backend.index_model._meta.db_table not in connections[using].introspection.table_names():
+        return
+    for model in list(searchRegistry.fields):
+        backend.backfill(model)
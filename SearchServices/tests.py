@@ -0,0 +1,63 @@
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase
+
+from ApartmentServices.models import Apartment
+from PropertyServices.models import Property
+from SearchServices.backends import MySQLFullTextSearchBackend, getSearchBackend
+from SearchServices.models import SearchToken
+from SearchServices.signals import backfillSearchIndex
+from UserServices.models import Guest, User
+
+
+class SearchIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.property = Property.objects.create(name='Seaside', address='1 Harbour Road')
+            cls.apartments = [
+                Apartment.objects.create(number=number, name=name, property_assigned=cls.property, apartmentType='normal')
+                for number, name in enumerate(['Blue Suite', 'Garden Loft', 'Ab Studio'])
+            ]
+            cls.guest = Guest.objects.create(user=User.objects.create(username='guest', first_name='Alice', last_name='Martin', role='guest'))
+
+    def search(self, model, query, backend=None):
+        return set((backend or getSearchBackend()).search(model.objects.all(), query).values_list('pk', flat=True))
+
+    def test_saved_rows_are_indexed(self):
+        self.assertEqual(self.search(Apartment, 'garden'), {self.apartments[1].pk})
+
+    def test_backfill_indexes_rows_missing_from_the_index(self):
+        SearchToken.objects.filter(content_type=ContentType.objects.get_for_model(Apartment)).delete()
+        self.assertEqual(self.search(Apartment, 'garden'), set())
+        backfillSearchIndex(sender=None)
+        self.assertEqual(self.search(Apartment, 'garden'), {self.apartments[1].pk})
+
+    def test_queryset_update_reindexes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Apartment.objects.filter(pk=self.apartments[0].pk).update(name='Zebra Room')
+        self.assertEqual(self.search(Apartment, 'zebra'), {self.apartments[0].pk})
+        self.assertEqual(self.search(Apartment, 'blue'), set())
+
+    def test_bulk_update_of_a_related_row_reindexes(self):
+        user = self.guest.user
+        user.first_name = 'Quentin'
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.bulk_update([user], ['first_name'])
+        self.assertEqual(self.search(Guest, 'quentin'), {self.guest.pk})
+
+    def test_unrelated_bulk_update_does_not_reindex(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            Apartment.objects.filter(pk=self.apartments[0].pk).update(cleaned=False)
+        self.assertFalse([callback for callback in callbacks if 'schedule_update' in callback.__qualname__])
+
+
+class MySQLFullTextShortTermTests(TestCase):
+    def test_terms_below_the_token_size_use_like(self):
+        apartments = [Apartment.objects.create(number=number, name=name, apartmentType='normal') for number, name in enumerate(['Ab Studio', 'Garden Loft'])]
+        backend = MySQLFullTextSearchBackend()
+        backend.min_token_size = 3
+        backend.update(Apartment, [apartment.pk for apartment in apartments])
+        queryset = backend.search(Apartment.objects.all(), 'ab')
+        self.assertNotIn('MATCH', str(queryset.query))
+        self.assertEqual(set(queryset.values_list('pk', flat=True)), {apartments[0].pk})
+        self.assertIn('MATCH', str(backend.search(Apartment.objects.all(), 'ab studio').query))
@@ -7,7 +7,8 @@ from TaskServices.models import Task, TaskGallerie, TaskTemplate
 from rest_framework import status, generics
 from rest_framework.views import APIView
 from ApartmentServices.models import Apartment
-from cleanswitch.Helpers import CommonListAPIMixinWithFilter, CustomPageNumberPagination
+from PropertyServices.models import Property
+from cleanswitch.Helpers import CommonListAPIMixinWithFilter, ConditionalRetrieveMixin, CustomPageNumberPagination, FilterSpec, cacheResponse, propertyAccess, streamingListResponse
 from cleanswitch.permissions import IsAdminOrManager
 from django.db.models import Q
 
@@ -16,6 +17,20 @@ class TaskListCreateAPIView(generics.ListCreateAPIView):
     serializer_class = TaskSerializerWithFilters
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = CustomPageNumberPagination
+    compiled_serializer = True
+    filter_spec = FilterSpec(
+        fields={
+            'status': ['exact', 'in'],
+            'priority': ['exact', 'in'],
+            'active': 'exact',
+            'property_assigned': ['exact', 'in'],
+            'assigned_to': ['exact', 'in'],
+            'apartments_assigned': ['exact', 'in'],
+            'template': 'exact',
+            'due_date': ['gte', 'lte', 'range'],
+            'created_at': ['gte', 'lte', 'range'],
+        },
+    )
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -48,7 +63,7 @@ class TaskListCreateAPIView(generics.ListCreateAPIView):
             queryset = queryset.all()
         elif user.role == "receptionist":
             queryset = queryset.filter(
-                property_assigned__in=user.properties_assigned.all(),
+                **propertyAccess(self.request).filter('property_assigned'),
                 property_assigned__is_active=True,
                 active=True,
             )
@@ -100,6 +115,13 @@ class TaskTemplateListCreateAPIView(generics.ListCreateAPIView):
     serializer_class = TaskTemplateSerializer
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = CustomPageNumberPagination
+    filter_spec = FilterSpec(
+        fields={
+            'priority': ['exact', 'in'],
+            'active': 'exact',
+            'default_property': ['exact', 'in'],
+        },
+    )
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -129,7 +151,7 @@ class TaskTemplateListCreateAPIView(generics.ListCreateAPIView):
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
             
-class TaskRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
+class TaskRetrieveUpdateDestroyAPIView(ConditionalRetrieveMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Task.objects.all()
     serializer_class = TaskSerializerWithFilters
     pagination_class = None
@@ -271,6 +293,8 @@ class CalendarTasksAPIView(APIView):
     API endpoint to get tasks for calendar view
     """
     
+    # Staff roles only see the tasks assigned to them and managers only active properties
+    @cacheResponse(TaskCalendarSerializer, Property, per_user=True)
     def get(self, request):
         try:
             # Get date range from query parameters (optional)
@@ -292,13 +316,12 @@ class CalendarTasksAPIView(APIView):
                 queryset = queryset.filter(assigned_to=user)
             elif user.role == "receptionist":
                 queryset = queryset.filter(
-                    property_assigned__in=user.properties_assigned.all()
+                    **propertyAccess(request).filter('property_assigned')
                 )
             elif user.role == "manager":
                 queryset = queryset.filter(property_assigned__is_active=True)
             
-            serializer = TaskCalendarSerializer(queryset, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            return streamingListResponse(self, queryset, TaskCalendarSerializer)
             
         except Exception as e:
             return Response(
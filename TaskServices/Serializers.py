@@ -4,7 +4,7 @@ from UserServices.models import User
 from TaskServices.models import Task, TaskGallerie, TaskTemplate
 from ApartmentServices.Serializers import ApartmentSimpleSerializer
 from ApartmentServices.models import Apartment
-from cleanswitch.Helpers import createParsedCreatedAtUpdatedAt
+from cleanswitch.Helpers import BatchedPrimaryKeyRelatedField, CachedRepresentationMixin, createParsedCreatedAtUpdatedAt, usesFields
 from PropertyServices.Serializers import PropertySimpleSerializer
 from django.utils import timezone
 from datetime import timedelta
@@ -24,7 +24,7 @@ class UserSimpleSerializer(serializers.ModelSerializer):
 class TaskTemplateSerializer(serializers.ModelSerializer):
     default_assignees = UserSimpleSerializer(many=True, read_only=True)
     default_property_name = serializers.SerializerMethodField()
-    default_apartments = serializers.PrimaryKeyRelatedField(
+    default_apartments = BatchedPrimaryKeyRelatedField(
         many=True, 
         queryset=Apartment.objects.all(), 
         required=False
@@ -33,16 +33,20 @@ class TaskTemplateSerializer(serializers.ModelSerializer):
     class Meta:
         model = TaskTemplate
         fields = ['id', 'title', 'description', 'duration', 'priority', 'active', 'default_assignees', 'default_property', 'default_apartments', 'default_property_name', 'default_apartment_names']
+        search_fields = ['title', 'description']
+        ordering_fields = ['id', 'default_property']
 
+    @usesFields('default_property__name', 'default_property__address')
     def get_default_property_name(self, obj):
         return f"{obj.default_property.name} - {obj.default_property.address}" if obj.default_property else None
 
+    @usesFields('default_apartments__number', 'default_apartments__name')
     def get_default_apartment_names(self, obj):
         # Return list of apartment names instead of single apartment name
         return [
             f"#{apartment.number} - {apartment.name}" 
             for apartment in obj.default_apartments.all()
-        ] if obj.default_apartments.exists() else []
+        ]
         
 class TaskGalleriSerializer(serializers.ModelSerializer):
     class Meta:
@@ -50,10 +54,10 @@ class TaskGalleriSerializer(serializers.ModelSerializer):
         fields = ['image', 'order']
 
 @createParsedCreatedAtUpdatedAt
-class TaskSerializerWithFilters(serializers.ModelSerializer):
+class TaskSerializerWithFilters(CachedRepresentationMixin, serializers.ModelSerializer):
     gallery_images = TaskGalleriSerializer(many=True, read_only=True, source='gallery_task')
     due_date = serializers.DateTimeField(format='%Y-%m-%d %H:%M:%S')
-    assigned_to = serializers.PrimaryKeyRelatedField(
+    assigned_to = BatchedPrimaryKeyRelatedField(
         queryset=User.objects.all(),
         many=True,
         required=False
@@ -62,7 +66,7 @@ class TaskSerializerWithFilters(serializers.ModelSerializer):
     property_assigned = serializers.PrimaryKeyRelatedField(queryset=Property.objects.all())
     property_info = PropertySimpleSerializer(read_only=True, source='property_assigned')
 
-    apartments_assigned = serializers.PrimaryKeyRelatedField(
+    apartments_assigned = BatchedPrimaryKeyRelatedField(
         queryset=Apartment.objects.all(),
         many=True,
         required=False
@@ -94,16 +98,22 @@ class TaskSerializerWithFilters(serializers.ModelSerializer):
             'added_by_user_id', 'created_at', 'updated_at',
             'template', 'template_id',
         ]
+        search_fields = ['title', 'notes', 'description', 'status', 'priority']
+        ordering_fields = ['id', 'created_at', 'due_date']
 
+    @usesFields('assigned_to__first_name', 'assigned_to__last_name', 'assigned_to__department')
     def get_assigned_to_names(self, obj):
         return [f"{user.first_name} {user.last_name} ({user.department})" for user in obj.assigned_to.all()]
 
+    @usesFields('property_assigned__name', 'property_assigned__address')
     def get_property_assigned_name(self, obj):
         return f"{obj.property_assigned.name} - {obj.property_assigned.address}" if obj.property_assigned else None
     
+    @usesFields('apartments_assigned__number', 'apartments_assigned__name')
     def get_apartments_assigned_names(self, obj):
         return [f"{apt.number} - {apt.name}" for apt in obj.apartments_assigned.all()]
 
+    @usesFields('added_by_user_id__username')
     def get_added_by_user_id(self, obj):
         return obj.added_by_user_id.username if obj.added_by_user_id else None
 
@@ -168,6 +178,7 @@ class TaskCalendarSerializer(serializers.ModelSerializer):
     def get_type(self, obj):
         return 'task'
     
+    @usesFields('assigned_to__first_name', 'assigned_to__last_name', 'assigned_to__department')
     def get_assignees_info(self, obj):
         return [{
             'id': user.id,
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-18 00:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ApartmentServices", "0006_booking_apartmentse_dateofr_d9ac12_idx"),
+        ("PropertyServices", "0002_initial"),
+        ("TaskServices", "0002_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                fields=["created_at", "id"], name="TaskService_created_a0c227_idx"
+            ),
+        ),
+    ]
@@ -4,6 +4,7 @@ from UserServices.models import User
 from PropertyServices.models import Property
 from django.core.validators import MaxValueValidator
 from ApartmentServices.models import Apartment 
+from cleanswitch.cache import TaggedManager
 
 class TaskTemplate(models.Model):
     PRIORITY_CHOICES = (
@@ -30,6 +31,7 @@ class TaskTemplate(models.Model):
     default_property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='property_task_template', blank=True, null=True)
     active = models.BooleanField(default=True)
     default_assignees = models.ManyToManyField(User, blank=True)
+    objects = TaggedManager()
     
     def __str__(self):
         return self.title
@@ -73,7 +75,14 @@ class Task(models.Model):
     )
     created_at=models.DateTimeField(auto_now_add=True)
     updated_at=models.DateTimeField(auto_now=True)
+    objects = TaggedManager()
 
+    class Meta:
+        indexes = [
+            # Keyset pagination seeks on (ordering field, id)
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['due_date', 'id']),
+        ]
     
     def save(self, *args, **kwargs):
         # If created from template, copy template values if not provided
@@ -92,6 +101,7 @@ class TaskGallerie(models.Model):
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name="gallery_task")
     image = models.JSONField(blank=True, null=True)
     order = models.IntegerField(default=0, validators=[MaxValueValidator(7)])
+    objects = TaggedManager()
     
     class Meta:
         ordering = ['order']
@@ -1,3 +1,97 @@
+from datetime import timedelta
+
+from django.core.exceptions import ImproperlyConfigured
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIRequestFactory
+
+from ApartmentServices.models import Apartment
+from PropertyServices.models import Property
+from TaskServices.models import Task, TaskGallerie, TaskTemplate
+from TaskServices.Serializers import TaskSerializerWithFilters
+from UserServices.models import User
+from cleanswitch.Helpers import FilterSpec
+from cleanswitch.compiled import CompiledSerializer
+
+
+class CompiledSerializerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', role='admin', is_superuser=True)
+        cleaner = User.objects.create(username='cleaner', role='cleaning', first_name='Clean', last_name='Er')
+        prop = Property.objects.create(name='Main', address='1 Street')
+        apartments = [
+            Apartment.objects.create(number=number, name=f'Apt {number}', property_assigned=prop, apartmentType='normal', price=100)
+            for number in range(2)
+        ]
+        template = TaskTemplate.objects.create(title='Turnover', default_property=prop)
+        template.default_apartments.set(apartments)
+        now = timezone.now()
+        cls.tasks = [
+            Task.objects.create(
+                title=f'Task {number}', description='', priority='high', property_assigned=prop if number else None,
+                due_date=now + timedelta(days=number), added_by_user_id=cls.admin, template=template if number % 2 else None,
+            )
+            for number in range(3)
+        ]
+        cls.tasks[1].assigned_to.set([cls.admin, cleaner])
+        cls.tasks[1].apartments_assigned.set(apartments)
+        TaskGallerie.objects.create(task=cls.tasks[1], image={'url': 'a.jpg'}, order=1)
+
+    def test_compiled_rows_match_the_serializer(self):
+        request = APIRequestFactory().get('/api/tasks/')
+        request.user = self.admin
+        context = {'request': request}
+        expected = TaskSerializerWithFilters(self.tasks, many=True, context=context).data
+        compiled = CompiledSerializer(TaskSerializerWithFilters(context=context)).serialize(self.tasks, context)
+        self.assertEqual(compiled, [dict(row) for row in expected])
+
+
+class FilterSpecTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', role='admin', is_superuser=True)
+        cls.properties = [Property.objects.create(name=f'P{number}') for number in range(2)]
+        now = timezone.now()
+        cls.tasks = [
+            Task.objects.create(
+                title=f'Task {number}', description='', priority='low', property_assigned=cls.properties[number % 2],
+                due_date=now + timedelta(days=number), added_by_user_id=cls.admin,
+            )
+            for number in range(4)
+        ]
+        cls.tasks[0].assigned_to.set([cls.admin])
+        cls.tasks[2].assigned_to.set([cls.admin])
+        cls.plan = FilterSpec(
+            fields={'property_assigned': ['exact', 'in'], 'assigned_to': 'exact', 'due_date': ['gte', 'range']},
+        ).compile(Task, ['id', 'due_date'])
+
+    def filtered(self, params):
+        return sorted(self.plan.filter(Task.objects.all(), params).values_list('pk', flat=True))
+
+    def test_declared_lookups_filter(self):
+        self.assertEqual(self.filtered({'property_assigned': str(self.properties[0].pk)}), [self.tasks[0].pk, self.tasks[2].pk])
+        self.assertEqual(self.filtered({'property_assigned__in': f'{self.properties[0].pk},{self.properties[1].pk}'}), [task.pk for task in self.tasks])
+        self.assertEqual(self.filtered({'due_date__gte': self.tasks[2].due_date.date().isoformat()}), [self.tasks[2].pk, self.tasks[3].pk])
+
+    def test_to_many_filters_do_not_repeat_rows(self):
+        self.tasks[0].assigned_to.add(User.objects.create(username='other', role='cleaning'))
+        self.assertEqual(self.filtered({'assigned_to': str(self.admin.pk)}), [self.tasks[0].pk, self.tasks[2].pk])
+
+    def test_undeclared_params_are_ignored(self):
+        self.assertEqual(len(self.filtered({'status': 'done', 'title': 'x'})), 4)
+
+    def test_invalid_values_name_the_parameter(self):
+        with self.assertRaises(ValidationError) as raised:
+            self.plan.filter(Task.objects.all(), {'due_date__range': '2024-01-01'})
+        self.assertIn('due_date', raised.exception.detail)
+
+    def test_ordering_is_restricted_to_the_declared_fields(self):
+        self.assertEqual(list(self.plan.order(Task.objects.all(), '-due_date').values_list('pk', flat=True)), [task.pk for task in reversed(self.tasks)])
+        with self.assertRaises(ValidationError):
+            self.plan.order(Task.objects.all(), 'title')
 
-# Create your tests here.
+    def test_unindexed_ordering_is_a_configuration_error(self):
+        with self.assertRaises(ImproperlyConfigured):
+            FilterSpec(ordering=['title']).compile(Task)
@@ -7,6 +7,7 @@ from django.contrib.auth import update_session_auth_hash
 from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth import update_session_auth_hash
 from django.db import IntegrityError, transaction
+from cleanswitch.authentication import addUserClaims
 
 
 class LoginAPIView(APIView):
@@ -16,17 +17,7 @@ class LoginAPIView(APIView):
         user = authenticate(username=username, password=password)
         if user:
             refresh = RefreshToken.for_user(user)
-            access = refresh.access_token
-            properties = user.properties_assigned.all().values('id', 'name')
-            access['role'] = user.role
-            access['username'] = user.username
-            access['first_name'] = user.first_name
-            access['last_name'] = user.last_name
-            access['email'] = user.email
-            access['phone'] = user.phone
-            access['department'] = user.department
-            access['user_id'] = user.id
-            access['properties_assigned'] = list(properties)
+            access = addUserClaims(refresh.access_token, user)
             return Response({
                 'refresh': str(refresh),
                 'access': str(access),
@@ -13,7 +13,7 @@ from LocationServices.models import StaffLocation
 from django.utils import timezone
 from django.db.models import Count
 from TaskServices.models import Task
-from cleanswitch.Helpers import CommonListAPIMixinWithFilter, CustomPageNumberPagination
+from cleanswitch.Helpers import CommonListAPIMixinWithFilter, ConditionalRetrieveMixin, CustomPageNumberPagination, FilterSpec, propertyAccess, streamingListResponse
 from cleanswitch.permissions import IsAdmin, IsAdminOrManager, IsReceptionist
 from django.contrib.auth.hashers import make_password
 from django.core.exceptions import ValidationError
@@ -32,6 +32,15 @@ class ListUserAPIView(ListAPIView):
     serializer_class = UserSerializerWithFilters
     permission_classes = [IsAuthenticated]
     pagination_class = CustomPageNumberPagination
+    filter_spec = FilterSpec(
+        fields={
+            'role': ['exact', 'in'],
+            'department': ['exact', 'in'],
+            'is_active': 'exact',
+            'properties_assigned': ['exact', 'in'],
+            'date_joined': ['gte', 'lte', 'range'],
+        },
+    )
     def get_queryset(self):
         queryset = super().get_queryset()
         user = self.request.user
@@ -291,7 +300,7 @@ class UpdateUserAPIView(APIView):
             status=status.HTTP_400_BAD_REQUEST
         )
         
-class RetrieveDestroyUserAPIView(RetrieveDestroyAPIView):
+class RetrieveDestroyUserAPIView(ConditionalRetrieveMixin, RetrieveDestroyAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
@@ -891,8 +900,7 @@ class StaffScheduleAPIView(APIView):
             week = request.query_params.get('week')
             if week:
                 schedules = schedules.filter(week_number=week)
-            serializer = StaffScheduleSerializer(schedules, many=True)
-            return Response(serializer.data)
+            return streamingListResponse(self, schedules, StaffScheduleSerializer)
         
         except User.DoesNotExist:
             return Response(
@@ -1217,6 +1225,13 @@ class SalariesByPeriodAPIView(ListAPIView):
     serializer_class = SalarySerializer
     permission_classes = [IsAdmin, IsAuthenticated]
     pagination_class = CustomPageNumberPagination
+    filter_spec = FilterSpec(
+        fields={
+            'status': ['exact', 'in'],
+            'user': ['exact', 'in'],
+            'property': ['exact', 'in'],
+        },
+    )
     
     def get_queryset(self):
         start_date = self.request.query_params.get("start_date")
@@ -1282,7 +1297,7 @@ class GuestRetrieveUpdateDestroyAPIView(RetrieveUpdateDestroyAPIView):
         queryset = super().get_queryset()
         user = self.request.user
         if user.role == ['receptionist', 'manager']:
-            queryset = Guest.objects.filter(user__role='guest', user__properties_assigned__in=user.properties_assigned.all())
+            queryset = Guest.objects.filter(user__role='guest', **propertyAccess(self.request).filter('user__properties_assigned'))
         elif user.role in ['admin', 'manager']:
             queryset = Guest.objects.filter(user__role='guest')
         return queryset
@@ -1292,12 +1307,18 @@ class GuestListAPIView(ListAPIView):
     queryset = Guest.objects.all()
     permission_classes = [IsAuthenticated, IsReceptionist]
     pagination_class = CustomPageNumberPagination
+    filter_spec = FilterSpec(
+        fields={
+            'user': ['exact', 'in'],
+            'user__is_active': 'exact',
+        },
+    )
     
     def get_queryset(self):
         queryset = super().get_queryset()
         user = self.request.user
         if user.role == 'receptionist':
-            queryset = Guest.objects.filter(user__role='guest', user__properties_assigned__in=user.properties_assigned.all())
+            queryset = Guest.objects.filter(user__role='guest', **propertyAccess(self.request).filter('user__properties_assigned'))
         elif user.role in ['admin', 'manager']:
             queryset = Guest.objects.filter(user__role='guest')
         return queryset
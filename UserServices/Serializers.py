@@ -2,7 +2,7 @@ import math
 from rest_framework import serializers
 from ApartmentServices.models import Booking
 from ApartmentServices.Serializers import ApartmentSerializer, BookingCreateSerializer
-from cleanswitch.Helpers import createParsedCreatedAtUpdatedAt
+from cleanswitch.Helpers import createParsedCreatedAtUpdatedAt, getPrefetched, usesFields
 from PropertyServices.Serializers import PropertySimpleSerializer
 from .models import Guest, PayRule, Salary, StaffSchedule, User
 from django.utils import timezone
@@ -25,6 +25,7 @@ class UserSerializer(serializers.ModelSerializer):
                   'is_active', 'created_at', 'currency', 'payrules',
                   ]
         read_only_fields = ['id', 'role']
+    @usesFields('first_name', 'last_name')
     def get_fullName(self, obj):
         return obj.get_full_name()
     
@@ -36,7 +37,10 @@ class UserSerializerWithFilters(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'first_name', 'last_name', 'email', 'role', 'department', 'phone', 'properties_assigned', 'date_joined', 'created_at', 'updated_at', 'added_by_user', 'is_active']
+        search_fields = ['username', 'first_name', 'last_name', 'email', 'phone', 'role', 'department']
+        ordering_fields = ['id', 'username', 'last_name', 'date_joined']
 
+    @usesFields('added_by_user_id__username')
     def get_added_by_user(self, obj):
         if obj.added_by_user_id:
             return obj.added_by_user_id.username
@@ -48,6 +52,7 @@ class StaffScheduleSerializer(serializers.ModelSerializer):
     class Meta:
         model = StaffSchedule
         fields = '__all__'
+    @usesFields('staff__first_name', 'staff__last_name')
     def get_fullName(self, obj):
         return obj.staff.get_full_name()
     
@@ -58,6 +63,7 @@ class UserPlanningSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id', 'username', 'fullName', 'department']
     
+    @usesFields('first_name', 'last_name')
     def get_fullName(self, obj):
         return obj.get_full_name()
 
@@ -69,16 +75,21 @@ class SalarySerializer(serializers.ModelSerializer):
     class Meta:
         model = Salary
         fields = '__all__'
+        ordering_fields = ['id', 'user', 'property']
 
+    @usesFields('user__first_name', 'user__last_name')
     def get_user_fullName(self, obj):
         return obj.user.get_full_name()
     
+    @usesFields('user__role')
     def get_user_role(self, obj):
         return f'{obj.user.role}'
     
+    @usesFields('property__name', 'property__address')
     def get_user_property(self, obj):
         return f'{obj.property.name} - {obj.property.address}'
     
+    @usesFields('user__currency')
     def get_user_currency(self, obj):
         return f'{obj.user.currency}'
 
@@ -111,13 +122,25 @@ class GuestListSerializer(serializers.ModelSerializer):
         model = Guest
         fields = ['id', 'user', 'recent_bookings', 'booking_count']
         read_only_fields = fields
+        search_fields = ['user__first_name', 'user__last_name', 'user__email', 'user__phone']
+        ordering_fields = ['id', 'user']
 
+    @usesFields(
+        'booking__apartments__property_assigned', 'booking__apartments__added_by_user_id',
+        'booking__added_by_user_id__properties_assigned', 'booking__added_by_user_id__payrules',
+    )
     def get_recent_bookings(self, obj):
-        recent_bookings = Booking.objects.filter(guest=obj).order_by('-startDate')[:5]
+        bookings = getPrefetched(obj, 'booking_set')
+        if bookings is None:
+            recent_bookings = Booking.objects.filter(guest=obj).order_by('-startDate')[:5]
+        else:
+            recent_bookings = sorted(bookings, key=lambda booking: booking.startDate, reverse=True)[:5]
         return BookingSerializer(recent_bookings, many=True).data
 
+    @usesFields('booking')
     def get_booking_count(self, obj):
-        return obj.num_of_bookings()
+        bookings = getPrefetched(obj, 'booking_set')
+        return len(bookings) if bookings is not None else obj.num_of_bookings()
 
 class BookingSerializer(serializers.ModelSerializer):
     apartments = ApartmentSerializer(many=True, read_only=True)
@@ -142,6 +165,7 @@ class BookingSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = fields
 
+    @usesFields('startDate', 'endDate')
     def get_duration(self, obj):
         try:
             total_hours = (obj.endDate - obj.startDate).total_seconds() / 3600
@@ -150,6 +174,7 @@ class BookingSerializer(serializers.ModelSerializer):
         except (AttributeError, TypeError):
             return None
         
+    @usesFields('startDate', 'endDate', 'apartments__price')
     def get_totalPrice(self, obj):
         try:
             # Calculate total price for all apartments
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.3 on 2026-10-18 00:55
+
+import UserServices.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("UserServices", "0002_alter_user_currency"),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name="user",
+            managers=[
+                ("objects", UserServices.models.TaggedUserManager()),
+            ],
+        ),
+    ]
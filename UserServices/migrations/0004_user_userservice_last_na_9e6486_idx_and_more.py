@@ -0,0 +1,27 @@
+# Generated by Django 5.2.3 on 2026-10-18 01:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("PropertyServices", "0006_property_propertyser_name_828f7e_idx_and_more"),
+        ("UserServices", "0003_alter_user_managers"),
+        ("auth", "0012_alter_user_first_name_max_length"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                fields=["last_name", "id"], name="UserService_last_na_9e6486_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                fields=["date_joined", "id"], name="UserService_date_jo_6c5e9c_idx"
+            ),
+        ),
+    ]
@@ -1,8 +1,19 @@
 import math
 from django.db import models
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from PropertyServices.models import Property
 from ApartmentServices.models import Booking
+from cleanswitch.cache import TaggedManager, TaggedQuerySet
+
+class UserQuerySet(TaggedQuerySet):
+    def rows_changed(self, pks, fields=None):
+        super().rows_changed(pks, fields)
+        from cleanswitch.authentication import REVOKING_FIELDS, revokeUserTokens
+        if fields is not None and REVOKING_FIELDS.intersection(fields):
+            revokeUserTokens(pks, using=self.db)
+
+class TaggedUserManager(UserManager.from_queryset(UserQuerySet)):
+    pass
 
 class User(AbstractUser):
     ROLES = (
@@ -23,6 +34,14 @@ class User(AbstractUser):
     currency=models.CharField(max_length=50,blank=True,null=True,default='€',choices=(('XAF','XAF'), ('$','$'),('INR','INR'),('€','€'),('GBP','GBP'),('AUD','AUD'),('CAD','CAD'),('JPY','JPY'),('CNY','CNY'),('RUB','RUB'),('BRL','BRL'),('ZAR','ZAR'),('NGN','NGN'),('MXN','MXN'),('ARS','ARS'),('CHF','CHF'),('SEK','SEK'),('NOK','NOK'),('DKK','DKK'),('PLN','PLN'),('CZK','CZK'),('TRY','TRY'),('UAH','UAH'),('HUF','HUF'),('RON','RON'),('BGN','BGN'),('HRK','HRK'),('SLO','SLO'),('SK','SK'),('LT','LT'),('LV','LV'),('EE','EE'),('IE','IE'),('SC','SC'),('WL','WL'),('NI','NI'),('NZ','NZ'),('SGD','SGD'),('MYR','MYR'),('THB','THB'),('IDR','IDR'),('PHP','PHP'),('VND','VND'),('KRW','KRW'),('KPW','KPW'),('TWD','TWD'),('HKD','HKD'),('MOP','MOP'),('BDT','BDT'),('PKR','PKR'),('LKR','LKR'),('NPR','NPR'),('BTN','BTN'),('MVR','MVR'),('AFN','AFN'),('IRR','IRR'),('IQD','IQD'),('SYP','SYP'),('LBN','LBN')))
     created_at=models.DateTimeField(auto_now_add=True)
     updated_at=models.DateTimeField(auto_now=True)
+    objects = TaggedUserManager()
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Orderings of the user lists (UserSerializerWithFilters.Meta.ordering_fields)
+            models.Index(fields=['last_name', 'id']),
+            models.Index(fields=['date_joined', 'id']),
+        ]
 
     def __str__(self):
         return self.username
@@ -31,6 +50,7 @@ class User(AbstractUser):
 class Guest(models.Model):
     user = models.OneToOneField(User, null=True, on_delete=models.CASCADE)
     idCard = models.JSONField(blank=True, null=True)
+    objects = TaggedManager()
     def __str__(self):
         return f"{self.user.get_full_name() if self.user else 'Anonymous'}"
 
@@ -83,6 +103,7 @@ class StaffSchedule(models.Model):
     end_time = models.CharField(max_length=50, null=True, blank=True)
     added_by_user_id=models.ForeignKey(User, on_delete=models.SET_NULL,blank=True,null=True,related_name='added_by_user_id_schedule')
     created_at = models.DateTimeField(auto_now_add=True)
+    objects = TaggedManager()
 
     class Meta:
         ordering = ['week_number', 'day']
@@ -100,6 +121,7 @@ class PayRule(models.Model):
     payRate = models.FloatField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now=True)
     updated_at=models.DateTimeField(auto_now=True)
+    objects = TaggedManager()
 
 class Salary(models.Model):
     PAY_STATUS = (
@@ -115,6 +137,7 @@ class Salary(models.Model):
     paid_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now=True)
     updated_at=models.DateTimeField(auto_now=True)
+    objects = TaggedManager()
 
 class Bill(models.Model):
     guest = models.ForeignKey(User, on_delete=models.CASCADE, related_name='guest_bill')
@@ -122,6 +145,7 @@ class Bill(models.Model):
     summary = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now=True)
     updated_at=models.DateTimeField(auto_now=True)
+    objects = TaggedManager()
 
 
 class ActivityLog(models.Model):
@@ -134,3 +158,4 @@ class ActivityLog(models.Model):
     activity_device=models.CharField(max_length=50)
     created_at=models.DateTimeField(auto_now_add=True)
     updated_at=models.DateTimeField(auto_now=True)
+    objects = TaggedManager()
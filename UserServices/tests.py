@@ -1,3 +1,69 @@
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework.test import APIClient, APIRequestFactory
 
-# Create your tests here.
+from PropertyServices.models import Property
+from UserServices.models import User
+from cleanswitch.authentication import ClaimsJWTAuthentication, revocationTag
+from cleanswitch.cache import referenceCache
+
+
+class TokenClaimsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.property = Property.objects.create(name='Main', address='1 Street')
+        cls.user = User.objects.create(username='reception', role='reception', first_name='Front', last_name='Desk')
+        cls.user.set_password('secret-password')
+        cls.user.save()
+        cls.user.properties_assigned.set([cls.property])
+
+    def setUp(self):
+        cache.clear()
+        referenceCache.invalidate([revocationTag(self.user.pk)])
+        self.client = APIClient()
+        self.login()
+
+    def login(self):
+        response = APIClient().post('/api/auth/login/', {'username': 'reception', 'password': 'secret-password'}, format='json', secure=True)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.access = response.json()['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access}")
+
+    def status(self):
+        return self.client.get('/api/tasks/', secure=True).status_code
+
+    def change(self, change):
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+
+    def test_request_user_comes_from_the_claims(self):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f"Bearer {self.access}")
+        ClaimsJWTAuthentication().authenticate(request)
+        with self.assertNumQueries(0):
+            user, _ = ClaimsJWTAuthentication().authenticate(request)
+        self.assertEqual((user.pk, user.role, user.property_ids), (self.user.pk, 'reception', {self.property.pk}))
+
+    def test_unclaimed_changes_keep_the_token(self):
+        self.change(lambda: User.objects.get(pk=self.user.pk).save())
+        self.change(lambda: User.objects.filter(pk=self.user.pk).update(last_login=None))
+        self.assertEqual(self.status(), 200)
+
+    def test_role_change_revokes_issued_tokens(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.role = 'manager'
+        self.change(user.save)
+        self.assertEqual(self.status(), 401)
+        self.login()
+        self.assertEqual(self.status(), 200)
+
+    def test_deactivation_through_update_revokes_issued_tokens(self):
+        self.change(lambda: User.objects.filter(pk=self.user.pk).update(is_active=False))
+        self.assertEqual(self.status(), 401)
+
+    def test_property_assignment_revokes_issued_tokens(self):
+        other = Property.objects.create(name='Other', address='2 Street')
+        self.change(lambda: other.assigned_users.add(self.user))
+        self.assertEqual(self.status(), 401)
+        self.login()
+        self.change(lambda: other.assigned_users.clear())
+        self.assertEqual(self.status(), 401)
@@ -1,11 +1,34 @@
+import base64
+import hashlib
+import json
+import time
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
 from rest_framework.response import Response
 from rest_framework.views import exception_handler 
-from rest_framework.exceptions import AuthenticationFailed,NotAuthenticated,PermissionDenied
+from rest_framework.exceptions import AuthenticationFailed,NotAuthenticated,PermissionDenied,ValidationError
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.relations import MANY_RELATION_KWARGS
 from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured, ValidationError as DjangoValidationError
+from django.core.paginator import Paginator
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.db import connections
 from django.db.models import Q
 from django.db import models
+from django.db.models.sql import Query
+from django.utils.dateparse import parse_date
+from django.utils.functional import cached_property
 from rest_framework import serializers
+from SearchServices.backends import searchQueryset
+from cleanswitch.cache import MISSING, getVersions, listTag, objectTag, referenceCache, tableTags
+from cleanswitch.compiled import getCompiledSerializer
 
 def renderResponse(data,message,status=200):
     if status>=200 and status<300:
@@ -46,9 +69,848 @@ def custom_exception_handler(exc, context):
     return response
         
     
+COUNT_KEY_IGNORED_PARAMS=('page','pageSize','ordering','cursor','withCount','fields','expand')
+
+
+def buildCountKey(request,view):
+    """Identity of a list's row count: view, URL kwargs, caller scope (role and assigned property ids) and filter set (not paging or ordering)."""
+    if view is None:
+        return None
+    user=request.user
+    params=sorted((key,value) for key,value in request.query_params.lists() if key not in COUNT_KEY_IGNORED_PARAMS)
+    property_ids=','.join(map(str,sorted(propertyAccess(request).property_ids)))
+    parts=[type(view).__module__,type(view).__qualname__,request.path,str(getattr(user,'pk',None)),str(getattr(user,'role',None)),property_ids,json.dumps(params)]
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+
+def queryTables(query):
+    """Every table a query reads, including the ones behind __in subqueries and Exists()."""
+    tables={query.get_meta().db_table}|{join.table_name for join in query.alias_map.values()}
+    nodes=list(query.where.children)
+    while nodes:
+        node=nodes.pop()
+        if hasattr(node,'children'):
+            nodes.extend(node.children)
+            continue
+        for inner in (getattr(node,'rhs',None),getattr(node,'query',None),getattr(node,'lhs',None)):
+            inner=getattr(inner,'query',inner)
+            if isinstance(inner,Query):
+                tables|=queryTables(inner)
+    return tables
+
+
+def estimateCount(queryset):
+    """MySQL EXPLAIN row estimate when it is above LIST_COUNT_ESTIMATE_THRESHOLD, otherwise None."""
+    threshold=getattr(settings,'LIST_COUNT_ESTIMATE_THRESHOLD',None)
+    if threshold is None or connections[queryset.db].vendor!='mysql':
+        return None
+    sql,params=queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f"EXPLAIN {sql}",params)
+        columns=[column[0] for column in cursor.description]
+        plan=[dict(zip(columns,row)) for row in cursor.fetchall()]
+    estimate=1
+    for row in plan:
+        if row.get('select_type') in ('SIMPLE','PRIMARY') and row.get('rows'):
+            estimate*=row['rows']*float(row.get('filtered') or 100)/100
+    estimate=int(estimate)
+    return estimate if estimate>threshold else None
+
+
+def cachedCount(queryset,count_key=None):
+    if not hasattr(queryset,'query'):
+        return len(queryset)
+    if count_key is None:
+        return queryset.count()
+    versions=getVersions(sorted(tableTags(queryTables(queryset.query))))
+    key='count:'+hashlib.sha1(f"{count_key}|{sorted(versions.items())}".encode()).hexdigest()
+    count=cache.get(key)
+    if count is None:
+        count=estimateCount(queryset)
+        if count is None:
+            count=queryset.count()
+        cache.set(key,count,getattr(settings,'LIST_COUNT_CACHE_TIMEOUT',None))
+    return count
+
+
+class CachedCountPaginator(Paginator):
+    def __init__(self,object_list,per_page,count_key=None,**kwargs):
+        super().__init__(object_list,per_page,**kwargs)
+        self.count_key=count_key
+
+    @cached_property
+    def count(self):
+        return cachedCount(self.object_list,self.count_key)
+
+
 class CustomPageNumberPagination(PageNumberPagination):
     page_size_query_param='pageSize'
     max_page_size=100
+    count_key=None
+
+    def paginate_queryset(self,queryset,request,view=None):
+        self.count_key=buildCountKey(request,view)
+        return super().paginate_queryset(queryset,request,view)
+
+    def django_paginator_class(self,object_list,per_page):
+        # DRF builds its paginator through this attribute; bind the count key of the current request
+        return CachedCountPaginator(object_list,per_page,count_key=self.count_key)
+
+
+class KeysetPagination:
+    """
+    Opt-in cursor pagination for the common list decorators (?cursor=, empty for the first page).
+    Seeks on (ordering field, id) instead of COUNT(*) + OFFSET; totalItems is only computed with ?withCount=true.
+    """
+    cursor_query_param='cursor'
+    count_query_param='withCount'
+    page_size_query_param='pageSize'
+    page_size=20
+    max_page_size=100
+
+    @classmethod
+    def is_requested(cls,request):
+        return cls.cursor_query_param in request.query_params
+
+    def get_page_size(self,request):
+        try:
+            page_size=int(request.query_params.get(self.page_size_query_param,self.page_size))
+        except (TypeError,ValueError):
+            page_size=self.page_size
+        return max(1,min(page_size,self.max_page_size))
+
+    def get_ordering_field(self,queryset):
+        ordering=list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        field_name=ordering[0] if ordering and isinstance(ordering[0],str) else '-id'
+        descending=field_name.startswith('-')
+        field_name=field_name.lstrip('-')
+        local_fields={field.name:field.attname for field in queryset.model._meta.concrete_fields}
+        local_fields.update({attname:attname for attname in local_fields.values()})
+        return local_fields.get(field_name,'id'),descending
+
+    def encode_cursor(self,value,pk,reverse=False):
+        if isinstance(value,(datetime,date)):
+            value=value.isoformat()
+        elif isinstance(value,Decimal):
+            value=str(value)
+        raw=json.dumps({'v':value,'id':pk,'r':reverse},separators=(',',':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self,cursor):
+        try:
+            raw=base64.urlsafe_b64decode((cursor+'='*(-len(cursor)%4)).encode())
+            position=json.loads(raw)
+            return position['v'],int(position['id']),bool(position.get('r',False))
+        except (ValueError,KeyError,TypeError):
+            raise ValidationError({'cursor':['Invalid cursor']})
+
+    def get_seek_condition(self,field_name,value,pk,ascending):
+        # NULLs sort first on MySQL/SQLite: they lead an ascending scan and trail a descending one
+        after='gt' if ascending else 'lt'
+        if value is None:
+            condition=Q(**{f"{field_name}__isnull":True,f"id__{after}":pk})
+            if ascending:
+                condition|=Q(**{f"{field_name}__isnull":False})
+            return condition
+        condition=Q(**{f"{field_name}__{after}":value})|Q(**{field_name:value,f"id__{after}":pk})
+        if not ascending:
+            condition|=Q(**{f"{field_name}__isnull":True})
+        return condition
+
+    def get_payload(self,view,queryset,sparse=None,compiled=None):
+        request=view.request
+        page_size=self.get_page_size(request)
+        field_name,descending=self.get_ordering_field(queryset)
+        cursor=request.query_params.get(self.cursor_query_param)
+        value=pk=None
+        reverse=False
+        if cursor:
+            value,pk,reverse=self.decode_cursor(cursor)
+
+        # A previous-page cursor walks the index the other way round and flips the rows back afterwards
+        ascending=(not descending)!=reverse
+        ordering=[field_name,'id'] if ascending else [f"-{field_name}",'-id']
+        page_queryset=queryset.order_by(*ordering)
+        if cursor:
+            page_queryset=page_queryset.filter(self.get_seek_condition(field_name,value,pk,ascending))
+
+        rows=list(page_queryset[:page_size+1])
+        has_more=len(rows)>page_size
+        rows=rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        has_next=has_more if not reverse else True
+        has_previous=has_more if reverse else bool(cursor)
+        next_cursor=self.encode_cursor(getattr(rows[-1],field_name),rows[-1].pk) if rows and has_next else None
+        previous_cursor=self.encode_cursor(getattr(rows[0],field_name),rows[0].pk,reverse=True) if rows and has_previous else None
+
+        with_count=request.query_params.get(self.count_query_param,'').lower() in ('1','true')
+        data=serializeList(view,rows,sparse,compiled)
+        return {'data':data,'nextCursor':next_cursor,'previousCursor':previous_cursor,'pageSize':page_size,'totalItems':cachedCount(queryset,buildCountKey(request,view)) if with_count else None}
+
+
+def usesFields(*lookups):
+    """Declare the model lookups a SerializerMethodField reads, e.g. @usesFields('property_assigned__name')."""
+    def decorator(method):
+        method.uses_fields=lookups
+        return method
+    return decorator
+
+
+def parseFieldsTree(value):
+    tree={}
+    for path in (value or '').split(','):
+        node=tree
+        for part in [part.strip() for part in path.split('.') if part.strip()]:
+            node=node.setdefault(part,{})
+    return tree
+
+
+class SparseFieldset:
+    """
+    ?fields=id,status,guest.user.first_name keeps only those fields; nested serializers that are
+    not in ?expand= (or named by a dotted path) collapse to their primary keys. Pruned fields are
+    removed from the serializer, so their SerializerMethodFields and nested serializers never run.
+    """
+    fields_query_param='fields'
+    expand_query_param='expand'
+
+    def __init__(self,request):
+        self.fields=parseFieldsTree(request.query_params.get(self.fields_query_param))
+        self.expand=parseFieldsTree(request.query_params.get(self.expand_query_param))
+
+    @property
+    def active(self):
+        return bool(self.fields or self.expand)
+
+    def apply(self,serializer):
+        if self.active:
+            self.prune(serializer,self.fields,self.expand)
+        return serializer
+
+    def prune(self,serializer,fields,expand):
+        if isinstance(serializer,serializers.ListSerializer):
+            serializer=serializer.child
+        if fields:
+            for name in [name for name in serializer.fields if name not in fields]:
+                serializer.fields.pop(name)
+        for name,field in list(serializer.fields.items()):
+            nested=field.child if isinstance(field,serializers.ListSerializer) else field
+            if not isinstance(nested,serializers.BaseSerializer):
+                continue
+            subtree=fields.get(name,{})
+            if name in expand or subtree:
+                self.prune(nested,subtree,expand.get(name,{}))
+            elif fields:
+                serializer.fields[name]=self.primary_key_field(serializer,field)
+
+    def primary_key_field(self,serializer,field):
+        many=isinstance(field,serializers.ListSerializer)
+        model=getattr(getattr(serializer,'Meta',None),'model',None)
+        if model is not None and not many and '.' not in field.source:
+            try:
+                model_field=model._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                model_field=None
+            if model_field is not None and model_field.concrete and model_field.many_to_one:
+                # Read the FK column itself instead of loading the related row
+                return serializers.ReadOnlyField(source=model_field.attname)
+        # DRF rejects a source that merely repeats the field name
+        kwargs={'source':field.source} if field.source!=field.field_name else {}
+        return serializers.PrimaryKeyRelatedField(many=many,read_only=True,**kwargs)
+
+    def restrict_queryset(self,queryset,serializer):
+        """.only() the columns the pruned serializer reads; left untouched when a field's sources are unknown."""
+        if not self.fields or queryset.query.select_related is True:
+            return queryset
+        if isinstance(serializer,serializers.ListSerializer):
+            serializer=serializer.child
+        model=queryset.model
+        columns={model._meta.pk.name}
+        lookups=[]
+        for name,field in serializer.fields.items():
+            if isinstance(field,serializers.SerializerMethodField):
+                uses=getattr(getattr(serializer,field.method_name),'uses_fields',None)
+                if uses is None:
+                    return queryset
+                lookups.extend(uses)
+            elif field.source=='*':
+                return queryset
+            else:
+                lookups.append('__'.join(field.source_attrs))
+        lookups.extend(item.lstrip('-') for item in list(queryset.query.order_by)+list(model._meta.ordering) if isinstance(item,str))
+        lookups.extend(queryset.query.select_related or {})
+        for lookup in lookups:
+            try:
+                model_field=model._meta.get_field(lookup.split('__')[0])
+            except FieldDoesNotExist:
+                return queryset
+            if model_field.concrete and not model_field.many_to_many:
+                columns.add(model_field.name)
+        return queryset.only(*columns)
+
+
+def getListSerializer(view,instance,sparse=None):
+    serializer=view.get_serializer(instance,many=True)
+    return sparse.apply(serializer) if sparse is not None else serializer
+
+
+def getListCompiledSerializer(view,serializer,sparse):
+    """Compiled fast path for views declaring `compiled_serializer = True`, None when the serializer cannot be compiled."""
+    if not getattr(view,'compiled_serializer',False):
+        return None
+    return getCompiledSerializer(serializer,cache=not sparse.active)
+
+
+def serializeList(view,instance,sparse=None,compiled=None):
+    if compiled is not None:
+        context=view.get_serializer_context()
+        if isinstance(compiled.serializer,CachedRepresentationMixin):
+            return RepresentationCache(compiled.serializer).serialize(list(instance),lambda pks:compiled.serialize(pks,context))
+        return compiled.serialize(instance,context)
+    return getListSerializer(view,instance,sparse).data
+
+
+def getPrefetched(obj,accessor):
+    """Rows of a prefetched relation, or None when `accessor` was not prefetched on this instance."""
+    queryset=getattr(obj,accessor).all()
+    return list(queryset) if queryset._result_cache is not None else None
+
+
+class EagerLoadingPlan:
+    """
+    Relation tree a serializer walks, derived from its fields: nested serializers, related fields,
+    dotted sources and the @usesFields lookups of SerializerMethodFields. Single-valued relations
+    become select_related joins, to-many relations become Prefetch objects whose querysets carry
+    the joins and prefetches of their own subtree, so a page costs the same number of queries
+    whatever its size.
+    """
+
+    def __init__(self,model):
+        self.model=model
+        self.tree={}
+        self.tables={model._meta.db_table}
+
+    @classmethod
+    def from_serializer(cls,serializer):
+        if isinstance(serializer,serializers.ListSerializer):
+            serializer=serializer.child
+        plan=cls(serializer.Meta.model)
+        for lookup in cls.serializer_lookups(serializer):
+            plan.add(lookup)
+        return plan
+
+    @classmethod
+    def serializer_lookups(cls,serializer,prefix=()):
+        for name,field in serializer.fields.items():
+            if field.write_only:
+                continue
+            source=tuple(field.source_attrs) if field.source!='*' else ()
+            if isinstance(field,serializers.SerializerMethodField):
+                for lookup in getattr(getattr(serializer,field.method_name),'uses_fields',()):
+                    yield prefix+tuple(lookup.split('__'))
+            elif isinstance(field,(serializers.ListSerializer,serializers.BaseSerializer)):
+                nested=field.child if isinstance(field,serializers.ListSerializer) else field
+                yield prefix+source
+                yield from cls.serializer_lookups(nested,prefix+source)
+            elif isinstance(field,serializers.RelatedField) and field.use_pk_only_optimization():
+                # The primary key is read from the FK column of the parent row
+                yield prefix+source[:-1]
+            else:
+                yield prefix+source
+
+    def add(self,parts):
+        model=self.model
+        node=self.tree
+        for part in parts:
+            try:
+                field=model._meta.get_field(part)
+            except FieldDoesNotExist:
+                return
+            if not field.is_relation or field.related_model is None:
+                return
+            many=field.many_to_many or field.one_to_many
+            accessor=field.get_accessor_name() if field.auto_created and not field.concrete else field.name
+            entry=node.setdefault(accessor,{'many':many,'model':field.related_model,'children':{}})
+            node=entry['children']
+            model=field.related_model
+            self.tables.add(model._meta.db_table)
+            if field.many_to_many:
+                through=field.remote_field.through if field.concrete else field.through
+                self.tables.add(through._meta.db_table)
+
+    def lookups(self,tree=None):
+        """(select_related paths, Prefetch objects) for `tree`, relative to its model."""
+        selects,prefetches=[],[]
+        for name,entry in (self.tree if tree is None else tree).items():
+            child_selects,child_prefetches=self.lookups(entry['children'])
+            if entry['many']:
+                queryset=entry['model']._default_manager.all()
+                if child_selects:
+                    queryset=queryset.select_related(*child_selects)
+                if child_prefetches:
+                    queryset=queryset.prefetch_related(*child_prefetches)
+                prefetches.append(models.Prefetch(name,queryset=queryset))
+            else:
+                selects.append(name)
+                selects.extend(f"{name}__{path}" for path in child_selects)
+                prefetches.extend(models.Prefetch(f"{name}__{prefetch.prefetch_through}",queryset=prefetch.queryset) for prefetch in child_prefetches)
+        return selects,prefetches
+
+    def apply(self,queryset):
+        selects,prefetches=self.lookups()
+        existing=[lookup.prefetch_to if isinstance(lookup,models.Prefetch) else lookup for lookup in queryset._prefetch_related_lookups]
+        prefetches=[prefetch for prefetch in prefetches if not any(path==prefetch.prefetch_to or path.startswith(prefetch.prefetch_to+'__') or prefetch.prefetch_to.startswith(path+'__') for path in existing)]
+        if selects and queryset.query.select_related is not True:
+            queryset=queryset.select_related(*selects)
+        if prefetches:
+            queryset=queryset.prefetch_related(*prefetches)
+        return queryset
+
+
+def iterSerializedChunks(queryset,serializer_factory,chunk_size):
+    """Serialize `queryset` chunk by chunk; prefetches run once per chunk of the server-side iterator."""
+    chunk=[]
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(obj)
+        if len(chunk)>=chunk_size:
+            yield serializer_factory(chunk).data
+            chunk=[]
+    if chunk:
+        yield serializer_factory(chunk).data
+
+
+def streamingListResponse(view,queryset,serializer_class=None,chunk_size=500):
+    """
+    Stream an unpaginated list as a JSON array, a chunk of rows at a time, instead of building the
+    whole list in memory. Falls back to a regular Response when the negotiated renderer cannot stream.
+    """
+    request=view.request
+    serializer_class=serializer_class or view.get_serializer_class()
+    context=view.get_serializer_context() if hasattr(view,'get_serializer_context') else {}
+    serializer_factory=lambda instance:serializer_class(instance,many=True,context=context)
+    queryset=eagerLoad(queryset,serializer_class(context=context))
+
+    renderer=getattr(request,'accepted_renderer',None)
+    if not hasattr(renderer,'render_iter'):
+        return Response(serializer_factory(queryset).data)
+
+    renderer_context=view.get_renderer_context()
+    stream=renderer.render_iter(iterSerializedChunks(queryset,serializer_factory,chunk_size),request.accepted_media_type,renderer_context)
+    content_type=request.accepted_media_type
+    if renderer.charset:
+        content_type=f"{content_type}; charset={renderer.charset}"
+    return StreamingHttpResponse(stream,content_type=content_type)
+
+
+class StreamingListMixin:
+    """list() for unpaginated ListAPIViews that streams the JSON array (see streamingListResponse)."""
+    stream_chunk_size=500
+
+    def list(self,request,*args,**kwargs):
+        queryset=self.filter_queryset(self.get_queryset())
+        return streamingListResponse(self,queryset,chunk_size=self.stream_chunk_size)
+
+
+_eagerPlans={}
+
+def getEagerLoadingPlan(serializer,pruned=False):
+    """Plans of unpruned serializers are built once per class."""
+    serializer_class=type(serializer.child if isinstance(serializer,serializers.ListSerializer) else serializer)
+    if pruned:
+        return EagerLoadingPlan.from_serializer(serializer)
+    plan=_eagerPlans.get(serializer_class)
+    if plan is None:
+        plan=_eagerPlans[serializer_class]=EagerLoadingPlan.from_serializer(serializer)
+    return plan
+
+
+def eagerLoad(queryset,serializer,pruned=False):
+    return getEagerLoadingPlan(serializer,pruned).apply(queryset)
+
+
+def buildValidators(request,view,parts,tags,updated_at=None):
+    """
+    (ETag, Last-Modified timestamp) of a representation. The ETag covers the caller and its accessible
+    property ids, the full URL, the negotiated format, `parts` and the invalidation versions of every tag
+    the response reads.
+    Last-Modified is the newest `updated_at`, or the moment this ETag was first seen when that is later,
+    so deletions and changes on related rows also move it forward.
+    """
+    user=request.user
+    versions=getVersions(sorted(tags))
+    property_ids=','.join(map(str,sorted(propertyAccess(request).property_ids)))
+    fingerprint=[type(view).__module__,type(view).__qualname__,request.get_full_path(),str(getattr(user,'pk',None)),str(getattr(user,'role',None)),property_ids,str(getattr(request,'accepted_media_type',None)),json.dumps(sorted(versions.items())),*map(str,parts)]
+    etag=hashlib.sha1('|'.join(fingerprint).encode()).hexdigest()
+    first_seen=cache.get_or_set(f"etag-seen:{etag}",int(time.time()),getattr(settings,'CONDITIONAL_GET_VALIDATOR_TIMEOUT',None))
+    last_modified=max(int(updated_at.timestamp()) if updated_at else 0,first_seen)
+    return quote_etag(etag),last_modified
+
+
+def listValidators(view,queryset,serializer,pruned=False):
+    """
+    List validators from the invalidation versions of every table the query and the serializer read,
+    so a conditional GET costs cache reads only and the skipped/cached counts stay skipped.
+    """
+    tags=tableTags(queryTables(queryset.query)|getEagerLoadingPlan(serializer,pruned).tables)
+    return buildValidators(view.request,view,[],tags)
+
+
+def detailValidators(view,instance,serializer):
+    # The instance's own row is tracked by its object tag, so edits to sibling rows keep the ETag
+    model=type(instance)
+    tags=tableTags(getEagerLoadingPlan(serializer).tables-{model._meta.db_table})|{objectTag(model,instance.pk)}
+    return buildValidators(view.request,view,[instance.pk],tags,getattr(instance,'updated_at',None))
+
+
+def conditionalResponse(request,etag,last_modified):
+    """304 (or 412) when the request's If-None-Match / If-Modified-Since validators still hold, else None."""
+    return get_conditional_response(request._request,etag=etag,last_modified=last_modified)
+
+
+def setConditionalHeaders(response,etag,last_modified):
+    response['ETag']=etag
+    response['Last-Modified']=http_date(last_modified)
+    return response
+
+
+class ConditionalRetrieveMixin:
+    """retrieve() answering conditional GETs with 304 before the instance is serialized."""
+
+    def retrieve(self,request,*args,**kwargs):
+        instance=self.get_object()
+        serializer=self.get_serializer(instance)
+        etag,last_modified=detailValidators(self,instance,serializer)
+        not_modified=conditionalResponse(request,etag,last_modified)
+        if not_modified is not None:
+            return not_modified
+        return setConditionalHeaders(Response(serializer.data),etag,last_modified)
+
+
+CACHED_RESPONSE_HEADERS=('ETag','Last-Modified')
+
+
+def responseCacheTags(view,tags):
+    """
+    Invalidation tags of a cached response: declared models (their list tag), serializers (the list tags
+    of their tree) and tag strings formatted with the URL kwargs, e.g. 'property:{property_id}';
+    by default the view's serializer tree.
+    """
+    if not tags and hasattr(view,'get_serializer'):
+        tags=(view.get_serializer_class(),)
+    names=set()
+    for tag in tags:
+        if isinstance(tag,str):
+            names.add(tag.format(**view.kwargs))
+        elif isinstance(tag,type) and issubclass(tag,serializers.BaseSerializer):
+            names|=tableTags(getEagerLoadingPlan(tag()).tables)
+        else:
+            names.add(listTag(tag))
+    return names
+
+
+def assignedPropertyIds(user):
+    """Sorted ids of the properties assigned to `user`: from its token claims, else the two-tier reference cache."""
+    if hasattr(user,'property_ids'):
+        return sorted(user.property_ids)
+    return referenceCache.get_or_set(f"assigned-properties:{user.pk}",lambda:sorted(user.properties_assigned.values_list('id',flat=True)),[objectTag(type(user),user.pk),listTag(user.properties_assigned.through)])
+
+
+class PropertyAccess:
+    """
+    Properties the request user may work with: every property for admins and superusers, the
+    assigned ones otherwise. The ids are resolved once per request (see propertyAccess()).
+    """
+
+    def __init__(self,user):
+        self.user=user
+        self.unrestricted=getattr(user,'role',None)=='admin' or getattr(user,'is_superuser',False)
+
+    @cached_property
+    def property_ids(self):
+        return frozenset(assignedPropertyIds(self.user)) if getattr(self.user,'is_authenticated',False) else frozenset()
+
+    def can_access(self,property_id):
+        if self.unrestricted:
+            return True
+        try:
+            return int(property_id) in self.property_ids
+        except (TypeError,ValueError):
+            return False
+
+    def filter(self,lookup='property'):
+        """Keyword filter restricting `lookup` to the accessible properties, e.g. filter(**access.filter('property_assigned'))."""
+        return {} if self.unrestricted else {f"{lookup}__in":sorted(self.property_ids)}
+
+    def get_property(self,property_id,queryset=None):
+        """The property (404 when missing) if the user may access it, else PermissionDenied."""
+        from PropertyServices.models import Property
+        property_obj=get_object_or_404(Property if queryset is None else queryset,id=property_id)
+        if not self.can_access(property_obj.id):
+            raise PermissionDenied("You don't have access to this property")
+        return property_obj
+
+
+def propertyAccess(request):
+    """PropertyAccess of the request user, shared by everything handling the same request."""
+    request=getattr(request,'_request',request)
+    access=getattr(request,'property_access',None)
+    if access is None or access.user is not request.user:
+        access=request.property_access=PropertyAccess(request.user)
+    return access
+
+
+def buildResponseCacheKey(view,request,names,per_user=False,versioned=True):
+    """View + normalized query string + format + permission scope (role and assigned property ids) + tag versions."""
+    user=request.user
+    scope=[str(getattr(user,'role',None)),str(getattr(user,'is_superuser',False))]
+    if per_user or not getattr(user,'is_authenticated',False):
+        scope.append(str(getattr(user,'pk',None)))
+    elif hasattr(user,'properties_assigned'):
+        scope.append(','.join(map(str,sorted(propertyAccess(request).property_ids))))
+    params=json.dumps(sorted(request.query_params.lists()))
+    parts=[type(view).__module__,type(view).__qualname__,request.path,params,str(getattr(request,'accepted_media_type',None)),*scope]
+    if versioned:
+        parts.append(json.dumps(sorted(getVersions(sorted(names)).items())))
+    return 'response:'+hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+
+def cachedResponse(request,entry):
+    headers=entry['headers']
+    if 'ETag' in headers:
+        not_modified=conditionalResponse(request,headers['ETag'],parse_http_date_safe(headers.get('Last-Modified','')))
+        if not_modified is not None:
+            return not_modified
+    response=HttpResponse(zlib.decompress(entry['body']),content_type=entry['content_type'],status=entry['status'])
+    for name,value in headers.items():
+        response[name]=value
+    return response
+
+
+def storeResponse(view,request,response,store):
+    """Pass the zlib-compressed body of a 200 response to `store`; streamed bodies are compressed as they go out."""
+    entry={'status':response.status_code,'content_type':response['Content-Type'] if response.has_header('Content-Type') else None,'headers':{name:response[name] for name in CACHED_RESPONSE_HEADERS if response.has_header(name)}}
+
+    if isinstance(response,StreamingHttpResponse):
+        def tee(chunks):
+            compressor=zlib.compressobj()
+            parts=[]
+            for chunk in chunks:
+                parts.append(compressor.compress(chunk))
+                yield chunk
+            parts.append(compressor.flush())
+            store(dict(entry,body=b''.join(parts)))
+        response.streaming_content=tee(response.streaming_content)
+        return response
+
+    if isinstance(response,Response):
+        # Render now (finalize_response would do it later) so the exact bytes can be stored
+        response.accepted_renderer=request.accepted_renderer
+        response.accepted_media_type=request.accepted_media_type
+        response.renderer_context=view.get_renderer_context()
+        response.render()
+        entry['content_type']=response['Content-Type']
+    store(dict(entry,body=zlib.compress(response.content)))
+    return response
+
+
+def cacheResponse(*tags,per_user=False,timeout=None,local=False):
+    """
+    Cache successful GET responses of a view handler (get/list) in the default cache.
+    `tags` are the models or serializer classes the response reads (default: the view's serializer);
+    saving or deleting any of their rows bumps the tag version and so retires the cached entries.
+    local=True also keeps them in the per-process tier of the reference cache, for small
+    responses read on most requests that should not cost a Redis round-trip.
+    """
+    def decorator(handler):
+        @wraps(handler)
+        def wrapped(self,request,*args,**kwargs):
+            names=responseCacheTags(self,tags)
+            expires=timeout if timeout is not None else getattr(settings,'RESPONSE_CACHE_TIMEOUT',None)
+            if local:
+                key=buildResponseCacheKey(self,request,names,per_user,versioned=False)
+                entry,token=referenceCache.lookup(key,names)
+                if entry is not MISSING:
+                    return cachedResponse(request,entry)
+                store=lambda entry:referenceCache.store(key,entry,names,token,expires)
+            else:
+                key=buildResponseCacheKey(self,request,names,per_user)
+                entry=cache.get(key)
+                if entry is not None:
+                    return cachedResponse(request,entry)
+                store=lambda entry:cache.set(key,entry,expires)
+            response=handler(self,request,*args,**kwargs)
+            if response.status_code!=200:
+                return response
+            return storeResponse(self,request,response,store)
+        return wrapped
+    return decorator
+
+
+class FilterSpec:
+    """
+    Declarative filter/ordering whitelist for a list view (`filter_spec` class attribute).
+    fields maps a model field path to its allowed lookups, e.g. {'status':['exact','in'],'due_date':['gte','lte','range']}.
+    ordering lists the orderable fields; each must be backed by an index. None falls back on the serializer's
+    Meta.ordering_fields, then on every indexed field.
+    """
+    lookups=('exact','in','range','gte','lte','gt','lt','isnull')
+
+    def __init__(self,fields=None,ordering=None):
+        self.fields=fields or {}
+        self.ordering=ordering
+
+    def compile(self,model,ordering=None):
+        params={}
+        for path,lookups in self.fields.items():
+            field,many=resolveFieldPath(model,path)
+            for lookup in ([lookups] if isinstance(lookups,str) else lookups):
+                if lookup not in self.lookups:
+                    raise ImproperlyConfigured(f"Unsupported lookup '{lookup}' for {model.__name__}.{path}")
+                params[path if lookup=='exact' else f"{path}__{lookup}"]=(path,lookup,field,many)
+
+        indexed=indexedFieldNames(model)
+        ordering=self.ordering if self.ordering is not None else ordering
+        if ordering is None:
+            orderings=indexed
+        else:
+            orderings=set(ordering)
+            unindexed=orderings-indexed
+            if unindexed:
+                raise ImproperlyConfigured(f"Ordering on unindexed field(s) {', '.join(sorted(unindexed))} of {model.__name__}")
+        return FilterPlan(params,orderings)
+
+
+class FilterPlan:
+    """Compiled FilterSpec: query-param name -> (field path, lookup, model field, multi-valued), ANDed together."""
+
+    def __init__(self,params,orderings):
+        self.params=params
+        self.orderings=orderings
+
+    def filter(self,queryset,query_params):
+        conditions={}
+        distinct=False
+        for key,value in query_params.items():
+            if key not in self.params or value=='':
+                continue
+            path,lookup,field,many=self.params[key]
+            conditions.update(self.build_condition(path,lookup,field,value))
+            distinct=distinct or many
+        if not conditions:
+            return queryset
+        queryset=queryset.filter(**conditions)
+        # Joins through to-many relations can repeat rows
+        return queryset.distinct() if distinct else queryset
+
+    def build_condition(self,path,lookup,field,value):
+        try:
+            if lookup=='isnull':
+                return {f"{path}__isnull":parseBoolean(value)}
+            if lookup in ('in','range'):
+                values=[item.strip() for item in value.split(',') if item.strip()]
+                if lookup=='range' and len(values)!=2:
+                    raise DjangoValidationError('Expected two comma separated values')
+            else:
+                values=[value]
+            if isinstance(field,models.DateTimeField) and all(isDateOnly(item) for item in values):
+                # A bare date on a datetime column compares whole days
+                path=f"{path}__date"
+                field=models.DateField()
+            coerced=[coerceFilterValue(field,item) for item in values]
+        except DjangoValidationError as error:
+            raise ValidationError({path:error.messages})
+        if lookup in ('in','range'):
+            return {f"{path}__{lookup}":coerced}
+        return {path if lookup=='exact' else f"{path}__{lookup}":coerced[0]}
+
+    def order(self,queryset,ordering):
+        order_by=[]
+        for item in [item.strip() for item in ordering.split(',') if item.strip()]:
+            if item.lstrip('-') not in self.orderings:
+                raise ValidationError({'ordering':[f"Ordering by '{item.lstrip('-')}' is not supported. Allowed: {', '.join(sorted(self.orderings))}"]})
+            order_by.append(item)
+        if not order_by:
+            return queryset
+        if order_by[-1].lstrip('-') not in ('id','pk'):
+            order_by.append('-id' if order_by[0].startswith('-') else 'id')
+        return queryset.order_by(*order_by)
+
+
+def resolveFieldPath(model,path):
+    field=None
+    many=False
+    for part in path.split('__'):
+        if field is not None:
+            model=field.related_model
+        field=model._meta.get_field(part)
+        many=many or field.many_to_many or field.one_to_many
+    return field,many
+
+
+def indexedFieldNames(model):
+    """Names of the fields leading an index, as a client orders by them (no `pk` or `_id` aliases)."""
+    names={model._meta.pk.name}
+    for field in model._meta.concrete_fields:
+        if field.primary_key or field.unique or field.db_index:
+            names.add(field.name)
+    for index in model._meta.indexes:
+        names.add(index.fields[0].lstrip('-'))
+    for fields in model._meta.unique_together:
+        names.add(fields[0])
+    return names
+
+
+def parseBoolean(value):
+    if str(value).lower() in ('true','1','t','yes'):
+        return True
+    if str(value).lower() in ('false','0','f','no'):
+        return False
+    raise DjangoValidationError(f"'{value}' is not a valid boolean")
+
+
+def parseQueryParam(params,name,parser,required=False):
+    """`parser`(value) of the query parameter `name`, None when absent; a 400 names the parameter when it is missing or invalid."""
+    value=params.get(name)
+    if value in (None,''):
+        if required:
+            raise ValidationError({name:'This parameter is required.'})
+        return None
+    try:
+        parsed=parser(value)
+    except (ValueError,DjangoValidationError):
+        parsed=None
+    if parsed is None:
+        raise ValidationError({name:f"Invalid value '{value}'."})
+    return parsed
+
+
+def isDateOnly(value):
+    return len(value)==10 and parse_date(value) is not None
+
+
+def coerceFilterValue(field,value):
+    if field.is_relation:
+        field=field.related_model._meta.pk
+    if isinstance(field,models.BooleanField):
+        return parseBoolean(value)
+    return field.to_python(value)
+
+
+_filterPlans={}
+
+def getFilterPlan(view,serializer_class):
+    view_class=type(view)
+    plan=_filterPlans.get(view_class)
+    if plan is None:
+        spec=getattr(view_class,'filter_spec',None) or FilterSpec()
+        plan=_filterPlans[view_class]=spec.compile(serializer_class.Meta.model,getattr(serializer_class.Meta,'ordering_fields',None))
+    return plan
+
+
+def buildFilterFields(serializer_class):
+    return [{"key":field.name,"option":[{"id":choice[0],'value':choice[1]} for choice in field.choices] if field.choices else None } for field in serializer_class.Meta.model._meta.fields if field.name in serializer_class.Meta.fields]
 
 
 class CommonListAPIMixin:
@@ -66,36 +928,47 @@ class CommonListAPIMixin:
                 search_query=self.request.query_params.get('search',None)
 
                 if search_query:
-                    search_conditions=Q()
-
-                    for field in serializer_class.Meta.model._meta.get_fields():
-                        if isinstance(field,(models.CharField,models.TextField)):
-                            search_conditions|=Q(**{f"{field.name}__icontains":search_query})
-                    queryset=queryset.filter(search_conditions)
+                    queryset=searchQueryset(queryset,serializer_class,search_query)
 
                 ordering=self.request.query_params.get('ordering',None)
 
                 if ordering:
-                    queryset=queryset.order_by(ordering)
+                    queryset=getFilterPlan(self,serializer_class).order(queryset,ordering)
+
+                sparse=SparseFieldset(request)
+                serializer=sparse.apply(self.get_serializer())
+                etag,last_modified=listValidators(self,queryset,serializer,sparse.active)
+                not_modified=conditionalResponse(request,etag,last_modified)
+                if not_modified is not None:
+                    return not_modified
 
-                page=self.paginate_queryset(queryset)
+                compiled=getListCompiledSerializer(self,serializer,sparse)
+                if compiled is None:
+                    queryset=eagerLoad(queryset,serializer,sparse.active)
+                    if sparse.active:
+                        queryset=sparse.restrict_queryset(queryset,serializer)
+
+                if KeysetPagination.is_requested(request):
+                    return setConditionalHeaders(renderResponse(data=KeysetPagination().get_payload(self,queryset,sparse,compiled),message='Data Retrieved Successfully',status=200),etag,last_modified)
+
+                # The compiled path fetches its own rows, so only primary keys are paginated
+                page=self.paginate_queryset(queryset.values_list('pk',flat=True) if compiled else queryset)
 
                 if page is not None:
-                    serializer=self.get_serializer(page,many=True)
-                    data=serializer.data
+                    data=serializeList(self,page,sparse,compiled)
                     total_pages=self.paginator.page.paginator.num_pages
                     current_page=self.paginator.page.number
                     page_size=self.paginator.page.paginator.per_page
                     total_items=self.paginator.page.paginator.count
                 else:
-                    serializer=self.get_serializer(queryset,many=True)
-                    data=serializer.data
+                    data=serializeList(self,queryset.values_list('pk',flat=True) if compiled else queryset,sparse,compiled)
                     total_pages=1
                     current_page=1
                     page_size=len(data)
                     total_items=len(data)
 
-                return renderResponse(data={'data':data,'totalPages':total_pages,'currentPage':current_page,'pageSize':page_size,'totalItems':total_items},message='Data Retrieved Successfully',status=200)
+                response=renderResponse(data={'data':data,'totalPages':total_pages,'currentPage':current_page,'pageSize':page_size,'totalItems':total_items},message='Data Retrieved Successfully',status=200)
+                return setConditionalHeaders(response,etag,last_modified)
             return wrapped_list_method
         return decorator
 
@@ -108,55 +981,59 @@ class CommonListAPIMixinWithFilter:
         raise NotImplementedError('get_queryset method not implemented')
     
     def common_list_decorator(serializer_class):
+        filterFields=buildFilterFields(serializer_class)
+
         def decorator(list_method):
             @wraps(list_method)
             def wrapped_list_method(self,request,*args,**kwargs):
                 queryset=self.get_queryset()
                 search_query=self.request.query_params.get('search',None)
 
-                filtered_params=self.request.query_params.dict()
-                key_to_remove=['search','ordering','pageSize','page']
-                for key in key_to_remove:
-                    if key in filtered_params:
-                        filtered_params.pop(key,None)
-                
-                if filtered_params:
-                    search_conditions=Q()
-                    for key,value in filtered_params.items():
-                        search_conditions|=Q(**{f"{key}":value})
-                    queryset=queryset.filter(search_conditions)
+                queryset=getFilterPlan(self,serializer_class).filter(queryset,self.request.query_params)
 
                 if search_query:
-                    search_conditions=Q()
-
-                    for field in serializer_class.Meta.model._meta.get_fields():
-                        if isinstance(field,(models.CharField,models.TextField)):
-                            search_conditions|=Q(**{f"{field.name}__icontains":search_query})
-                    queryset=queryset.filter(search_conditions)
+                    queryset=searchQueryset(queryset,serializer_class,search_query)
 
                 ordering=self.request.query_params.get('ordering',None)
 
                 if ordering:
-                    queryset=queryset.order_by(ordering)
+                    queryset=getFilterPlan(self,serializer_class).order(queryset,ordering)
+
+                sparse=SparseFieldset(request)
+                serializer=sparse.apply(self.get_serializer())
+                etag,last_modified=listValidators(self,queryset,serializer,sparse.active)
+                not_modified=conditionalResponse(request,etag,last_modified)
+                if not_modified is not None:
+                    return not_modified
 
-                page=self.paginate_queryset(queryset)
+                compiled=getListCompiledSerializer(self,serializer,sparse)
+                if compiled is None:
+                    queryset=eagerLoad(queryset,serializer,sparse.active)
+                    if sparse.active:
+                        queryset=sparse.restrict_queryset(queryset,serializer)
+
+                if KeysetPagination.is_requested(request):
+                    payload=KeysetPagination().get_payload(self,queryset,sparse,compiled)
+                    payload['filterFields']=filterFields
+                    return setConditionalHeaders(renderResponse(data=payload,message='Data Retrieved Successfully',status=200),etag,last_modified)
+
+                # The compiled path fetches its own rows, so only primary keys are paginated
+                page=self.paginate_queryset(queryset.values_list('pk',flat=True) if compiled else queryset)
 
                 if page is not None:
-                    serializer=self.get_serializer(page,many=True)
-                    data=serializer.data
+                    data=serializeList(self,page,sparse,compiled)
                     total_pages=self.paginator.page.paginator.num_pages
                     current_page=self.paginator.page.number
                     page_size=self.paginator.page.paginator.per_page
                     total_items=self.paginator.page.paginator.count
                 else:
-                    serializer=self.get_serializer(queryset,many=True)
-                    data=serializer.data
+                    data=serializeList(self,queryset.values_list('pk',flat=True) if compiled else queryset,sparse,compiled)
                     total_pages=1
                     current_page=1
                     page_size=len(data)
                     total_items=len(data)
-                filterFields=[{"key":field.name,"option":[{"id":choice[0],'value':choice[1]} for choice in field.choices] if field.choices else None } for field in serializer_class.Meta.model._meta.fields if field.name in serializer_class.Meta.fields]
-                return renderResponse(data={'filterFields':filterFields,'data':data,'totalPages':total_pages,'currentPage':current_page,'pageSize':page_size,'totalItems':total_items},message='Data Retrieved Successfully',status=200)
+                response=renderResponse(data={'filterFields':filterFields,'data':data,'totalPages':total_pages,'currentPage':current_page,'pageSize':page_size,'totalItems':total_items},message='Data Retrieved Successfully',status=200)
+                return setConditionalHeaders(response,etag,last_modified)
             return wrapped_list_method
         return decorator
     
@@ -164,12 +1041,14 @@ class CommonListAPIMixinWithFilter:
 def createParsedCreatedAtUpdatedAt(cls):
     cls.formatted_created_at=serializers.SerializerMethodField()
     cls.formatted_updated_at=serializers.SerializerMethodField()
+    cls.formatted_datetime_fields=('created_at','updated_at')
+    cls.datetime_format='%dth %B %Y, %H:%M'
 
     def get_formatted_created_at(self,obj):
-        return obj.created_at.strftime('%dth %B %Y, %H:%M')
+        return obj.created_at.strftime(self.datetime_format)
     
     def get_formatted_updated_at(self,obj):
-        return obj.updated_at.strftime('%dth %B %Y, %H:%M')
+        return obj.updated_at.strftime(self.datetime_format)
     
     cls.get_formatted_created_at=get_formatted_created_at
     cls.get_formatted_updated_at=get_formatted_updated_at
@@ -179,9 +1058,126 @@ def createParsedCreatedAtUpdatedAt(cls):
     @wraps(original_to_representation)
     def to_representation(self,obj):
         representation=original_to_representation(self,obj)
-        representation['created_at']=self.get_formatted_created_at(obj)
-        representation['updated_at']=self.get_formatted_updated_at(obj)
+        if 'created_at' in representation:
+            representation['created_at']=self.get_formatted_created_at(obj)
+        if 'updated_at' in representation:
+            representation['updated_at']=self.get_formatted_updated_at(obj)
         return representation
     
     cls.to_representation=to_representation
-    return cls
\ No newline at end of file
+    return cls
+
+
+def fieldSignature(serializer):
+    """Field names of a (possibly sparse-pruned) serializer tree, nested serializers included."""
+    names=[]
+    for name,field in serializer.fields.items():
+        if field.write_only:
+            continue
+        nested=field.child if isinstance(field,serializers.ListSerializer) else field
+        names.append(f"{name}({fieldSignature(nested)})" if isinstance(nested,serializers.BaseSerializer) else name)
+    return ','.join(names)
+
+
+class RepresentationCache:
+    """
+    Serialized dicts of one serializer, one cache entry per object keyed by (serializer, field set, pk,
+    updated_at) plus the tag versions of the related tables the serializer reads. A list costs one
+    get_many; only objects without an entry are serialized, by `serialize_misses`.
+    """
+
+    def __init__(self,serializer):
+        if isinstance(serializer,serializers.ListSerializer):
+            serializer=serializer.child
+        self.serializer=serializer
+        self.model=serializer.Meta.model
+
+    @cached_property
+    def prefix(self):
+        # The class-wide plan covers every field a sparse variant can keep
+        plan=getEagerLoadingPlan(type(self.serializer)())
+        versions=getVersions(sorted(tableTags(plan.tables-{self.model._meta.db_table})))
+        parts=[type(self.serializer).__module__,type(self.serializer).__qualname__,fieldSignature(self.serializer),json.dumps(sorted(versions.items()))]
+        return 'representation:'+hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+    def serialize(self,items,serialize_misses):
+        """`items` are model instances, or primary keys whose updated_at is then read in one query."""
+        if items and not isinstance(items[0],models.Model):
+            stamps=dict(self.model._default_manager.filter(pk__in=items).values_list('pk','updated_at'))
+            items=[pk for pk in items if pk in stamps]
+            pks=items
+        else:
+            stamps={obj.pk:obj.updated_at for obj in items}
+            pks=[obj.pk for obj in items]
+        keys=[f"{self.prefix}:{pk}:{stamps[pk].timestamp() if stamps[pk] else ''}" for pk in pks]
+        found=cache.get_many(keys) if keys else {}
+        missing=[index for index,key in enumerate(keys) if key not in found]
+        if missing:
+            fresh=serialize_misses([items[index] for index in missing])
+            entries={keys[index]:data for index,data in zip(missing,fresh)}
+            cache.set_many(entries,getattr(settings,'REPRESENTATION_CACHE_TIMEOUT',None))
+            found.update(entries)
+        return [found[key] for key in keys]
+
+
+class CachedRepresentationListSerializer(serializers.ListSerializer):
+    def to_representation(self,data):
+        if self.parent is not None:
+            # Nested lists are part of the parent's cached dict; a lookup per parent row would be an N+1 against the cache
+            return super().to_representation(data)
+        items=list(data.all() if isinstance(data,models.manager.BaseManager) else data)
+        return RepresentationCache(self.child).serialize(items,lambda misses:super(CachedRepresentationListSerializer,self).to_representation(misses))
+
+
+class CachedRepresentationMixin:
+    """
+    Serializer mixin: top-level lists (many=True, including the compiled fast path) reuse the cached dict
+    of every object whose updated_at and related tables are unchanged. Nested uses serialize as usual. The model needs an updated_at column and
+    the representation must not depend on the request.
+    """
+
+    def __init_subclass__(cls,**kwargs):
+        super().__init_subclass__(**kwargs)
+        meta=getattr(cls,'Meta',None)
+        if meta is not None and not hasattr(meta,'list_serializer_class'):
+            meta.list_serializer_class=CachedRepresentationListSerializer
+
+
+class BatchedManyRelatedField(serializers.ManyRelatedField):
+    """many=True side of BatchedPrimaryKeyRelatedField: the submitted ids are resolved with one in_bulk() query."""
+
+    def to_internal_value(self,data):
+        if isinstance(data,str) or not hasattr(data,'__iter__'):
+            self.fail('not_a_list',input_type=type(data).__name__)
+        if not self.allow_empty and len(data)==0:
+            self.fail('empty')
+        child=self.child_relation
+        queryset=child.get_queryset()
+        pks=[]
+        for item in data:
+            if isinstance(item,bool):
+                child.fail('incorrect_type',data_type=type(item).__name__)
+            if child.pk_field is not None:
+                item=child.pk_field.to_internal_value(item)
+            try:
+                pks.append(queryset.model._meta.pk.to_python(item))
+            except (TypeError,ValueError,DjangoValidationError):
+                child.fail('incorrect_type',data_type=type(item).__name__)
+        found=queryset.in_bulk(list(dict.fromkeys(pks))) if pks else {}
+        missing=[pk for pk in dict.fromkeys(pks) if pk not in found]
+        if missing:
+            # Every unknown id at once, not just the first one
+            raise ValidationError([child.error_messages['does_not_exist'].format(pk_value=pk) for pk in missing],code='does_not_exist')
+        return [found[pk] for pk in pks]
+
+
+class BatchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Drop-in PrimaryKeyRelatedField whose many=True variant does one query for the whole list instead of one get() per id."""
+
+    @classmethod
+    def many_init(cls,*args,**kwargs):
+        list_kwargs={'child_relation':cls(*args,**kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key]=kwargs[key]
+        return BatchedManyRelatedField(**list_kwargs)
@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class CleanswitchConfig(AppConfig):
+    name = "cleanswitch"
+
+    def ready(self):
+        import cleanswitch.signals  # noqa: F401
@@ -0,0 +1,79 @@
+import time
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from cleanswitch.cache import bumpVersions, referenceCache
+
+# User fields copied into the access token; a change to any of them (or to is_active and the
+# assigned properties) revokes the tokens already issued to the user.
+CLAIMED_FIELDS = ('username', 'first_name', 'last_name', 'email', 'phone', 'department', 'role', 'is_superuser', 'is_staff')
+REVOKING_FIELDS = frozenset(CLAIMED_FIELDS) | {'is_active', 'properties_assigned'}
+REVOKED_KEY = 'tokens-revoked-before:{}'
+
+
+def revocationTag(user_id):
+    return f"user-tokens:{user_id}"
+
+
+def addUserClaims(token, user):
+    """Embed everything ClaimsJWTAuthentication needs to rebuild `user` without reading its row."""
+    for name in CLAIMED_FIELDS:
+        token[name] = getattr(user, name)
+    token['user_id'] = user.id
+    token['properties_assigned'] = list(user.properties_assigned.all().values('id', 'name'))
+    token['claims_at'] = time.time()
+    return token
+
+
+def claimsUser(token):
+    """
+    User instance built from the token claims as if loaded with only(): the claimed fields are
+    set, any other field is deferred and read from the database the first time it is accessed.
+    """
+    User = get_user_model()
+    claims = {'id': token[api_settings.USER_ID_CLAIM], 'is_active': True, **{name: token[name] for name in CLAIMED_FIELDS}}
+    field_names = [field.attname for field in User._meta.concrete_fields if field.attname in claims]
+    user = User.from_db(User._default_manager.db, field_names, [claims[name] for name in field_names])
+    user.property_ids = frozenset(prop['id'] for prop in token.get('properties_assigned', ()))
+    return user
+
+
+def revokedBefore(user_id):
+    """Time before which tokens of `user_id` are revoked (0 when none are), cached in every worker until the next revocation."""
+    key = REVOKED_KEY.format(user_id)
+    return referenceCache.get_or_set(key, lambda: cache.get(key, 0), [revocationTag(user_id)])
+
+
+def revokeUserTokens(user_ids, using=None):
+    """Reject the access tokens issued so far to `user_ids` once the current transaction commits."""
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+
+    def revoke():
+        revoked_at = time.time()
+        timeout = api_settings.ACCESS_TOKEN_LIFETIME.total_seconds()
+        cache.set_many({REVOKED_KEY.format(user_id): revoked_at for user_id in user_ids}, timeout)
+        bumpVersions([revocationTag(user_id) for user_id in user_ids])
+
+    transaction.on_commit(revoke, using=using)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication without the per-request user query: the request user is rebuilt from the
+    claims LoginAPIView embeds, with `property_ids` precomputed. Tokens issued before the user's
+    claims changed are rejected through the revocation times kept in the cache.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is not None and validated_token.get('claims_at', validated_token.get('iat', 0)) < revokedBefore(user_id):
+            raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+        if user_id is None or 'claims_at' not in validated_token or any(name not in validated_token for name in CLAIMED_FIELDS):
+            # Tokens issued before the claims were complete
+            return super().get_user(validated_token)
+        return claimsUser(validated_token)
@@ -0,0 +1,565 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from importlib import import_module
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'version:{}'
+
+
+def _initialVersion():
+    # Counters start from the clock so an evicted counter can never fall back onto an older value
+    return int(time.time() * 1000)
+
+
+def getVersions(names):
+    """Current invalidation counter of each name, in one round-trip for the common case."""
+    keys = {name: VERSION_KEY.format(name) for name in names}
+    found = cache.get_many(list(keys.values()))
+    versions = {}
+    for name, key in keys.items():
+        if key not in found:
+            cache.add(key, _initialVersion(), timeout=None)
+            found[key] = cache.get(key)
+        versions[name] = found[key]
+    return versions
+
+
+def bumpVersions(names):
+    for name in names:
+        key = VERSION_KEY.format(name)
+        cache.add(key, _initialVersion(), timeout=None)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initialVersion(), timeout=None)
+    referenceCache.invalidate(names)
+
+
+# Tags name what a cached entry was built from: `apartment:88` is one row, `apartment:list`
+# is any row of the table (including rows added or removed). Every tag maps to a version
+# counter, so invalidating a tag is a single increment however many entries carry it.
+
+def listTag(model):
+    return f"{model._meta.model_name}:list"
+
+
+def objectTag(model, pk):
+    return f"{model._meta.model_name}:{pk}"
+
+
+_tableModels = None
+
+
+def tableTags(tables):
+    """List tags of the models stored in `tables` (as returned by a query's joins)."""
+    global _tableModels
+    if _tableModels is None:
+        _tableModels = {model._meta.db_table: model for model in apps.get_models(include_auto_created=True)}
+    return {listTag(_tableModels[table]) if table in _tableModels else f"{table}:list" for table in tables}
+
+
+def instanceTags(model, pks):
+    return {listTag(model)} | {objectTag(model, pk) for pk in pks if pk is not None}
+
+
+class CommitBatch:
+    """
+    Work collected while a transaction runs and handed to `flush` in one call once it commits
+    (immediately in autocommit), e.g. one refresh for every booking a request wrote instead of one
+    per write. Items follow the on_commit rules of the savepoint that added them: a rollback drops
+    them, and a released savepoint hands them to the enclosing level, where they join its batch.
+    """
+
+    def __init__(self, flush):
+        self.flush = flush
+        self.local = threading.local()
+
+    def add(self, items, using=None):
+        connection = transaction.get_connection(using)
+        if not connection.in_atomic_block:
+            self.flush(list(items))
+            return
+        batches = self.local.__dict__.setdefault('batches', {})
+        registered = {entry[1] for entry in connection.run_on_commit}
+        # atomic(savepoint=False) blocks stack a None: they share the savepoint of their level
+        level = (connection.alias, tuple(sid for sid in connection.savepoint_ids if sid is not None))
+        for key in list(batches):
+            if key[0] != level[0]:
+                continue
+            if batches[key][1] not in registered:
+                # Discarded by a rollback
+                del batches[key]
+            elif len(key[1]) > len(level[1]) and key[1][:len(level[1])] == level[1]:
+                # Added in a savepoint nested in this level and since released
+                if level in batches:
+                    batches[level][0].extend(batches[key][0])
+                    batches.pop(key)[0].clear()
+                else:
+                    batches[level] = batches.pop(key)
+        if level not in batches:
+            pending = []
+
+            def run():
+                for key in [key for key, batch in batches.items() if batch[0] is pending]:
+                    del batches[key]
+                if pending:
+                    self.flush(pending)
+
+            batches[level] = (pending, run)
+            transaction.on_commit(run, using=connection.alias)
+        batches[level][0].extend(items)
+
+
+_tagBatch = CommitBatch(lambda tags: bumpVersions(set(tags)))
+
+
+def invalidateTags(tags, using=None):
+    """Bump `tags` once the current transaction commits (immediately in autocommit), once per transaction."""
+    tags = set(tags)
+    if tags:
+        _tagBatch.add(tags, using=using)
+
+
+# Sent by TaggedQuerySet after update(), bulk_create() and bulk_update(), which send no model
+# signals, with the written `pks`, the updated `fields` (None for new rows) and `using`
+postBulkWrite = Signal()
+
+
+class TaggedQuerySet(models.QuerySet):
+    """
+    QuerySet whose bulk writes invalidate the tags of the rows they touch. Model signals cover
+    save()/delete() and m2m changes, but update(), bulk_create() and bulk_update() send none.
+    Bulk updates also set auto_now fields, so updated_at keeps tracking every change of the row.
+    Subclasses extend rows_changed() to react to bulk writes of their own model; the write and
+    its rows_changed() share one transaction, so a hook raising rolls the write back.
+    """
+
+    def rows_changed(self, pks, fields=None):
+        """Hook run after a bulk write of `pks`; `fields` are the updated ones, None for new rows."""
+        invalidateTags(instanceTags(self.model, pks), using=self.db)
+        postBulkWrite.send(sender=self.model, pks=pks, fields=fields, using=self.db)
+
+    def auto_now_fields(self):
+        return [field for field in self.model._meta.concrete_fields if getattr(field, 'auto_now', False)]
+
+    def update(self, **kwargs):
+        for field in self.auto_now_fields():
+            kwargs.setdefault(field.name, timezone.now())
+        with transaction.atomic(using=self.db, savepoint=False):
+            pks = list(self.values_list('pk', flat=True))
+            rows = super().update(**kwargs)
+            self.rows_changed(pks, list(kwargs))
+        return rows
+
+    update.alters_data = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        with transaction.atomic(using=self.db, savepoint=False):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            self.rows_changed([obj.pk for obj in objs])
+        return objs
+
+    bulk_create.alters_data = True
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        fields = list(fields)
+        for field in self.auto_now_fields():
+            if field.name not in fields:
+                fields.append(field.name)
+                for obj in objs:
+                    setattr(obj, field.attname, timezone.now())
+        with transaction.atomic(using=self.db, savepoint=False):
+            rows = super().bulk_update(objs, fields, *args, **kwargs)
+            self.rows_changed([obj.pk for obj in objs], fields)
+        return rows
+
+    bulk_update.alters_data = True
+
+
+TaggedManager = models.Manager.from_queryset(TaggedQuerySet)
+
+
+MISSING = object()
+
+
+class LocalLRUCache:
+    """Size-bounded, TTL'd LRU private to one process; entries remember their tags so invalidations can find them."""
+
+    def __init__(self, max_entries, timeout):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.tagged = {}
+        self.generation = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return MISSING
+            expires, tags, value = entry
+            if expires < time.monotonic():
+                self.remove(key)
+                return MISSING
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, tags, generation):
+        """Store unless an invalidation ran since `generation` was read: the value may predate it."""
+        with self.lock:
+            if generation != self.generation:
+                return
+            if key in self.entries:
+                self.remove(key)
+            self.entries[key] = (time.monotonic() + self.timeout, tags, value)
+            for tag in tags:
+                self.tagged.setdefault(tag, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                self.remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def invalidate(self, tags):
+        with self.lock:
+            self.generation += 1
+            for tag in tags:
+                for key in self.tagged.get(tag, set()).copy():
+                    self.remove(key)
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+            self.tagged.clear()
+
+    def remove(self, key):
+        expires, tags, value = self.entries.pop(key)
+        for tag in tags:
+            keys = self.tagged[tag]
+            keys.discard(key)
+            if not keys:
+                del self.tagged[tag]
+
+
+def redisConnection():
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except (ImportError, NotImplementedError):
+        return None
+
+
+class TwoTierCache:
+    """
+    Per-process LRU in front of the shared cache, for small values read on most requests.
+    The shared copy carries the versions of its tags and is only served while they are current;
+    local copies are dropped by the invalidation messages every bumpVersions() publishes on
+    Redis pub/sub, with the local timeout as the bound should a message be missed.
+    """
+    channel = 'cleanswitch:invalidate'
+
+    def __init__(self):
+        self.local = None
+        self.pid = None
+        self.subscribed = threading.Event()
+        self.start_lock = threading.Lock()
+        self.counters_lock = threading.Lock()
+        self.counters = {'local_hits': 0, 'remote_hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def count(self, name):
+        with self.counters_lock:
+            self.counters[name] += 1
+
+    def start(self):
+        """Create the local tier and its subscriber once per process (gunicorn forks after import)."""
+        if self.pid == os.getpid():
+            return
+        with self.start_lock:
+            if self.pid == os.getpid():
+                return
+            self.local = LocalLRUCache(getattr(settings, 'REFERENCE_CACHE_MAX_ENTRIES', 1024), getattr(settings, 'REFERENCE_CACHE_LOCAL_TIMEOUT', 60))
+            self.subscribed = threading.Event()
+            connection = redisConnection()
+            if connection is None:
+                # Single process (tests, local memory cache): invalidations only come from this process
+                self.subscribed.set()
+            else:
+                threading.Thread(target=self.subscribe, args=(connection,), name='reference-cache-invalidation', daemon=True).start()
+            self.pid = os.getpid()
+
+    def subscribe(self, connection):
+        while True:
+            try:
+                pubsub = connection.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                # Messages published while unsubscribed are lost, so start from an empty tier
+                self.local.clear()
+                self.subscribed.set()
+                for message in pubsub.listen():
+                    self.local.invalidate(json.loads(message['data']))
+            except Exception:
+                logger.exception('Reference cache invalidation subscriber failed, retrying')
+            self.subscribed.clear()
+            self.local.clear()
+            time.sleep(1)
+
+    def lookup(self, key, tags):
+        """(value or MISSING, token to pass to store()) reading the local tier, then the shared one."""
+        return self.lookup_many({key: tags})[key]
+
+    def lookup_many(self, entries):
+        """lookup() of several {key: tags} at once: local misses are read from the shared tier in one round-trip."""
+        self.start()
+        results = {}
+        for key in entries:
+            value = self.local.get(key)
+            if value is not MISSING:
+                self.count('local_hits')
+                results[key] = (value, None)
+        remaining = {key: sorted(tags) for key, tags in entries.items() if key not in results}
+        if not remaining:
+            return results
+        generation = self.local.generation
+        version_keys = {tag: VERSION_KEY.format(tag) for tags in remaining.values() for tag in tags}
+        found = cache.get_many([*(f"tiered:{key}" for key in remaining), *version_keys.values()])
+        unknown = [tag for tag, version_key in version_keys.items() if version_key not in found]
+        versions = {tag: found[version_key] for tag, version_key in version_keys.items() if version_key in found}
+        versions.update(getVersions(unknown) if unknown else {})
+        for key, tags in remaining.items():
+            key_versions = {tag: versions[tag] for tag in tags}
+            entry = found.get(f"tiered:{key}")
+            if entry is not None and entry['versions'] == key_versions:
+                self.count('remote_hits')
+                self.keep_local(key, entry['value'], tags, generation)
+                results[key] = (entry['value'], None)
+            else:
+                self.count('misses')
+                results[key] = (MISSING, (generation, key_versions))
+        return results
+
+    def store(self, key, value, tags, token, timeout=None):
+        generation, versions = token
+        cache.set(f"tiered:{key}", {'versions': versions, 'value': value}, timeout if timeout is not None else getattr(settings, 'REFERENCE_CACHE_TIMEOUT', None))
+        self.keep_local(key, value, sorted(tags), generation)
+
+    def keep_local(self, key, value, tags, generation):
+        if self.subscribed.is_set():
+            self.local.set(key, value, tags, generation)
+
+    def get_or_set(self, key, default, tags, timeout=None):
+        value, token = self.lookup(key, tags)
+        if value is MISSING:
+            value = default() if callable(default) else default
+            self.store(key, value, tags, token, timeout)
+        return value
+
+    def patch(self, key, tags, update, lock_timeout=30, timeout=None):
+        """
+        Replace the shared copy of `key` by update(value) and bump `tags`, so every worker drops its
+        local copy and reads the patched one. Without a current shared copy the tags are only bumped
+        and the next lookup rebuilds the value.
+        """
+        tags = sorted(tags)
+        lock = cacheLock(f"lock:tiered:{key}", lock_timeout)
+        lock.acquire(blocking=True)
+        try:
+            entry = cache.get(f"tiered:{key}")
+            current = entry is not None and entry['versions'] == getVersions(tags)
+            value = update(entry['value']) if current else MISSING
+            bumpVersions(tags)
+            if value is not MISSING:
+                cache.set(f"tiered:{key}", {'versions': getVersions(tags), 'value': value}, timeout if timeout is not None else getattr(settings, 'REFERENCE_CACHE_TIMEOUT', None))
+        finally:
+            releaseLock(lock)
+
+    def invalidate(self, tags):
+        """Drop `tags` from this process now and from every other worker through pub/sub."""
+        tags = list(tags)
+        self.count('invalidations')
+        if self.local is not None and self.pid == os.getpid():
+            self.local.invalidate(tags)
+        connection = redisConnection()
+        if connection is not None:
+            try:
+                connection.publish(self.channel, json.dumps(tags))
+            except Exception:
+                logger.exception('Could not publish reference cache invalidation')
+
+    def stats(self):
+        with self.counters_lock:
+            stats = dict(self.counters)
+        lookups = stats['local_hits'] + stats['remote_hits'] + stats['misses']
+        stats.update({
+            'pid': os.getpid(),
+            'entries': len(self.local.entries) if self.local is not None else 0,
+            'evictions': self.local.evictions if self.local is not None else 0,
+            'hit_ratio': round((stats['local_hits'] + stats['remote_hits']) / lookups, 4) if lookups else None,
+        })
+        return stats
+
+
+referenceCache = TwoTierCache()
+
+
+class CacheLock:
+    """Lock on a cache key for backends without native locks (cache.add() is atomic on every backend)."""
+
+    def __init__(self, key, timeout, sleep=0.05):
+        self.key = key
+        self.timeout = timeout
+        self.sleep = sleep
+        self.token = uuid.uuid4().hex
+
+    def acquire(self, blocking=True, blocking_timeout=None):
+        deadline = time.monotonic() + (blocking_timeout if blocking_timeout is not None else self.timeout)
+        while not cache.add(self.key, self.token, self.timeout):
+            if not blocking or time.monotonic() >= deadline:
+                return False
+            time.sleep(self.sleep)
+        return True
+
+    def release(self):
+        if cache.get(self.key) == self.token:
+            cache.delete(self.key)
+
+
+def cacheLock(key, timeout):
+    """Redis lock (django_redis) on `key`, or a CacheLock elsewhere."""
+    if hasattr(cache, 'lock'):
+        return cache.lock(key, timeout=timeout, sleep=0.05)
+    return CacheLock(key, timeout)
+
+
+def releaseLock(lock):
+    try:
+        lock.release()
+    except Exception:
+        # The lock expired while held and may belong to another worker by now: nothing left to release
+        logger.warning('Lock released after its timeout')
+
+
+class CachedComputation:
+    """
+    Expensive function of keyword arguments whose result is shared through the cache, see cachedComputation().
+    Results are fresh for `fresh` seconds while the versions of their tags hold, then served stale for up
+    to `stale` more seconds while a Celery task recomputes them. Without a usable result only one worker
+    computes a given key under a Redis lock; the others wait for it, or get the previous value if there is one.
+    """
+
+    def __init__(self, function, tags, fresh, stale, lock_timeout):
+        self.function = function
+        self.tags = tags
+        self.fresh = fresh
+        self.stale = stale
+        self.lock_timeout = lock_timeout
+        self.path = f"{function.__module__}:{function.__qualname__}"
+
+    def __call__(self, **params):
+        key = self.key(params)
+        tags = self.tag_names(params)
+        found = cache.get_many([key, *(VERSION_KEY.format(tag) for tag in tags)])
+        entry = found.get(key)
+        if entry is not None:
+            age = time.time() - entry['computed_at']
+            if age < self.fresh and entry['versions'] == self.current_versions(tags, found):
+                return entry['value']
+            if age < self.fresh + self.stale:
+                self.revalidate(key, params)
+                return entry['value']
+        return self.compute_once(key, params, previous=entry)
+
+    def key(self, params):
+        return f"computation:{self.path}:{hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()}"
+
+    def tag_names(self, params):
+        return sorted({tag.format(**params) if isinstance(tag, str) else listTag(tag) for tag in self.tags})
+
+    def current_versions(self, tags, found=None):
+        found = found or {}
+        if all(VERSION_KEY.format(tag) in found for tag in tags):
+            return {tag: found[VERSION_KEY.format(tag)] for tag in tags}
+        return getVersions(tags)
+
+    def compute(self, key, params):
+        # Versions are read first: a write landing during the computation leaves the result stale
+        versions = self.current_versions(self.tag_names(params))
+        value = self.function(**params)
+        cache.set(key, {'value': value, 'computed_at': time.time(), 'versions': versions}, self.fresh + self.stale)
+        return value
+
+    def compute_once(self, key, params, previous=None):
+        lock = cacheLock(f"{key}:lock", self.lock_timeout)
+        if lock.acquire(blocking=False):
+            try:
+                return self.compute(key, params)
+            finally:
+                releaseLock(lock)
+        if previous is not None:
+            self.revalidate(key, params)
+            return previous['value']
+        started = time.time()
+        if lock.acquire(blocking=True, blocking_timeout=self.lock_timeout):
+            try:
+                entry = cache.get(key)
+                if entry is not None and entry['computed_at'] >= started - self.lock_timeout:
+                    return entry['value']
+                return self.compute(key, params)
+            finally:
+                releaseLock(lock)
+        # The computing worker overran the lock: do not queue behind it any longer
+        return self.function(**params)
+
+    def revalidate(self, key, params):
+        """Queue one background refresh per key and stale period."""
+        if not cache.add(f"{key}:refreshing", 1, self.lock_timeout):
+            return
+        from cleanswitch.tasks import refreshCachedComputation
+        try:
+            refreshCachedComputation.delay(self.path, params)
+        except Exception:
+            logger.exception('Could not queue the refresh of %s', self.path)
+
+    def refresh(self, **params):
+        key = self.key(params)
+        lock = cacheLock(f"{key}:lock", self.lock_timeout)
+        if not lock.acquire(blocking=False):
+            return
+        try:
+            self.compute(key, params)
+        finally:
+            releaseLock(lock)
+            cache.delete(f"{key}:refreshing")
+
+
+def cachedComputation(tags=(), fresh=60, stale=60 * 10, lock_timeout=60):
+    """
+    Decorator for expensive functions of JSON-serializable keyword arguments. `tags` are models (their
+    list tag) or tag strings formatted with the arguments, e.g. 'property:{property_id}'.
+    """
+    def decorator(function):
+        return CachedComputation(function, tags, fresh, stale, lock_timeout)
+    return decorator
+
+
+def resolveComputation(path):
+    """CachedComputation at `module:qualname`, e.g. a static method of a view class."""
+    module_path, _, qualname = path.partition(':')
+    owner = import_module(module_path)
+    for name in qualname.split('.'):
+        owner = getattr(owner, name)
+    return owner
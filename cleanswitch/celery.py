@@ -21,4 +21,8 @@ app.conf.beat_schedule = {
         'task': 'TaskServices.tasks.generate_recurring_tasks',
         'schedule': crontab(hour=0, minute=0),  # Daily at midnight
     },
+    'refresh-kpi-snapshots': {
+        'task': 'PropertyServices.tasks.refreshKpiSnapshots',
+        'schedule': crontab(minute='*/5'),  # Every 5 minutes
+    },
 }
\ No newline at end of file
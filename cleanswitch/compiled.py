@@ -0,0 +1,307 @@
+import threading
+import types
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.fields import SkipField
+from rest_framework.relations import ManyRelatedField, PKOnlyObject, PrimaryKeyRelatedField, RelatedField
+
+SKIP = object()
+
+
+class NotCompilable(Exception):
+    pass
+
+
+class RelatedRows(list):
+    """Stand-in for a prefetched related manager: rows are already loaded, .all() returns them."""
+
+    def all(self):
+        return self
+
+    @property
+    def _result_cache(self):
+        return self
+
+    def count(self):
+        return len(self)
+
+    def exists(self):
+        return bool(self)
+
+    def first(self):
+        return self[0] if self else None
+
+
+class RowProxy:
+    """
+    Read-only view over a projected row that looks like the model instance to serializer
+    methods: concrete fields by name or attname, fetched relations, and the model's own
+    methods/properties bound to the proxy.
+    """
+    __slots__ = ('_row', '_projection')
+
+    def __init__(self, row, projection):
+        self._row = row
+        self._projection = projection
+
+    def __getattr__(self, name):
+        projection = self._projection
+        relation = projection.relations.get(name)
+        if relation is not None:
+            value = self._row[name]
+            if relation.many:
+                return RelatedRows(RowProxy(row, relation.projection) for row in value)
+            return RowProxy(value, relation.projection) if value is not None else None
+        if name == 'pk':
+            return self._row[projection.pk]
+        column = projection.attnames.get(name)
+        if column is not None:
+            if column not in self._row:
+                raise AttributeError(f"{projection.model.__name__}.{name} was not projected")
+            return self._row[column]
+        attribute = getattr(projection.model, name)
+        if isinstance(attribute, types.FunctionType):
+            return types.MethodType(attribute, self)
+        if isinstance(attribute, property):
+            return attribute.fget(self)
+        return attribute
+
+
+class Relation:
+    def __init__(self, field, projection):
+        self.field = field
+        self.projection = projection
+        self.many = field.many_to_many or field.one_to_many
+        self.forward = field.concrete and not self.many
+        self.query_name = field.name
+
+
+class Projection:
+    """Columns of one model to fetch with values(), plus the related projections hanging off it."""
+
+    batch_size = 2000
+
+    def __init__(self, model):
+        self.model = model
+        self.pk = model._meta.pk.attname
+        self.attnames = {}
+        for field in model._meta.concrete_fields:
+            self.attnames[field.attname] = field.attname
+            if not field.is_relation:
+                self.attnames[field.name] = field.attname
+        self.columns = {self.pk}
+        self.relations = {}
+
+    def resolve(self, name):
+        try:
+            return self.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+
+    def add_column(self, name):
+        self.columns.add(self.attnames[name])
+
+    def add_all_columns(self):
+        self.columns.update(field.attname for field in self.model._meta.concrete_fields)
+
+    def add_relation(self, field):
+        accessor = field.get_accessor_name() if field.auto_created and not field.concrete else field.name
+        relation = self.relations.get(accessor)
+        if relation is None:
+            relation = self.relations[accessor] = Relation(field, Projection(field.related_model))
+            if relation.forward:
+                self.columns.add(field.attname)
+        return accessor, relation
+
+    def add_lookup(self, parts):
+        """Project a model lookup path; every relation it crosses is fetched with all its columns."""
+        projection = self
+        for part in parts:
+            field = projection.resolve(part)
+            if field is None or field.is_relation and field.related_model is None:
+                raise NotCompilable(f"{projection.model.__name__}.{part}")
+            if not field.is_relation:
+                projection.add_column(part)
+                return
+            accessor, relation = projection.add_relation(field)
+            projection = relation.projection
+            projection.add_all_columns()
+
+    def fetch(self, pks):
+        """{pk: row} for `pks`, in the model's default ordering; relations are attached under their accessor."""
+        pks = list(pks)
+        manager = self.model._default_manager
+        rows = {}
+        for start in range(0, len(pks), self.batch_size):
+            for row in manager.filter(pk__in=pks[start:start + self.batch_size]).values(*self.columns):
+                rows[row[self.pk]] = row
+        for accessor, relation in self.relations.items():
+            if relation.forward:
+                attname = relation.field.attname
+                related = relation.projection.fetch({row[attname] for row in rows.values() if row[attname] is not None})
+                for row in rows.values():
+                    row[accessor] = related.get(row[attname])
+                continue
+            links = {}
+            parents = list(rows)
+            for start in range(0, len(parents), self.batch_size):
+                for pk, related_pk in manager.filter(pk__in=parents[start:start + self.batch_size]).values_list('pk', relation.query_name):
+                    if related_pk is not None:
+                        links.setdefault(pk, {})[related_pk] = None
+            related = relation.projection.fetch({related_pk for linked in links.values() for related_pk in linked})
+            position = {related_pk: index for index, related_pk in enumerate(related)}
+            for pk, row in rows.items():
+                children = [related[related_pk] for related_pk in sorted(links.get(pk, ()), key=position.get) if related_pk in position] if pk in links else []
+                row[accessor] = children if relation.many else (children[0] if children else None)
+        return rows
+
+
+class CompiledSerializer:
+    """
+    Read-only fast path for a list serializer: one values() query per model in the serializer tree
+    and a generated function per serializer class that turns a row into the same dict DRF's
+    to_representation would build. Method fields run against a RowProxy and must declare the
+    lookups they read with @usesFields.
+    """
+
+    def __init__(self, serializer):
+        if isinstance(serializer, serializers.ListSerializer):
+            serializer = serializer.child
+        self.serializer = serializer
+        self.projection = Projection(serializer.Meta.model)
+        self.convert = self.compile(serializer, self.projection)
+
+    def compile(self, serializer, projection):
+        representation = type(serializer).to_representation
+        if getattr(representation, '__wrapped__', representation) is not serializers.Serializer.to_representation:
+            raise NotCompilable(f"{type(serializer).__name__} overrides to_representation")
+        formatted = getattr(type(serializer), 'formatted_datetime_fields', ())
+        lines = ['def convert(row):', '    data = {}']
+        namespace = {'SKIP': SKIP}
+        for index, (name, field) in enumerate(serializer.fields.items()):
+            if field.write_only:
+                continue
+            key = repr(name)
+            converter = f"c{index}"
+            if name in formatted:
+                namespace[converter] = serializer.datetime_format
+                projection.add_column(name)
+                lines.append(f"    value = row[{projection.attnames[name]!r}]")
+                lines.append(f"    data[{key}] = value.strftime({converter}) if value is not None else None")
+                continue
+            column, function = self.compile_field(serializer, field, projection)
+            namespace[converter] = function
+            if column is not None:
+                lines.append(f"    value = row[{column!r}]")
+                lines.append(f"    data[{key}] = None if value is None else {converter}(value)")
+            else:
+                lines.append(f"    value = {converter}(row)")
+                lines.append(f"    if value is not SKIP:")
+                lines.append(f"        data[{key}] = value")
+        lines.append('    return data')
+        exec(compile('\n'.join(lines), f"<compiled {type(serializer).__name__}>", 'exec'), namespace)
+        return namespace['convert']
+
+    def compile_field(self, serializer, field, projection):
+        """(row column, converter of that column) for plain columns, else (None, converter of the whole row)."""
+        source = field.source_attrs if field.source != '*' else []
+        if isinstance(field, serializers.SerializerMethodField):
+            method = getattr(serializer, field.method_name)
+            lookups = getattr(method, 'uses_fields', None)
+            if lookups is None:
+                raise NotCompilable(f"{type(serializer).__name__}.{field.method_name} does not declare @usesFields")
+            for lookup in lookups:
+                projection.add_lookup(lookup.split('__'))
+            return None, lambda row: method(RowProxy(row, projection))
+
+        if isinstance(field, (serializers.ListSerializer, serializers.BaseSerializer)):
+            nested = field.child if isinstance(field, serializers.ListSerializer) else field
+            if not source:
+                convert = self.compile(nested, projection)
+                return None, convert
+            if len(source) != 1 or projection.resolve(source[0]) is None or not projection.resolve(source[0]).is_relation:
+                raise NotCompilable(f"{type(serializer).__name__}.{field.field_name}")
+            accessor, relation = projection.add_relation(projection.resolve(source[0]))
+            convert = self.compile(nested, relation.projection)
+            if relation.many:
+                return None, lambda row: [convert(related) for related in row[accessor]]
+            return None, lambda row: convert(row[accessor]) if row[accessor] is not None else None
+
+        if isinstance(field, ManyRelatedField):
+            model_field = projection.resolve(source[0]) if len(source) == 1 else None
+            if model_field is None or not isinstance(field.child_relation, PrimaryKeyRelatedField) or field.child_relation.pk_field is not None:
+                raise NotCompilable(f"{type(serializer).__name__}.{field.field_name}")
+            accessor, relation = projection.add_relation(model_field)
+            pk = relation.projection.pk
+            return None, lambda row: [related[pk] for related in row[accessor]]
+
+        if len(source) == 1:
+            if source[0] in projection.attnames:
+                column = projection.attnames[source[0]]
+                projection.columns.add(column)
+                return column, self.column_converter(field)
+            model_field = projection.resolve(source[0])
+            if model_field is not None and model_field.many_to_one and isinstance(field, PrimaryKeyRelatedField) and field.pk_field is None:
+                # The primary key is the FK column of the row itself
+                projection.columns.add(model_field.attname)
+                return model_field.attname, lambda value: value
+
+        if isinstance(field, RelatedField) or not source or projection.resolve(source[0]) is None:
+            raise NotCompilable(f"{type(serializer).__name__}.{field.field_name}")
+        # Dotted source across relations: let the DRF field read it from the proxy
+        projection.add_lookup(source[:1])
+        return None, lambda row: self.generic_value(field, RowProxy(row, projection))
+
+    def column_converter(self, field):
+        if isinstance(field, (serializers.ReadOnlyField, serializers.ModelField)):
+            return lambda value: value
+        if isinstance(field, serializers.ChoiceField):
+            return field.to_representation
+        if isinstance(field, serializers.BooleanField):
+            return bool
+        if isinstance(field, serializers.IntegerField):
+            return int
+        if isinstance(field, serializers.FloatField):
+            return float
+        if type(field) in (serializers.CharField, serializers.EmailField, serializers.SlugField, serializers.URLField):
+            return str
+        return field.to_representation
+
+    def generic_value(self, field, instance):
+        try:
+            attribute = field.get_attribute(instance)
+        except SkipField:
+            return SKIP
+        check_for_none = attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+        return None if check_for_none is None else field.to_representation(attribute)
+
+    def serialize(self, items, context=None):
+        """Serialize model instances or primary keys, keeping their order."""
+        self.serializer._context = context or {}
+        pks = [getattr(item, 'pk', item) for item in items]
+        rows = self.projection.fetch(pks)
+        return [self.convert(rows[pk]) for pk in pks if pk in rows]
+
+
+_compiled = threading.local()
+
+
+def getCompiledSerializer(serializer, cache=True):
+    """CompiledSerializer for `serializer`, or None when one of its fields cannot be compiled; cached per class and thread."""
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    if not cache:
+        try:
+            return CompiledSerializer(serializer)
+        except NotCompilable:
+            return None
+    compiled = getattr(_compiled, 'serializers', None)
+    if compiled is None:
+        compiled = _compiled.serializers = {}
+    serializer_class = type(serializer)
+    if serializer_class not in compiled:
+        try:
+            compiled[serializer_class] = CompiledSerializer(type(serializer)())
+        except NotCompilable:
+            compiled[serializer_class] = None
+    return compiled[serializer_class]
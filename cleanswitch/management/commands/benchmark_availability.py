@@ -0,0 +1,52 @@
+import pickle
+import time
+from datetime import timedelta
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from ApartmentServices.availability import OccupancyBitmap
+
+
+class Command(BaseCommand):
+    help = "Time availability searches over generated occupancy bitmaps (no database or cache access)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--properties', type=int, default=500)
+        parser.add_argument('--apartments', type=int, default=200)
+        parser.add_argument('--days', type=int, default=730)
+        parser.add_argument('--occupancy', type=float, default=0.6)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        origin = timezone.localdate()
+        random = np.random.default_rng(0)
+        started = time.perf_counter()
+        bitmaps = [self.generate(property_id, origin, options, random) for property_id in range(options['properties'])]
+        self.stdout.write(
+            f"{options['properties']} properties x {options['apartments']} apartments x {options['days']} nights generated in "
+            f"{time.perf_counter() - started:.1f} s | {len(pickle.dumps(bitmaps[0])) / 1024:.0f} KB per pickled property"
+        )
+        for offset, nights, filters in ((12, 7, {}), (12, 7, {'min_capacity': 3}), (300, 14, {'min_capacity': 3, 'max_price': 150}), (0, 60, {})):
+            start_date = origin + timedelta(days=offset)
+            end_date = start_date + timedelta(days=nights)
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                free = [apartment_id for bitmap in bitmaps for apartment_id in bitmap.free(start_date, end_date, **filters)]
+                timings.append(time.perf_counter() - started)
+            self.stdout.write(
+                f"{nights} nights from day {offset} {filters or ''}: {len(free)} free apartments | "
+                f"min {min(timings) * 1000:.1f} ms, median {sorted(timings)[len(timings) // 2] * 1000:.1f} ms"
+            )
+
+    def generate(self, property_id, origin, options, random):
+        count = options['apartments']
+        rows = [
+            (property_id * count + index, int(random.integers(1, 6)), 'normal', float(random.integers(50, 300)))
+            for index in range(count)
+        ]
+        bitmap = OccupancyBitmap(property_id, origin, options['days'], rows)
+        # Independent nights are enough to exercise the search; real stays only cluster them
+        nights = random.random((count, options['days'])) < options['occupancy'] / 4
+        bitmap.bits[:] = np.packbits(nights, axis=1)
+        return bitmap
@@ -0,0 +1,70 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from ApartmentServices.models import Apartment, Booking
+from cleanswitch.management.commands.benchmark_serializers import seedBenchmarkRows
+
+
+class Command(BaseCommand):
+    help = "Compare the per-apartment overlap check with the single-query conflict lookup for group bookings (rolled back afterwards)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 50])
+        parser.add_argument('--bookings', type=int, default=20, help="existing bookings per apartment")
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            apartments = list(Apartment.objects.filter(pk__in=seedBenchmarkRows(max(options['sizes']))[Apartment]).order_by('pk'))
+            start = self.seed_bookings(apartments, options['bookings'])
+            # The requested stay overlaps the last existing booking, which every other apartment lacks
+            start_date = start + timedelta(days=2 * options['bookings'] - 2, hours=12)
+            end_date = start + timedelta(days=2 * options['bookings'])
+            for size in options['sizes']:
+                self.compare(apartments[:size], start_date, end_date, options['repeat'])
+            transaction.set_rollback(True)
+
+    def seed_bookings(self, apartments, per_apartment):
+        start = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0)
+        bookings = Booking.objects.bulk_create([
+            Booking(startDate=start + timedelta(days=2 * index), endDate=start + timedelta(days=2 * index + 1), status='confirmed')
+            for apartment in apartments for index in range(per_apartment)
+        ], batch_size=1000)
+        Booking.apartments.through.objects.bulk_create([
+            Booking.apartments.through(booking_id=booking.pk, apartment_id=apartment.pk)
+            for position, apartment in enumerate(apartments)
+            for booking in bookings[position * per_apartment:(position + 1) * per_apartment]
+            if position % 2 == 0 or booking is not bookings[(position + 1) * per_apartment - 1]
+        ], batch_size=1000)
+        return start
+
+    def compare(self, apartments, start_date, end_date, repeat):
+        def per_apartment():
+            return [
+                apartment.pk for apartment in apartments
+                if Booking.objects.filter(apartments=apartment, startDate__lt=end_date, endDate__gt=start_date)
+                .exclude(status__in=['cancelled', 'checked_out']).exists()
+            ]
+
+        def single_query():
+            return sorted(Booking.find_conflicts(apartments, start_date, end_date))
+
+        results = {}
+        for label, run in (('loop', per_apartment), ('batched', single_query)):
+            timings = []
+            for _ in range(repeat):
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    conflicts = run()
+                    timings.append(time.perf_counter() - started)
+            results[label] = (min(timings), len(queries.captured_queries), conflicts)
+
+        (loop_time, loop_queries, loop_conflicts), (batched_time, batched_queries, batched_conflicts) = results['loop'], results['batched']
+        self.stdout.write(
+            f"{len(apartments)} apartments: {len(batched_conflicts)} conflicting | loop {loop_time * 1000:.1f} ms, {loop_queries} queries | "
+            f"batched {batched_time * 1000:.1f} ms, {batched_queries} queries | x{loop_time / batched_time:.1f} | "
+            f"same conflicts: {loop_conflicts == batched_conflicts}"
+        )
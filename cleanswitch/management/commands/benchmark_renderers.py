@@ -0,0 +1,46 @@
+import gzip
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from ApartmentServices.models import Apartment
+from ApartmentServices.Serializers import ApartmentSerializer
+from TaskServices.models import Task
+from TaskServices.Serializers import TaskSerializerWithFilters
+from cleanswitch.Helpers import eagerLoad
+from cleanswitch.management.commands.benchmark_serializers import seedBenchmarkRows
+from cleanswitch.renderers import MessagePackRenderer, StreamingJSONRenderer
+
+
+class Command(BaseCommand):
+    help = "Compare JSON and MessagePack payload size and encode time on generated list payloads (rolled back afterwards)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            pks = seedBenchmarkRows(options['rows'])
+            for serializer_class, model in ((ApartmentSerializer, Apartment), (TaskSerializerWithFilters, Task)):
+                queryset = eagerLoad(model.objects.filter(pk__in=pks[model]).order_by('-id'), serializer_class())
+                data = {'data': serializer_class(queryset, many=True).data, 'message': 'Data Retrieved Successfully'}
+                self.compare(serializer_class.__name__, data, options['repeat'])
+            transaction.set_rollback(True)
+
+    def compare(self, label, data, repeat):
+        results = []
+        for renderer in (StreamingJSONRenderer(), MessagePackRenderer()):
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                body = renderer.render(data, renderer.media_type, {})
+                timings.append(time.perf_counter() - started)
+            results.append((renderer.format, min(timings), len(body), len(gzip.compress(body))))
+
+        (_, json_time, json_size, json_gzip), (_, msgpack_time, msgpack_size, msgpack_gzip) = results
+        self.stdout.write(f"{label}: {len(data['data'])} rows")
+        for name, encode_time, size, gzip_size in results:
+            self.stdout.write(f"  {name:8} {encode_time * 1000:7.1f} ms  {size / 1024:8.1f} KiB  gzip {gzip_size / 1024:7.1f} KiB")
+        self.stdout.write(
+            f"  msgpack/json: size {msgpack_size / json_size:.2f}, gzip {msgpack_gzip / json_gzip:.2f}, encode time {msgpack_time / json_time:.2f}"
+        )
@@ -0,0 +1,82 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from ApartmentServices.models import Apartment
+from ApartmentServices.Serializers import ApartmentSerializer
+from PropertyServices.models import Property
+from TaskServices.models import Task
+from TaskServices.Serializers import TaskSerializerWithFilters
+from UserServices.models import User
+from cleanswitch.compiled import getCompiledSerializer
+from cleanswitch.Helpers import eagerLoad
+
+
+def seedBenchmarkRows(rows):
+    """Bulk-create `rows` apartments and tasks (with M2M links) for the benchmark commands; returns their pks by model."""
+    user = User.objects.create(username=f"benchmark-{time.time_ns()}", role='admin')
+    property = Property.objects.create(name='Benchmark', address='Benchmark', added_by_user_id=user)
+    apartments = Apartment.objects.bulk_create([
+        Apartment(number=index, name=f"Apartment {index}", property_assigned=property, capacity=2, numberOfBeds=1,
+                  apartmentType='normal', price=100 + index % 50, added_by_user_id=user)
+        for index in range(rows)
+    ], batch_size=1000)
+    tasks = Task.objects.bulk_create([
+        Task(title=f"Task {index}", description='Benchmark', due_date=timezone.now(), duration=1,
+             property_assigned=property, priority='medium', added_by_user_id=user)
+        for index in range(rows)
+    ], batch_size=1000)
+    Task.assigned_to.through.objects.bulk_create([
+        Task.assigned_to.through(task_id=task.pk, user_id=user.pk) for task in tasks
+    ], batch_size=1000)
+    Task.apartments_assigned.through.objects.bulk_create([
+        Task.apartments_assigned.through(task_id=task.pk, apartment_id=apartment.pk)
+        for task, apartment in zip(tasks, apartments)
+    ], batch_size=1000)
+    return {Apartment: [apartment.pk for apartment in apartments], Task: [task.pk for task in tasks]}
+
+
+class Command(BaseCommand):
+    help = "Compare DRF serialization with the compiled values() fast path on generated rows (rolled back afterwards)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.pks = seedBenchmarkRows(options['rows'])
+            for serializer_class, model in ((ApartmentSerializer, Apartment), (TaskSerializerWithFilters, Task)):
+                self.compare(serializer_class, model.objects.filter(pk__in=self.pks[model]).order_by('-id'), options['repeat'])
+            transaction.set_rollback(True)
+
+    def compare(self, serializer_class, queryset, repeat):
+        serializer = serializer_class()
+        compiled = getCompiledSerializer(serializer)
+        if compiled is None:
+            self.stdout.write(self.style.WARNING(f"{serializer_class.__name__} cannot be compiled"))
+            return
+
+        def drf():
+            return serializer_class(eagerLoad(queryset, serializer), many=True).data
+
+        def fast():
+            return compiled.serialize(queryset.values_list('pk', flat=True))
+
+        results = {}
+        for label, run in (('drf', drf), ('compiled', fast)):
+            timings = []
+            for _ in range(repeat):
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    data = run()
+                    timings.append(time.perf_counter() - started)
+            results[label] = (min(timings), len(queries.captured_queries), data)
+
+        (drf_time, drf_queries, drf_data), (fast_time, fast_queries, fast_data) = results['drf'], results['compiled']
+        identical = [dict(row) for row in drf_data] == fast_data
+        self.stdout.write(
+            f"{serializer_class.__name__}: {len(fast_data)} rows | drf {drf_time * 1000:.0f} ms, {drf_queries} queries | "
+            f"compiled {fast_time * 1000:.0f} ms, {fast_queries} queries | x{drf_time / fast_time:.1f} | identical output: {identical}"
+        )
@@ -0,0 +1,98 @@
+import random
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from ApartmentServices.models import Apartment, Booking, NightsUnavailable
+from PropertyServices.models import Property
+
+
+class Command(BaseCommand):
+    help = (
+        "Book the same few apartments from many threads at once and check the apartment-night ledger "
+        "let no two bookings hold an apartment on the same night. Needs a database accepting concurrent "
+        "writers (PostgreSQL); the rows it creates are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--rounds', type=int, default=20)
+        parser.add_argument('--apartments', type=int, default=3)
+        parser.add_argument('--days', type=int, default=10, help="span the requested stays are drawn from")
+
+    def handle(self, *args, **options):
+        prop = Property.objects.create(name='Booking stress test', address='-')
+        apartments = [
+            Apartment.objects.create(number=index, name=f'stress-{index}', property_assigned=prop, apartmentType='normal')
+            for index in range(options['apartments'])
+        ]
+        start = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0) + timedelta(days=3650)
+        outcomes = Counter()
+        try:
+            started = time.perf_counter()
+            for _ in range(options['rounds']):
+                self.round(apartments, start, options, outcomes)
+            elapsed = time.perf_counter() - started
+            overlaps = self.overlaps(apartments)
+            self.stdout.write(
+                f"{options['rounds']} rounds x {options['threads']} threads in {elapsed:.1f} s | "
+                f"{outcomes['booked']} booked, {outcomes['rejected']} rejected, {outcomes['failed']} failed | "
+                f"{len(overlaps)} overlapping pairs"
+            )
+            if overlaps:
+                raise CommandError(f"Double bookings: {overlaps[:10]}")
+        finally:
+            Booking.objects.filter(apartments__in=apartments).delete()
+            prop.delete()
+
+    def round(self, apartments, start, options, outcomes):
+        barrier = threading.Barrier(options['threads'])
+        lock = threading.Lock()
+
+        def book(seed):
+            rng = random.Random(seed)
+            chosen = rng.sample(apartments, rng.randint(1, len(apartments)))
+            first = rng.randrange(options['days'])
+            start_date = start + timedelta(days=first)
+            end_date = start_date + timedelta(days=rng.randint(1, 3))
+            barrier.wait()
+            try:
+                with transaction.atomic():
+                    booking = Booking.objects.create(startDate=start_date, endDate=end_date, status='confirmed')
+                    booking.apartments.set(chosen)
+                outcome = 'booked'
+            except NightsUnavailable:
+                outcome = 'rejected'
+            except Exception as error:
+                self.stderr.write(f"{type(error).__name__}: {error}")
+                outcome = 'failed'
+            finally:
+                connection.close()
+            with lock:
+                outcomes[outcome] += 1
+
+        threads = [threading.Thread(target=book, args=(random.random(),)) for _ in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def overlaps(self, apartments):
+        """(apartment id, booking id, booking id) of the bookings holding an apartment at the same time, read back from the bookings themselves."""
+        stays = {}
+        links = Booking.apartments.through.objects.filter(apartment__in=apartments).exclude(booking__status__in=Booking.RELEASED_STATUSES)
+        for apartment_id, booking_id, start, end in links.values_list('apartment_id', 'booking_id', 'booking__startDate', 'booking__endDate'):
+            stays.setdefault(apartment_id, []).append((start, end, booking_id))
+        overlaps = []
+        for apartment_id, held in stays.items():
+            held.sort()
+            latest_end, latest_id = held[0][1], held[0][2]
+            for start, end, booking_id in held[1:]:
+                if start < latest_end:
+                    overlaps.append((apartment_id, latest_id, booking_id))
+                if end > latest_end:
+                    latest_end, latest_id = end, booking_id
+        return overlaps
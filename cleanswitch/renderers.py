@@ -0,0 +1,76 @@
+import datetime
+import decimal
+import msgpack
+from django.utils import timezone
+from rest_framework.compat import INDENT_SEPARATORS, LONG_SEPARATORS, SHORT_SEPARATORS
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils import encoders
+
+class StreamingJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that can also emit a top-level array incrementally: render_iter() takes an
+    iterable of already-serialized chunks (lists of items) and yields one bytestring per chunk,
+    with the same separators and escaping as render().
+    """
+
+    def render_iter(self, chunks, accepted_media_type=None, renderer_context=None):
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is None:
+            separators = SHORT_SEPARATORS if self.compact else LONG_SEPARATORS
+        else:
+            separators = INDENT_SEPARATORS
+        encode = self.encoder_class(
+            indent=indent, ensure_ascii=self.ensure_ascii,
+            allow_nan=not self.strict, separators=separators
+        ).encode
+        item_separator = separators[0]
+
+        yield b'['
+        first = True
+        for chunk in chunks:
+            if not chunk:
+                continue
+            body = item_separator.join(encode(item) for item in chunk)
+            body = body.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+            yield (body if first else item_separator + body).encode()
+            first = False
+        yield b']'
+
+
+def encodeMsgpackDefault(obj):
+    if isinstance(obj, datetime.datetime):
+        # Packed as the msgpack Timestamp extension (-1) instead of an ISO string
+        if timezone.is_naive(obj):
+            obj = timezone.make_aware(obj)
+        return msgpack.Timestamp.from_datetime(obj)
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    return encoders.JSONEncoder().default(obj)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Binary MessagePack rendering, selected with `Accept: application/msgpack`. Datetimes use the
+    Timestamp extension; other values, dates included, follow the JSON renderer.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encodeMsgpackDefault, use_bin_type=True, datetime=False)
+
+
+class MessagePackParser(BaseParser):
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False, timestamp=3)
+        except (ValueError, msgpack.ExtraData, msgpack.FormatError, msgpack.StackError) as exc:
+            raise ParseError(f"MessagePack parse error - {exc or type(exc).__name__}")
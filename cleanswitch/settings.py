@@ -58,11 +58,13 @@ INSTALLED_APPS = [
     "django.contrib.staticfiles",
     "rest_framework",
     "corsheaders",
+    "cleanswitch",
     "UserServices",
     "LocationServices",
     "PropertyServices",
     "TaskServices",
     "ApartmentServices",
+    "SearchServices",
 
 ]
 
@@ -98,10 +100,24 @@ ROOT_URLCONF = "cleanswitch.urls"
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'cleanswitch.authentication.ClaimsJWTAuthentication',
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'cleanswitch.renderers.StreamingJSONRenderer',
+        'cleanswitch.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'rest_framework.parsers.JSONParser',
+        'cleanswitch.renderers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ),
 }
 
+# Backend for the `search` list parameter; unset picks MySQL FULLTEXT on MySQL and the token table elsewhere
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND')
+
 CACHES = {
     'default': {
         'BACKEND': 'django_redis.cache.RedisCache',
@@ -121,6 +137,24 @@ CACHES = {
     }
 }
 
+# Cached totalItems of paginated lists, invalidated by model signals
+LIST_COUNT_CACHE_TIMEOUT = 60 * 15
+# Above this EXPLAIN estimate (MySQL) lists report the estimate instead of running COUNT(*); None disables
+LIST_COUNT_ESTIMATE_THRESHOLD = 100000
+# How long the first-seen time of a list/detail ETag is kept to derive Last-Modified
+CONDITIONAL_GET_VALIDATOR_TIMEOUT = 60 * 60 * 24
+# Entries of @cacheResponse views; keys carry tag versions, so this only bounds how long retired entries linger
+RESPONSE_CACHE_TIMEOUT = 60 * 60
+# Per-object serialized dicts of CachedRepresentationMixin serializers, keyed by updated_at and related tag versions
+REPRESENTATION_CACHE_TIMEOUT = 60 * 60 * 6
+# Two-tier reference cache: per-process LRU (size, seconds before a copy is re-checked) in front of Redis
+REFERENCE_CACHE_MAX_ENTRIES = 2048
+REFERENCE_CACHE_LOCAL_TIMEOUT = 60
+REFERENCE_CACHE_TIMEOUT = 60 * 60
+# Apartment x night occupancy bitmaps (one reference cache entry per property): nights covered and shared copy lifetime
+AVAILABILITY_HORIZON_DAYS = 730
+AVAILABILITY_CACHE_TIMEOUT = 60 * 60 * 24
+
 # Cache des sessions - TIMEOUT DIFFÉRENT!
 SESSION_CACHE_ALIAS = 'default'
 SESSION_COOKIE_AGE = 60 * 60 * 24 * 7  # 1 semaine
@@ -0,0 +1,79 @@
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from cleanswitch.authentication import REVOKING_FIELDS, revokeUserTokens
+from cleanswitch.cache import instanceTags, invalidateTags, listTag
+
+TRACKED_APPS = ('UserServices', 'PropertyServices', 'ApartmentServices', 'TaskServices', 'LocationServices')
+
+
+def isTracked(model):
+    return model._meta.app_label in TRACKED_APPS
+
+
+def handlePostSave(sender, instance, using=None, **kwargs):
+    invalidateTags(instanceTags(sender, [instance.pk]), using=using)
+
+
+def handlePostDelete(sender, instance, using=None, **kwargs):
+    invalidateTags(instanceTags(sender, [instance.pk]), using=using)
+
+
+def handleM2mChanged(sender, instance, action, model, pk_set, using=None, **kwargs):
+    # sender is the through model; both ends of the changed links are affected rows
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    tags = instanceTags(sender, []) | instanceTags(type(instance), [instance.pk])
+    if pk_set:
+        tags |= instanceTags(model, pk_set)
+    elif action == 'post_clear':
+        # The cleared rows are no longer known here
+        tags.add(listTag(model))
+    invalidateTags(tags, using=using)
+
+
+# Connected per tracked model: a receiver without sender would also disable the fast delete
+# (no SELECT before DELETE) of every untracked model, such as the search index tables
+for tracked in filter(isTracked, apps.get_models(include_auto_created=True)):
+    post_save.connect(handlePostSave, sender=tracked, dispatch_uid=f"tags-save-{tracked._meta.label}")
+    post_delete.connect(handlePostDelete, sender=tracked, dispatch_uid=f"tags-delete-{tracked._meta.label}")
+    m2m_changed.connect(handleM2mChanged, sender=tracked, dispatch_uid=f"tags-m2m-{tracked._meta.label}")
+
+
+User = get_user_model()
+
+
+@receiver(pre_save, sender=User)
+def checkClaimsChanged(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Compare against the stored row: saves that leave the token claims alone keep the tokens valid
+    instance._claims_changed = False
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    fields = [name for name in REVOKING_FIELDS if name in instance.__dict__ and (update_fields is None or name in update_fields)]
+    if not fields:
+        return
+    stored = sender._base_manager.using(instance._state.db).filter(pk=instance.pk).values(*fields).first()
+    instance._claims_changed = stored is not None and any(stored[name] != getattr(instance, name) for name in fields)
+
+
+@receiver(post_save, sender=User)
+def revokeChangedClaims(sender, instance, created=False, raw=False, using=None, **kwargs):
+    if not created and not raw and instance._claims_changed:
+        revokeUserTokens([instance.pk], using=using)
+
+
+@receiver(post_delete, sender=User)
+def revokeDeletedUser(sender, instance, using=None, **kwargs):
+    revokeUserTokens([instance.pk], using=using)
+
+
+@receiver(m2m_changed, sender=User.properties_assigned.through)
+def revokeChangedProperties(sender, instance, action, reverse, pk_set, using=None, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # The users losing the property are only known before the links are deleted
+        instance._cleared_user_ids = list(instance.assigned_users.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        revokeUserTokens(pk_set if reverse else [instance.pk], using=using)
+    elif action == 'post_clear':
+        revokeUserTokens(instance.__dict__.pop('_cleared_user_ids', ()) if reverse else [instance.pk], using=using)
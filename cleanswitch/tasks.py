@@ -0,0 +1,7 @@
+from celery import shared_task
+from cleanswitch.cache import resolveComputation
+
+
+@shared_task(ignore_result=True)
+def refreshCachedComputation(path, params):
+    resolveComputation(path).refresh(**params)
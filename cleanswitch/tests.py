@@ -0,0 +1,147 @@
+from datetime import date
+from decimal import Decimal
+from io import BytesIO
+
+import msgpack
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
+from rest_framework.test import APIClient
+
+from ApartmentServices.models import Apartment
+from PropertyServices.models import Property
+from UserServices.models import User
+from cleanswitch.cache import CommitBatch
+from cleanswitch.renderers import MessagePackParser, MessagePackRenderer
+
+
+class ListAPITestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', role='admin', is_superuser=True)
+        cls.property = Property.objects.create(name='Main', address='1 Street')
+        cls.apartments = [
+            Apartment.objects.create(
+                number=number, name=f'Apt {number}', property_assigned=cls.property, capacity=2,
+                numberOfBeds=1, apartmentType='normal', price=100 + number, added_by_user_id=cls.admin,
+            )
+            for number in range(5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def get(self, url, params=None, **headers):
+        return self.client.get(url, params or {}, secure=True, headers=headers)
+
+
+class KeysetPaginationTests(ListAPITestCase):
+    def page(self, cursor, **params):
+        response = self.get('/api/apartments/', dict(params, cursor=cursor, pageSize=2))
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['data']
+
+    def test_cursor_walks_every_row_once_in_order(self):
+        Apartment.objects.filter(pk__in=[self.apartments[1].pk, self.apartments[3].pk]).update(price=150)
+        seen, cursor = [], ''
+        while cursor is not None:
+            page = self.page(cursor, ordering='price')
+            seen += [row['id'] for row in page['data']]
+            cursor = page['nextCursor']
+        self.assertEqual(seen, list(Apartment.objects.order_by('price', 'id').values_list('pk', flat=True)))
+
+    def test_previous_cursor_returns_the_previous_page(self):
+        first = self.page('')
+        self.assertIsNone(first['previousCursor'])
+        self.assertIsNone(first['totalItems'])
+        second = self.page(first['nextCursor'])
+        self.assertEqual(self.page(second['previousCursor'])['data'], first['data'])
+
+    def test_count_is_opt_in(self):
+        self.assertEqual(self.page('', withCount='true')['totalItems'], len(self.apartments))
+
+    def test_invalid_cursor_is_rejected(self):
+        self.assertEqual(self.get('/api/apartments/', {'cursor': 'garbage'}).status_code, 400)
+
+
+class EagerLoadingTests(ListAPITestCase):
+    def count_queries(self, page_size):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.get('/api/apartments/', {'pageSize': page_size}).status_code, 200)
+        return len(queries.captured_queries)
+
+    def test_query_count_does_not_grow_with_the_page(self):
+        self.assertEqual(self.count_queries(1), self.count_queries(5))
+
+
+class MessagePackTests(ListAPITestCase):
+    def test_list_renders_the_json_payload(self):
+        response = self.client.get('/api/apartments/', secure=True, HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        packed = msgpack.unpackb(response.content, timestamp=3)
+        self.assertEqual([row['id'] for row in packed['data']['data']], [row['id'] for row in self.get('/api/apartments/').json()['data']['data']])
+
+    def test_dates_round_trip(self):
+        value = {'day': date(2030, 1, 2), 'at': timezone.now(), 'amount': Decimal('1.50')}
+        parsed = MessagePackParser().parse(BytesIO(MessagePackRenderer().render(value)))
+        self.assertEqual(parsed, {'day': '2030-01-02', 'at': value['at'], 'amount': '1.50'})
+
+    def test_malformed_body_is_a_parse_error(self):
+        with self.assertRaises(ParseError):
+            MessagePackParser().parse(BytesIO(b'\xc1'))
+
+
+class CommitBatchTests(TestCase):
+    def setUp(self):
+        self.flushed = []
+        self.batch = CommitBatch(self.flushed.append)
+
+    def test_one_flush_per_transaction(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.batch.add([1])
+            with transaction.atomic():
+                self.batch.add([2])
+            self.batch.add([3])
+        self.assertEqual(self.flushed, [[1, 2, 3]])
+
+    def test_rolled_back_savepoint_drops_its_items(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.batch.add([1])
+                    raise ValueError
+            except ValueError:
+                pass
+            self.batch.add([2])
+        self.assertEqual(self.flushed, [[2]])
+
+
+class ConditionalListTests(ListAPITestCase):
+    def test_unchanged_list_answers_304_without_querying_rows(self):
+        etag = self.get('/api/apartments/')['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get('/api/apartments/', **{'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([query for query in queries.captured_queries if 'apartment' in query['sql'].lower()])
+
+    def test_etag_moves_on_save_and_queryset_update(self):
+        etag = self.get('/api/apartments/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.apartments[0].name = 'Renamed'
+            self.apartments[0].save()
+        response = self.get('/api/apartments/', **{'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Apartment.objects.filter(pk=self.apartments[1].pk).update(price=500)
+        self.assertEqual(self.get('/api/apartments/', **{'If-None-Match': etag}).status_code, 200)
+
+    def test_etag_depends_on_query_string(self):
+        self.assertNotEqual(self.get('/api/apartments/')['ETag'], self.get('/api/apartments/', {'pageSize': 2})['ETag'])
@@ -19,7 +19,7 @@ from django.contrib import admin
 from django.urls import path, include, re_path
 from django.conf.urls.static import static
 from cleanswitch import settings
-from cleanswitch.views import FileUploadViewInS3, index
+from cleanswitch.views import FileUploadViewInS3, ReferenceCacheStatsAPIView, index
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -29,6 +29,7 @@ urlpatterns = [
     path("api/", include('PropertyServices.urls')),
     path("api/", include('ApartmentServices.urls')),
     path('api/uploads/',FileUploadViewInS3.as_view(),name='fileupload'),
+    path('api/cache/stats/',ReferenceCacheStatsAPIView.as_view(),name='reference-cache-stats'),
 ]
 if settings.DEBUG:
     urlpatterns+=static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
@@ -4,6 +4,8 @@ from rest_framework.parsers import MultiPartParser,FormParser
 from rest_framework.response import Response
 from boto3.session import Session
 from cleanswitch.settings import AWS_ACCESS_KEY_ID,AWS_ACESS_KEY_SECRET,AWS_S3_REGION_NAME,AWS_STORAGE_BUCKET_NAME
+from cleanswitch.cache import referenceCache
+from cleanswitch.permissions import IsAdmin
 import os
 
 def index(request):
@@ -35,4 +37,12 @@ class FileUploadViewInS3(APIView):
             )
             s3url=f"https://{AWS_STORAGE_BUCKET_NAME}.s3.amazonaws.com/{file_path}"
             uploaded_files_urls.append(s3url)
-        return Response({'message':'File uploaded successfully','urls':uploaded_files_urls},status=200)
\ No newline at end of file
+        return Response({'message':'File uploaded successfully','urls':uploaded_files_urls},status=200)
+
+
+class ReferenceCacheStatsAPIView(APIView):
+    """Hit/miss counters of the two-tier reference cache in the worker process serving the request."""
+    permission_classes=[IsAdmin]
+
+    def get(self,request,*args,**kwargs):
+        return Response(referenceCache.stats(),status=200)